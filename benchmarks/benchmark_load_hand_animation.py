@@ -0,0 +1,76 @@
+"""
+Compares the regex line-by-line animation parser against the bulk numpy parser and the binary sidecar cache
+on a synthetic terminal dump.
+
+Usage (from the repository root):
+    python benchmarks/benchmark_load_hand_animation.py --num-lines 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import constants
+from src.utilities import utils_io
+
+
+def write_synthetic_dump(fpath: str, num_lines: int, seed=0):
+
+    """
+    Writes a terminal dump with the same layout as data/animation_1.txt (one record per line, followed by an
+    empty line), so 'num_lines' counts both record and empty lines
+    """
+
+    rng = np.random.default_rng(seed)
+    num_records = max(num_lines // 2, 2)
+    start = datetime(2024, 2, 23, 18, 29, 14, 130658)
+    joint_values = rng.uniform(-180.0, 180.0, size=(num_records, len(constants.JOINT_NAMES)))
+
+    with open(fpath, "w") as file:
+        for record_index in range(num_records):
+            dt = start + timedelta(microseconds=int(record_index * 11111))
+            values_str = ", ".join(f"'{value:.6f}'" for value in joint_values[record_index])
+            file.write(f"[datetime.datetime({dt.year}, {dt.month}, {dt.day}, {dt.hour}, {dt.minute}, "
+                       f"{dt.second}, {dt.microsecond}), [{values_str}]]\n\n")
+
+
+def time_function(function, **kwargs):
+    start = time.perf_counter()
+    result = function(**kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-lines", type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        fpath = os.path.join(temp_dir, "synthetic_animation.txt")
+
+        print(f"Writing synthetic dump with {args.num_lines} lines...")
+        write_synthetic_dump(fpath=fpath, num_lines=args.num_lines)
+        print(f"File size: {os.path.getsize(fpath) / 1e6:.1f} MB")
+
+        df_regex, time_regex = time_function(utils_io.load_hand_animation, txt_fpath=fpath)
+        df_bulk, time_bulk = time_function(utils_io.load_hand_animation_bulk, txt_fpath=fpath)
+        _, time_cache_cold = time_function(utils_io.load_hand_animation_cached, txt_fpath=fpath)
+        _, time_cache_warm = time_function(utils_io.load_hand_animation_cached, txt_fpath=fpath)
+
+    max_difference = np.max(np.abs(df_regex.values - df_bulk.values))
+    print(f"Regex parser : {time_regex:.3f} s")
+    print(f"Bulk parser  : {time_bulk:.3f} s ({time_regex / time_bulk:.1f}x faster)")
+    print(f"Cache (cold) : {time_cache_cold:.3f} s")
+    print(f"Cache (warm) : {time_cache_warm * 1000:.3f} ms")
+    print(f"Max absolute difference between results: {max_difference:.3e}")
+
+
+if __name__ == "__main__":
+    main()
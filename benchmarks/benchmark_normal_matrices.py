@@ -0,0 +1,181 @@
+"""
+Compares the GPU time of two ways of transforming instanced meshes, measured with OpenGL timer queries:
+
+    gpu : The vertex shader computes the normal matrix (transpose(inverse(model))) and multiplies the projection,
+          view and model matrices for every vertex, as default_color_instanced.vert used to
+    cpu : Normal matrices are computed once per instance on the CPU (mat4.compute_normal_matrices()) and passed
+          as an instance attribute, and the view-projection matrix is multiplied once per frame, as
+          default_color_instanced.vert does now. The CPU cost of the normal matrices is reported too
+
+Runs on a standalone OpenGL context, so no window is needed.
+
+Usage (from the repository root):
+    python benchmarks/benchmark_normal_matrices.py --instances 2000 --subdivisions 4
+    python benchmarks/benchmark_normal_matrices.py --backend egl   # Headless Linux
+"""
+import argparse
+import os
+import sys
+import time
+
+import glm
+import moderngl
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src import mat4
+from src import meshes_3d
+
+VERTEX_SHADER_GPU = """
+#version 330 core
+layout (location = 0) in vec3 in_position;
+layout (location = 1) in vec3 in_normal;
+layout (location = 3) in mat4 in_instance_model;
+uniform mat4 m_proj;
+uniform mat4 m_view;
+uniform mat4 m_proj_light;
+uniform mat4 m_view_light;
+out vec3 normal;
+out vec4 shadowCoord;
+void main() {
+    normal = mat3(transpose(inverse(in_instance_model))) * normalize(in_normal);
+    gl_Position = m_proj * m_view * in_instance_model * vec4(in_position, 1.0);
+    shadowCoord = m_proj_light * m_view_light * in_instance_model * vec4(in_position, 1.0);
+}
+"""
+
+VERTEX_SHADER_CPU = """
+#version 330 core
+layout (location = 0) in vec3 in_position;
+layout (location = 1) in vec3 in_normal;
+layout (location = 3) in mat4 in_instance_model;
+layout (location = 7) in mat3 in_instance_normal;
+uniform mat4 m_view_proj;
+uniform mat4 m_shadow;
+out vec3 normal;
+out vec4 shadowCoord;
+void main() {
+    vec4 worldPos = in_instance_model * vec4(in_position, 1.0);
+    normal = in_instance_normal * in_normal;
+    gl_Position = m_view_proj * worldPos;
+    shadowCoord = m_shadow * worldPos;
+}
+"""
+
+# Both variants share the same (cheap) fragment shader, so the difference comes from the vertex stage
+FRAGMENT_SHADER = """
+#version 330 core
+in vec3 normal;
+in vec4 shadowCoord;
+layout (location = 0) out vec4 fragColor;
+void main() {
+    fragColor = vec4(normalize(normal) * 0.5 + 0.5 + shadowCoord.xyz * 1e-6, 1.0);
+}
+"""
+
+
+def create_instance_matrices(num_instances: int) -> np.ndarray:
+
+    """
+    :return: numpy ndarray (num_instances, 4, 4) <float32>, column-major, with random rotations and scales
+    """
+
+    rng = np.random.default_rng(0)
+    matrices = np.empty((num_instances, 4, 4), dtype=np.float32)
+    for i in range(num_instances):
+        matrices[i] = mat4.create_transform_euler_xyz(rng.uniform(-20, 20, 3).astype(np.float32),
+                                                      rng.uniform(-np.pi, np.pi, 3).astype(np.float32),
+                                                      rng.uniform(0.5, 1.5, 3).astype(np.float32)).T
+    return matrices
+
+
+def time_variant(ctx: moderngl.Context, vao: moderngl.VertexArray, num_instances: int, repeats: int) -> float:
+
+    """
+    :return: Median GPU time, in seconds, to draw all instances once
+    """
+
+    query = ctx.query(time=True)
+    times = []
+    for _ in range(repeats):
+        with query:
+            vao.render(moderngl.TRIANGLES, instances=num_instances)
+        times.append(query.elapsed * 1e-9)
+    return float(np.median(times))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=2000)
+    parser.add_argument("--subdivisions", type=int, default=4, help="Icosphere subdivisions of the instanced mesh")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--backend", type=str, default=None, help="moderngl standalone backend, e.g. 'egl'")
+    args = parser.parse_args()
+
+    ctx = moderngl.create_standalone_context(**({"backend": args.backend} if args.backend else {}))
+    fbo = ctx.framebuffer(color_attachments=[ctx.texture((1280, 720), 4)],
+                          depth_attachment=ctx.depth_renderbuffer((1280, 720)))
+    fbo.use()
+    ctx.enable_only(moderngl.DEPTH_TEST | moderngl.CULL_FACE)
+
+    vertices, normals, indices = meshes_3d.generate_icosphere_mesh(radius=1.0, subdivisions=args.subdivisions)
+    vbo = ctx.buffer(np.hstack([vertices, normals]).astype(np.float32))
+    ibo = ctx.buffer(np.ascontiguousarray(indices, dtype=np.int32))
+
+    instance_matrices = create_instance_matrices(num_instances=args.instances)
+    instance_normals = np.empty((args.instances, 3, 3), dtype=np.float32)
+
+    # CPU cost of the 'cpu' variant, paid once per frame for all instances
+    mat4.compute_normal_matrices(instance_matrices, instance_normals)  # Excludes the numba compilation/loading
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+        mat4.compute_normal_matrices(instance_matrices, instance_normals)
+    time_cpu_normals = (time.perf_counter() - start) / args.repeats
+
+    matrices_vbo = ctx.buffer(instance_matrices)
+    normals_vbo = ctx.buffer(instance_normals)
+
+    m_proj = glm.perspective(glm.radians(60.0), 1280 / 720, 0.1, 200.0)
+    m_view = glm.lookAt(glm.vec3(0, 10, 60), glm.vec3(0, 0, 0), glm.vec3(0, 1, 0))
+    m_proj_light = glm.ortho(-30.0, 30.0, -30.0, 30.0, 0.1, 200.0)
+    m_view_light = glm.lookAt(glm.vec3(50, 50, -10), glm.vec3(0, -5, 0), glm.vec3(0, 1, 0))
+
+    program_gpu = ctx.program(vertex_shader=VERTEX_SHADER_GPU, fragment_shader=FRAGMENT_SHADER)
+    program_gpu["m_proj"].write(m_proj)
+    program_gpu["m_view"].write(m_view)
+    program_gpu["m_proj_light"].write(m_proj_light)
+    program_gpu["m_view_light"].write(m_view_light)
+    vao_gpu = ctx.vertex_array(program_gpu,
+                               [(vbo, "3f 3f", "in_position", "in_normal"),
+                                (matrices_vbo, "16f/i", "in_instance_model")],
+                               ibo)
+
+    program_cpu = ctx.program(vertex_shader=VERTEX_SHADER_CPU, fragment_shader=FRAGMENT_SHADER)
+    program_cpu["m_view_proj"].write(m_proj * m_view)
+    program_cpu["m_shadow"].write(m_proj_light * m_view_light)
+    vao_cpu = ctx.vertex_array(program_cpu,
+                               [(vbo, "3f 3f", "in_position", "in_normal"),
+                                (matrices_vbo, "16f/i", "in_instance_model"),
+                                (normals_vbo, "9f/i", "in_instance_normal")],
+                               ibo)
+
+    # Warm-up, so shader compilation and buffer uploads are not measured
+    for vao in (vao_gpu, vao_cpu):
+        vao.render(moderngl.TRIANGLES, instances=args.instances)
+    ctx.finish()
+
+    time_gpu = time_variant(ctx=ctx, vao=vao_gpu, num_instances=args.instances, repeats=args.repeats)
+    time_cpu = time_variant(ctx=ctx, vao=vao_cpu, num_instances=args.instances, repeats=args.repeats)
+
+    num_vertices = vertices.shape[0] * args.instances
+    print(f"{args.instances} instances, {num_vertices} vertices per draw (median of {args.repeats})")
+    print(f"    gpu : {time_gpu * 1000:.3f} ms GPU")
+    print(f"    cpu : {time_cpu * 1000:.3f} ms GPU + {time_cpu_normals * 1000:.3f} ms CPU normal matrices "
+          f"({time_gpu / time_cpu:.2f}x faster on the GPU)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Measures the startup cost of building hand geometry: importing meshes_3d in a fresh interpreter (compared with
+importing trimesh, which it used to depend on) and generating the primitives of one hand with the NumPy
+generators and with trimesh. The primitive cache is disabled, so every mesh is generated from scratch.
+
+Usage (from the repository root):
+    python benchmarks/benchmark_startup.py --repeats 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src import constants
+from src import meshes_3d
+from src.renderables.finger_joint import FingerJoint
+
+# Same primitives as one hand with individual renderables (see Hand.get_renderable_specs())
+HAND_BLUEPRINTS = (
+    [FingerJoint.get_joint_blueprint(joint_type="xy", joint_radius=0.2, bone_radius=0.1)] * 5 +
+    [FingerJoint.get_joint_blueprint(joint_type="x", joint_radius=0.2, bone_radius=0.1)] * 10 +
+    [FingerJoint.get_bone_blueprint(bone_radius=0.1, bone_length=1.0 + 0.1 * index) for index in range(15)] +
+    [{"shape": "box", "width": 0.5, "height": 0.1, "depth": 0.1}] +
+    [{"shape": "box", "width": 0.1, "height": 0.1, "depth": 0.1}] * 4
+)
+
+
+def time_import(module_name: str, repeats: int) -> float:
+
+    """
+    :return: Median time, in seconds, to import 'module_name' in a new python process
+    """
+
+    code = (f"import time; start = time.perf_counter(); import {module_name}; "
+            f"print(time.perf_counter() - start)")
+
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True,
+                                check=True)
+        times.append(float(output.stdout.strip()))
+    return float(np.median(times))
+
+
+def generate_primitive_trimesh(shape: str, **params) -> tuple:
+
+    """
+    Reference implementation, as meshes_3d used to generate primitives before its NumPy generators
+    """
+
+    import trimesh
+
+    if shape == constants.KEY_SHAPE_BOX:
+        return meshes_3d.generate_box_mesh(width=params[constants.KEY_WIDTH],
+                                           height=params[constants.KEY_HEIGHT],
+                                           depth=params[constants.KEY_DEPTH])
+
+    if shape == constants.KEY_SHAPE_CYLINDER:
+        primitive = trimesh.creation.cylinder(segment=(params[constants.KEY_POINT_A], params[constants.KEY_POINT_B]),
+                                              radius=params[constants.KEY_RADIUS],
+                                              sections=params[constants.KEY_SECTIONS])
+    elif shape == constants.KEY_SHAPE_ICOSPHERE:
+        primitive = trimesh.creation.icosphere(radius=params[constants.KEY_RADIUS],
+                                               subdivisions=params[constants.KEY_SUBDIVISIONS])
+    else:
+        raise ValueError(f"[ERROR] Shape '{shape}' is not part of the benchmark")
+
+    return (np.array(primitive.vertices).astype('f4'),
+            np.array(primitive.vertex_normals).astype('f4'),
+            np.array(primitive.faces).astype('i4'))
+
+
+def time_hand_generation(generate_function, repeats: int) -> float:
+
+    """
+    :return: Median time, in seconds, to generate all primitives of one hand
+    """
+
+    keys = [meshes_3d.get_primitive_key(shape=blueprint["shape"], params=blueprint) for blueprint in HAND_BLUEPRINTS]
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for shape, params in keys:
+            generate_function(shape, **dict(params))
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    time_meshes_3d = time_import(module_name="src.meshes_3d", repeats=args.repeats)
+    time_trimesh = time_import(module_name="trimesh", repeats=args.repeats)
+    print(f"Import src.meshes_3d : {time_meshes_3d * 1000:.1f} ms")
+    print(f"Import trimesh       : {time_trimesh * 1000:.1f} ms")
+
+    # First calls are excluded, so that both sides are measured without one-off import costs
+    generate_primitive_trimesh(constants.KEY_SHAPE_ICOSPHERE, radius=1.0, subdivisions=0)
+    time_numpy = time_hand_generation(generate_function=meshes_3d.generate_primitive, repeats=args.repeats)
+    time_reference = time_hand_generation(generate_function=generate_primitive_trimesh, repeats=args.repeats)
+    print(f"Hand primitives ({len(HAND_BLUEPRINTS)} meshes, no cache)")
+    print(f"    NumPy   : {time_numpy * 1000:.2f} ms")
+    print(f"    trimesh : {time_reference * 1000:.2f} ms ({time_reference / time_numpy:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
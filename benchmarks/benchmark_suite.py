@@ -0,0 +1,307 @@
+"""
+Micro-benchmarks of the CPU hot paths, to catch performance regressions before they reach the rigs:
+
+    load_hand_animation/*  : Regex and bulk animation parsers on synthetic dumps of increasing size
+    hand/*                 : Keyframe lookup, interpolation and transform updates of a full hand
+    chessboard_plane/*     : ChessboardPlane.get_vertex_data()
+    create_mesh/*          : meshes_3d.create_mesh() per shape (cached geometry + transform) and generation
+    kernels/*              : numba kernels of mat4 and quaternion
+
+Every benchmark is calibrated to run for a minimum time per repeat (see timeit.Timer.autorange()), and the median
+and minimum time per call over all repeats are reported. Results can be saved as JSON and compared against a
+baseline saved earlier, in which case the exit code is 1 if anything got slower than the threshold (by the minimum
+time, which is the least noisy).
+
+Benchmarks that need renderables (hand/*, chessboard_plane/*) create a headless Engine (see Engine.run_headless()),
+so no display is needed, but an OpenGL driver is (e.g. '--backend egl' with Mesa). They are skipped if no context
+can be created.
+
+Usage (from the repository root):
+    python benchmarks/benchmark_suite.py --backend egl --output baseline.json
+    python benchmarks/benchmark_suite.py --backend egl --baseline baseline.json --threshold 0.1
+    python benchmarks/benchmark_suite.py --quick --filter kernels/
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))  # The engine imports its modules directly, like main.py
+
+from benchmarks.benchmark_load_hand_animation import write_synthetic_dump
+from src import constants
+from src import mat4
+from src import meshes_3d
+from src import quaternion
+from src.skeleton import Skeleton
+from src.utilities import utils_io
+
+ANIMATION_NUM_LINES = (1000, 10000, 100000)
+ANIMATION_NUM_LINES_QUICK = (1000, 10000)
+RESULTS_VERSION = 1
+
+# Benchmarks of get_renderable_benchmarks(), known upfront so the engine is only created if any is selected
+RENDERABLE_BENCHMARK_NAMES = ("hand/get_lower_index", "hand/update_hand_joints_from_animation",
+                              "hand/on_update", "hand/skeleton_update",
+                              "chessboard_plane/get_vertex_data/10", "chessboard_plane/get_vertex_data/100")
+
+
+def get_animation_benchmarks(temp_dir: str, sizes: tuple, name_filter=None):
+    for num_lines in sizes:
+        names = (f"load_hand_animation/regex/{num_lines}", f"load_hand_animation/bulk/{num_lines}")
+        if name_filter is not None and not any(name_filter in name for name in names):
+            continue  # Writing the largest dumps takes a while
+        fpath = os.path.join(temp_dir, f"animation_{num_lines}.txt")
+        write_synthetic_dump(fpath=fpath, num_lines=num_lines)
+        yield names[0], lambda fpath=fpath: utils_io.load_hand_animation(fpath)
+        yield names[1], lambda fpath=fpath: utils_io.load_hand_animation_bulk(fpath)
+
+
+def get_mesh_benchmarks():
+
+    # Same kind of transform the finger joints apply to their primitives
+    transform = mat4.create_transform_euler_xyz(np.array([0.0, 0.0, 0.5], dtype=np.float32),
+                                                np.array([0.0, np.pi / 2, 0.0], dtype=np.float32),
+                                                np.ones(3, dtype=np.float32))
+    for shape in meshes_3d.PRIMITIVE_PARAMETERS:
+        params = {constants.KEY_TRANSFORM: transform, constants.KEY_COLOR: (1.0, 0.0, 0.0)}
+        yield f"create_mesh/{shape}", lambda shape=shape, params=params: meshes_3d.create_mesh(shape, params)
+        yield f"create_mesh/generate/{shape}", \
+            lambda shape=shape: meshes_3d.generate_primitive(shape, **meshes_3d.PRIMITIVE_PARAMETERS[shape])
+
+
+def get_kernel_benchmarks():
+
+    rng = np.random.default_rng(0)
+    position = rng.uniform(-1, 1, 3).astype(np.float32)
+    rotation = rng.uniform(-np.pi, np.pi, 3).astype(np.float32)
+    scale = rng.uniform(0.5, 1.5, 3).astype(np.float32)
+    matrix_a = mat4.create_transform_euler_xyz(position, rotation, scale)
+    matrix_b = mat4.create_transform_euler_xyz(rotation, position, scale)
+    out_matrix = np.empty((4, 4), dtype=np.float32)
+
+    matrices = np.stack([mat4.create_transform_euler_xyz(rng.uniform(-1, 1, 3).astype(np.float32),
+                                                         rng.uniform(-np.pi, np.pi, 3).astype(np.float32),
+                                                         scale) for _ in range(1000)])
+    normal_matrices = np.empty((1000, 3, 3), dtype=np.float32)
+    vectors = rng.uniform(-1, 1, (10000, 3)).astype(np.float32)
+    out_vectors = np.empty_like(vectors)
+
+    # Hand skeleton, one pose and a whole recording worth of poses
+    hand_config = utils_io.load_hand_configuration(yaml_fpath=os.path.join(constants.CONFIG_DIR, "default_hand.yaml"))
+    skeleton = Skeleton.from_hand_configuration(hand_config=hand_config)
+    skeleton.rotations[:] = rng.uniform(-np.pi, np.pi, skeleton.rotations.shape)
+    batch_rotations = rng.uniform(-np.pi, np.pi, (1000, skeleton.num_joints, 3)).astype(np.float32)
+    batch_positions = np.empty((1000, skeleton.num_joints, 3), dtype=np.float32)
+
+    rotation_matrix = np.ascontiguousarray(matrix_a[:3, :3] / np.linalg.norm(matrix_a[:3, :3], axis=0))
+    quat_a = np.empty(4, dtype=np.float32)
+    quaternion.mat3_to_quat(rotation_matrix, quat_a)
+    quat_b = np.array([0.0, 1.0, 0.0, 0.0], dtype=np.float32)
+    out_mat3 = np.empty((3, 3), dtype=np.float32)
+
+    yield "kernels/mat4.create_transform_euler_xyz", lambda: mat4.create_transform_euler_xyz(position, rotation, scale)
+    yield "kernels/mat4.mul_mat4", lambda: mat4.mul_mat4(matrix_a, matrix_b, out_matrix)
+    yield "kernels/mat4.even_faster_inverse", lambda: mat4.even_faster_inverse(matrix_a, out_matrix)
+    yield "kernels/mat4.compute_normal_matrices/1000", lambda: mat4.compute_normal_matrices(matrices, normal_matrices)
+    yield "kernels/mat4.mul_vectors3/10000", lambda: mat4.mul_vectors3(matrix_a, vectors, out_vectors)
+    yield "kernels/mat4.mul_vectors3_rotation_only/10000", \
+        lambda: mat4.mul_vectors3_rotation_only(matrix_a, vectors, out_vectors)
+    yield "kernels/mat4.compute_hierarchy_transforms_euler_xyz/hand", \
+        lambda: mat4.compute_hierarchy_transforms_euler_xyz(skeleton.positions, skeleton.rotations, skeleton.scales,
+                                                            skeleton.parent_indices, skeleton.local_matrices,
+                                                            skeleton.world_matrices)
+    yield "kernels/mat4.compute_hierarchy_positions_euler_xyz_batch/hand_x1000", \
+        lambda: mat4.compute_hierarchy_positions_euler_xyz_batch(skeleton.positions, batch_rotations, skeleton.scales,
+                                                                 skeleton.parent_indices, batch_positions)
+    yield "kernels/quaternion.mat3_to_quat", lambda: quaternion.mat3_to_quat(rotation_matrix, quat_a)
+    yield "kernels/quaternion.quat_to_mat3", lambda: quaternion.quat_to_mat3(quat_a, out_mat3)
+    yield "kernels/quaternion.slerp_quat", lambda: quaternion.slerp_quat(quat_a, quat_b, 0.3)
+
+
+def create_headless_engine(backend=None):
+
+    """
+    :return: tuple (engine, None), or (None, reason) if no OpenGL context could be created
+    """
+
+    try:
+        from engine import Engine
+        return Engine(window_size=(64, 64), headless=True, headless_backend=backend, log_level="warning"), None
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+
+
+def get_renderable_benchmarks(engine):
+
+    from hand import Hand
+
+    hand = Hand(engine=engine,
+                hand_config_yaml_fpath=os.path.join(constants.CONFIG_DIR, "default_hand.yaml"),
+                hand_animation_txt_fpath=os.path.join(constants.DATA_DIR, "animation_1.txt"))
+
+    # Playback queries, one frame at 60 fps apart, looping over the animation like Hand.on_update()
+    query_timestamps = np.arange(0.0, hand.animation_duration, hand.time_dilation_factor / 60.0)
+    query_timestamps = query_timestamps.tolist() if len(query_timestamps) > 0 else [0.0]
+    cursor = [0]
+
+    def next_query_timestamp() -> float:
+        cursor[0] = (cursor[0] + 1) % len(query_timestamps)
+        return query_timestamps[cursor[0]]
+
+    yield "hand/get_lower_index", lambda: hand.get_lower_index(query_timestamp=next_query_timestamp())
+    yield "hand/update_hand_joints_from_animation", \
+        lambda: hand.update_hand_joints_from_animation(query_timestamp=next_query_timestamp())
+    yield "hand/skeleton_update", lambda: hand.skeleton.update()
+
+    # Whole per-frame update of the viewer: interpolation, then the skeleton the renderables are bound to (see
+    # Skeleton.bind_renderables()). Renderable.update() is not benchmarked, it would unbind them
+    hand.play_animation = True
+    yield "hand/on_update", lambda: hand.on_update(delta_time=1.0 / 60.0)
+
+    for num_squares in (10, 100):
+        plane = engine.scene.create_renderable(type_id="chessboard_plane",
+                                               params={"plane_size": 100, "num_squares": num_squares})
+        yield f"chessboard_plane/get_vertex_data/{num_squares}", plane.get_vertex_data
+
+
+def measure(function, min_time: float, repeats: int) -> dict:
+
+    """
+    :return: dict with the median and minimum time per call, in seconds, and how it was measured
+    """
+
+    function()  # Warm-up (numba compilation, caches, ...)
+
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(int(np.ceil(number * min_time / 0.2)), 1)  # autorange() aims for 0.2 s
+    times = np.array(timer.repeat(repeat=repeats, number=number)) / number
+
+    return {"median": float(np.median(times)), "min": float(times.min()), "number": number, "repeats": repeats}
+
+
+def get_metadata() -> dict:
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    import numba
+    return {"date": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "numba": numba.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor()}
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1.0:
+        return f"{seconds:.3f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f} ms"
+    return f"{seconds * 1e6:.3f} us"
+
+
+def compare(results: dict, baseline: dict, threshold: float, name_filter=None) -> list:
+
+    """
+    Prints every benchmark next to its baseline
+
+    :return: list of the names of the benchmarks slower than the baseline by more than 'threshold' (a fraction)
+    """
+
+    regressions = []
+    print(f"\n{'Benchmark':<72}{'Baseline':>14}{'Current':>14}{'Change':>10}")
+    for name, result in results["benchmarks"].items():
+        baseline_result = baseline["benchmarks"].get(name, None)
+        if baseline_result is None:
+            print(f"{name:<72}{'-':>14}{format_time(result['min']):>14}{'new':>10}")
+            continue
+
+        change = result["min"] / baseline_result["min"] - 1.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  <-- slower"
+        print(f"{name:<72}{format_time(baseline_result['min']):>14}{format_time(result['min']):>14}"
+              f"{change * 100:>+9.1f}%{flag}")
+
+    missing = sorted(name for name in baseline["benchmarks"].keys()
+                     if name not in results["benchmarks"] and (name_filter is None or name_filter in name))
+    if len(missing) > 0:
+        print(f"Not run (in the baseline only): {', '.join(missing)}")
+
+    return regressions
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=str, default=None, help="Save the results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against results saved with --output")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Slowdown, as a fraction of the baseline, reported as a regression")
+    parser.add_argument("--filter", type=str, default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum time per repeat, in seconds")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="Smaller animations and shorter repeats")
+    parser.add_argument("--backend", type=str, default=None, help="moderngl standalone backend, e.g. 'egl'")
+    args = parser.parse_args()
+
+    min_time = args.min_time if not args.quick else args.min_time / 4
+    results = {"version": RESULTS_VERSION, "metadata": get_metadata(), "benchmarks": {}, "skipped": {}}
+
+    def run_benchmarks(benchmarks):
+        for name, function in benchmarks:
+            if args.filter is not None and args.filter not in name:
+                continue
+            result = measure(function=function, min_time=min_time, repeats=args.repeats)
+            results["benchmarks"][name] = result
+            print(f"{name:<72}{format_time(result['median']):>14} (min {format_time(result['min'])})")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sizes = ANIMATION_NUM_LINES_QUICK if args.quick else ANIMATION_NUM_LINES
+        run_benchmarks(get_animation_benchmarks(temp_dir=temp_dir, sizes=sizes, name_filter=args.filter))
+    run_benchmarks(get_mesh_benchmarks())
+    run_benchmarks(get_kernel_benchmarks())
+
+    if args.filter is None or any(args.filter in name for name in RENDERABLE_BENCHMARK_NAMES):
+        engine, reason = create_headless_engine(backend=args.backend)
+        if engine is None:
+            results["skipped"]["hand/*, chessboard_plane/*"] = reason
+            print(f"Skipped hand/* and chessboard_plane/*, no OpenGL context ({reason})")
+        else:
+            run_benchmarks(get_renderable_benchmarks(engine=engine))
+            engine.shutdown()
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = compare(results=results, baseline=baseline, threshold=args.threshold, name_filter=args.filter)
+        if len(regressions) > 0:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions above {args.threshold * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measures how long TextureLibrary takes to have every texture it loads from files ready on the GPU, without the
+texture cache, with an empty cache (cold, which also fills it) and with a filled cache (warm). Runs on a
+standalone OpenGL context, so no window is needed.
+
+Usage (from the repository root):
+    python benchmarks/benchmark_textures.py --repeats 5
+    python benchmarks/benchmark_textures.py --backend egl   # Headless Linux
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import moderngl
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))  # TextureLibrary imports 'constants' directly
+
+from src.lazy_texture import LazyTexture
+from src.texture_library import TextureLibrary
+
+
+def time_startup(ctx: moderngl.Context, texture_cache_dir) -> float:
+
+    """
+    :return: Time, in seconds, to create a TextureLibrary and wait for all its file textures
+    """
+
+    start = time.perf_counter()
+    texture_library = TextureLibrary(ctx=ctx, window_size=(16, 16), texture_cache_dir=texture_cache_dir)
+    lazy_textures = [texture for texture in texture_library.textures.values() if isinstance(texture, LazyTexture)]
+
+    # Request all of them first, so they are decoded in parallel as they would be in a scene
+    for texture in lazy_textures:
+        texture.request()
+    for texture in lazy_textures:
+        texture.wait()
+    ctx.finish()
+    elapsed = time.perf_counter() - start
+
+    texture_library.destroy()
+    return elapsed
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--backend", type=str, default=None, help="moderngl standalone backend, e.g. 'egl'")
+    args = parser.parse_args()
+
+    ctx = moderngl.create_standalone_context(**({"backend": args.backend} if args.backend else {}))
+
+    # First call is excluded, so all cases are measured without one-off costs (imports, driver warm-up)
+    time_startup(ctx=ctx, texture_cache_dir=None)
+
+    times_no_cache = []
+    times_cold = []
+    times_warm = []
+    for _ in range(args.repeats):
+        times_no_cache.append(time_startup(ctx=ctx, texture_cache_dir=None))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            times_cold.append(time_startup(ctx=ctx, texture_cache_dir=cache_dir))
+            times_warm.append(time_startup(ctx=ctx, texture_cache_dir=cache_dir))
+
+    time_no_cache = float(np.median(times_no_cache))
+    time_warm = float(np.median(times_warm))
+    print(f"Texture startup (median of {args.repeats})")
+    print(f"    No cache : {time_no_cache * 1000:.1f} ms")
+    print(f"    Cold     : {float(np.median(times_cold)) * 1000:.1f} ms")
+    print(f"    Warm     : {time_warm * 1000:.1f} ms ({time_no_cache / time_warm:.1f}x faster than no cache)")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,22 +9,45 @@ from src.texture_library import TextureLibrary
 
 class RenderPass:
 
-    def __init__(self, ctx: moderngl.Context, program_name: str, texture_library: TextureLibrary):
+    def __init__(self,
+                 ctx: moderngl.Context,
+                 program_name: str,
+                 texture_library: TextureLibrary,
+                 output_framebuffer=None):
         self.ctx = ctx
         self.texture_library = texture_library
         self.program_name = program_name
+
+        # Where the final image is drawn. The window by default, or an offscreen framebuffer when headless
+        self.output_framebuffer = output_framebuffer if output_framebuffer is not None else ctx.screen
         self.program = self.load_program(program_name=program_name)
 
-    def load_program(self, program_name):
+    def load_program(self, program_name, fragment_program_name=None):
+
+        """
+        Loads '<program_name>.vert' and '<program_name>.frag' from the shaders folder. If fragment_program_name
+        is given, the fragment shader of that program is used instead, so programs that only differ in their
+        vertex stage can share it. Uniform blocks listed in constants.UNIFORM_BLOCK_BINDINGS are assigned their
+        binding points.
+        """
+
         fpath = os.path.join(constants.SHADERS_DIR, f"{program_name}.vert")
         with open(fpath, "r") as file:
             vertex_shader = file.read()
 
-        fpath = os.path.join(constants.SHADERS_DIR, f"{program_name}.frag")
+        fragment_program_name = fragment_program_name if fragment_program_name is not None else program_name
+        fpath = os.path.join(constants.SHADERS_DIR, f"{fragment_program_name}.frag")
         with open(fpath, "r") as file:
             fragment_shader = file.read()
 
         program = self.ctx.program(vertex_shader=vertex_shader, fragment_shader=fragment_shader)
+
+        # Shared per-frame state comes from uniform buffers bound by the Scene
+        for block_name, binding in constants.UNIFORM_BLOCK_BINDINGS.items():
+            block = program.get(block_name, None)
+            if block is not None:
+                block.binding = binding
+
         return program
 
     def render(self, camera: Camera, renderables: list, directional_lights=None):
@@ -1,39 +1,48 @@
 import moderngl
 
 from render_passes.render_pass import RenderPass
+from src import constants
 from src.scene import Scene
 from src.camera import Camera
+from src.render_stats import render_stats
 
 
 class RenderPassForward(RenderPass):
 
+    # Instanced renderables need a program that reads the model matrix from a vertex attribute
+    render_instanced = False
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-    def render(self, camera: Camera, renderables: list, directional_light=None):
+        # Uniform handles are looked up once, instead of by name every frame. Camera and light state come from
+        # the uniform buffers of the Scene (see Scene.update_uniform_buffers())
+        self.uniform_model = self.program.get('m_model', None)
+        self.uniform_normal = self.program.get('m_normal', None)
+        self.uniform_shadow_map = self.program.get('shadowMap', None)
+        if self.uniform_shadow_map is not None:
+            self.uniform_shadow_map.value = constants.SHADOW_MAP_TEXTURE_UNIT
 
+    def render(self, camera: Camera, renderables: list, directional_light=None):
 
-        # Prepare to render directly to the screen
-        self.ctx.screen.use()
+        # Prepare to render directly to the screen (or the offscreen framebuffer, when headless)
+        self.output_framebuffer.use()
 
         self.ctx.enable_only(moderngl.DEPTH_TEST | moderngl.CULL_FACE)
 
-        # Only working with one light for now
-        if directional_light:
-            self.program['light.position'].write(directional_light.position)
-            self.program['light.Ia'].write(directional_light.Ia)
-            self.program['light.Id'].write(directional_light.Id)
-            self.program['light.Is'].write(directional_light.Is)
-
-        # Set camera
-        self.program['m_proj'].write(camera.projection_matrix)
-        self.program['m_view'].write(camera.view_matrix)
+        # Shadows (see RenderPassShadow)
+        shadow_map = self.texture_library.textures.get("shadow_map", None)
+        if shadow_map is not None:
+            shadow_map.use(location=constants.SHADOW_MAP_TEXTURE_UNIT)
 
         # Render objects
         for renderable in renderables:
 
-            self.program['m_model'].write(renderable.world_matrix)
-            renderable.render(program_name=self.program_name)
-
+            if renderable.instanced != self.render_instanced:
+                continue
 
-    
\ No newline at end of file
+            if not renderable.instanced:
+                self.uniform_model.write(renderable.world_matrix)
+                self.uniform_normal.write(renderable.normal_matrix)
+                render_stats.uniform_writes += 2
+            renderable.render(program_name=self.program_name)
@@ -0,0 +1,17 @@
+from render_passes.render_pass_forward import RenderPassForward
+
+
+class RenderPassForwardInstanced(RenderPassForward):
+
+    """
+    Same as RenderPassForward, but only draws instanced renderables, each with a single draw call
+    """
+
+    render_instanced = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    def load_program(self, program_name, fragment_program_name=None):
+        # Instancing only changes how vertices are transformed, so the lighting is shared with 'default_color'
+        return super().load_program(program_name=program_name, fragment_program_name="default_color")
@@ -1,28 +1,60 @@
-from render_passes.render_pass import RenderPass
+import moderngl
 
+from render_passes.render_pass import RenderPass
+from src import constants
 from src.scene import Scene
 from src.camera import Camera
+from src.render_stats import render_stats
 
 
 class RenderPassShadow(RenderPass):
 
+    """
+    Draws the depth of every renderable that casts shadows, as seen from the directional light, into the shadow
+    map. The map is registered as "shadow_map" in the TextureLibrary, so that the forward passes can sample it,
+    and the light frustum is fitted every frame to the bounds of the shadow casters (see
+    Scene.fit_shadow_frustum()), so no resolution is wasted on the floor around them.
+    """
+
+    # Instanced renderables need a program that reads the model matrix from a vertex attribute
+    render_instanced = False
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        self.depth_texture = self.ctx.depth_texture((2048, 2048))
-        self.depth_texture.repeat_x = False
-        self.depth_texture.repeat_y = False
+        # Shared by the instanced and non-instanced shadow passes
+        if "shadow_map" not in self.texture_library.textures:
+            depth_texture = self.ctx.depth_texture(constants.SHADOW_MAP_SIZE)
+            depth_texture.repeat_x = False
+            depth_texture.repeat_y = False
+            self.texture_library.textures["shadow_map"] = depth_texture
+
+        self.depth_texture = self.texture_library.textures["shadow_map"]
         self.depth_fbo = self.ctx.framebuffer(depth_attachment=self.depth_texture)
 
+        # Uniform handles are looked up once, instead of by name for every renderable
+        self.uniform_model = self.program.get('m_model', None)
+
     def render(self, camera: Camera, renderables: list, directional_light=None):
 
+        if directional_light is None:
+            return
+
+        # The first shadow pass of the frame clears the map. The light matrices come from the LightBlock, fitted
+        # to the shadow casters by the Scene (see Scene.fit_shadow_frustum())
+        if not self.render_instanced:
+            self.depth_fbo.clear()
+
         # Shadow pass
-        self.depth_fbo.clear()
         self.depth_fbo.use()
+        self.ctx.enable_only(moderngl.DEPTH_TEST)
 
         for renderable in renderables:
-            renderable.render_shadow()
-
-
 
+            if renderable.instanced != self.render_instanced or not renderable.casts_shadows:
+                continue
 
+            if not renderable.instanced:
+                self.uniform_model.write(renderable.world_matrix)
+                render_stats.uniform_writes += 1
+            renderable.render_shadow(program_name=self.program_name)
@@ -0,0 +1,18 @@
+from render_passes.render_pass_shadow import RenderPassShadow
+
+
+class RenderPassShadowInstanced(RenderPassShadow):
+
+    """
+    Same as RenderPassShadow, but only draws instanced renderables, into the same shadow map. It must come
+    after RenderPassShadow, which clears the map and fits the light frustum
+    """
+
+    render_instanced = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    def load_program(self, program_name, fragment_program_name=None):
+        # Depth only, so the fragment shader is shared with 'shadow_map'
+        return super().load_program(program_name=program_name, fragment_program_name="shadow_map")
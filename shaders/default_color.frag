@@ -4,31 +4,60 @@ layout (location = 0) out vec4 fragColor;
 
 in vec3 normal;
 in vec3 fragPos;
+in vec3 localPos;
+in vec2 uv;
 in vec3 color;
 in vec4 shadowCoord;
 
-struct Light {
+// Per-frame state, written once per frame by the Scene (see Scene.update_uniform_buffers())
+layout (std140) uniform CameraBlock {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_proj;  // m_proj * m_view
+    vec3 position;
+} camera;
+
+layout (std140) uniform LightBlock {
     vec3 position;
     vec3 Ia;
     vec3 Id;
     vec3 Is;
-};
+    mat4 m_view_proj_light;  // Orthographic projection * view of the light
+    mat4 m_shadow;  // Same as m_view_proj_light, but mapped to shadow map coordinates in [0, 1]
+    int shadow_pcf_taps;  // 1, 4, 16 or 64 (see constants.SHADOW_PCF_TAPS_OPTIONS)
+} light;
 
-uniform Light light;
-uniform vec3 camPos;
 uniform sampler2DShadow shadowMap;
-uniform vec2 u_resolution;
+
+// Procedural chessboard pattern (see ChessboardPlane). The vertex color is used for the light squares
+uniform float checker_square_size = 0.0;  // 0 disables the pattern
+uniform float checker_plane_size;
+uniform vec3 checker_axis_u;
+uniform vec3 checker_axis_v;
+uniform vec3 checker_color_dark;
+
+// Textured meshes (see ObjBinMesh). The texture replaces the vertex color
+uniform bool use_texture = false;
+uniform sampler2D texture_diffuse;
+uniform vec3 material_diffuse = vec3(1.0);
+
+
+vec3 getCheckerColor(vec3 color) {
+    vec2 planeCoords = vec2(dot(localPos, checker_axis_u), dot(localPos, checker_axis_v));
+    vec2 square = floor((planeCoords + 0.5 * checker_plane_size) / checker_square_size);
+    return mod(square.x + square.y, 2.0) < 0.5 ? color : checker_color_dark;
+}
 
 
 float lookup(float ox, float oy) {
-    vec2 pixelOffset = 1 / u_resolution;
+    vec2 pixelOffset = 1.0 / vec2(textureSize(shadowMap, 0));
     return textureProj(shadowMap, shadowCoord + vec4(ox * pixelOffset.x * shadowCoord.w,
                                                      oy * pixelOffset.y * shadowCoord.w, 0.0, 0.0));
 }
 
 
 float getSoftShadowX4() {
-    float shadow;
+    float shadow = 0.0;
     float swidth = 1.5;  // shadow spread
     vec2 offset = mod(floor(gl_FragCoord.xy), 2.0) * swidth;
     shadow += lookup(-1.5 * swidth + offset.x, 1.5 * swidth - offset.y);
@@ -41,7 +70,7 @@ float getSoftShadowX4() {
 
 
 float getSoftShadowX16() {
-    float shadow;
+    float shadow = 0.0;
     float swidth = 1.0;
     float endp = swidth * 1.5;
     for (float y = -endp; y <= endp; y += swidth) {
@@ -54,7 +83,7 @@ float getSoftShadowX16() {
 
 
 float getSoftShadowX64() {
-    float shadow;
+    float shadow = 0.0;
     float swidth = 0.6;
     float endp = swidth * 3.0 + swidth / 2.0;
     for (float y = -endp; y <= endp; y += swidth) {
@@ -72,6 +101,26 @@ float getShadow() {
 }
 
 
+float getShadowPCF() {
+    // The light frustum is fitted to the shadow casters, so anything outside of it is lit
+    vec3 coord = shadowCoord.xyz / shadowCoord.w;
+    if (any(lessThan(coord.xy, vec2(0.0))) || any(greaterThan(coord.xy, vec2(1.0))) || coord.z > 1.0) {
+        return 1.0;
+    }
+
+    if (light.shadow_pcf_taps >= 64) {
+        return getSoftShadowX64();
+    }
+    if (light.shadow_pcf_taps >= 16) {
+        return getSoftShadowX16();
+    }
+    if (light.shadow_pcf_taps >= 4) {
+        return getSoftShadowX4();
+    }
+    return getShadow();
+}
+
+
 vec3 getLight(vec3 color) {
     vec3 Normal = normalize(normal);
 
@@ -84,14 +133,13 @@ vec3 getLight(vec3 color) {
     vec3 diffuse = diff * light.Id;
 
     // specular light
-    vec3 viewDir = normalize(camPos - fragPos);
+    vec3 viewDir = normalize(camera.position - fragPos);
     vec3 reflectDir = reflect(-lightDir, Normal);
     float spec = pow(max(dot(viewDir, reflectDir), 0), 32);
     vec3 specular = spec * light.Is;
 
     // shadow
-//    float shadow = getShadow();
-    float shadow = getSoftShadowX16();
+    float shadow = getShadowPCF();
 
     return color * (ambient + (diffuse + specular) * shadow);
 }
@@ -99,7 +147,11 @@ vec3 getLight(vec3 color) {
 
 void main() {
     float gamma = 2.2;
-    vec3 final_color = pow(color, vec3(gamma));
+    vec3 base_color = checker_square_size > 0.0 ? getCheckerColor(color) : color;
+    if (use_texture) {
+        base_color = texture(texture_diffuse, uv).rgb * material_diffuse;
+    }
+    vec3 final_color = pow(base_color, vec3(gamma));
 
     final_color = getLight(final_color);
 
@@ -3,32 +3,46 @@
 layout (location = 0) in vec3 in_position;
 layout (location = 1) in vec3 in_normal;
 layout (location = 2) in vec3 in_color;
+layout (location = 3) in vec2 in_uv;  // Only for textured meshes
 
 out vec3 normal;
 out vec3 color;
 out vec3 fragPos;
+out vec3 localPos;
+out vec2 uv;
 out vec4 shadowCoord;
 
-uniform mat4 m_proj;
-uniform mat4 m_view;
-uniform mat4 m_view_light;
-uniform mat4 m_model;
+// Per-frame state, written once per frame by the Scene (see Scene.update_uniform_buffers())
+layout (std140) uniform CameraBlock {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_proj;  // m_proj * m_view
+    vec3 position;
+} camera;
+
+layout (std140) uniform LightBlock {
+    vec3 position;
+    vec3 Ia;
+    vec3 Id;
+    vec3 Is;
+    mat4 m_view_proj_light;  // Orthographic projection * view of the light
+    mat4 m_shadow;  // Same as m_view_proj_light, but mapped to shadow map coordinates in [0, 1]
+    int shadow_pcf_taps;  // 1, 4, 16 or 64 (see constants.SHADOW_PCF_TAPS_OPTIONS)
+} light;
 
-mat4 m_shadow_bias = mat4(
-    0.5, 0.0, 0.0, 0.0,
-    0.0, 0.5, 0.0, 0.0,
-    0.0, 0.0, 0.5, 0.0,
-    0.5, 0.5, 0.5, 1.0
-);
+uniform mat4 m_model;
+uniform mat3 m_normal;  // Inverse transpose of m_model, computed on the CPU (see Renderable.calculate_normal_matrix())
 
 
 void main() {
-    fragPos = vec3(m_model * vec4(in_position, 1.0));
-    normal = mat3(transpose(inverse(m_model))) * normalize(in_normal);
+    localPos = in_position;
+    uv = in_uv;
+    vec4 worldPos = m_model * vec4(in_position, 1.0);
+    fragPos = worldPos.xyz;
+    normal = m_normal * in_normal;
     color = in_color;
-    gl_Position = m_proj * m_view * m_model * vec4(in_position, 1.0);
+    gl_Position = camera.m_view_proj * worldPos;
 
-    mat4 shadowMVP = m_proj * m_view_light * m_model;
-    shadowCoord = m_shadow_bias * shadowMVP * vec4(in_position, 1.0);
+    shadowCoord = light.m_shadow * worldPos;
     shadowCoord.z -= 0.0005;
-}
\ No newline at end of file
+}
@@ -0,0 +1,46 @@
+#version 330 core
+
+layout (location = 0) in vec3 in_position;
+layout (location = 1) in vec3 in_normal;
+layout (location = 2) in vec3 in_color;
+layout (location = 3) in mat4 in_instance_model;  // Takes locations 3 to 6
+layout (location = 7) in mat3 in_instance_normal;  // Takes locations 7 to 9. Inverse transpose of in_instance_model
+
+out vec3 normal;
+out vec3 color;
+out vec3 fragPos;
+out vec3 localPos;
+out vec2 uv;
+out vec4 shadowCoord;
+
+// Per-frame state, written once per frame by the Scene (see Scene.update_uniform_buffers())
+layout (std140) uniform CameraBlock {
+    mat4 m_proj;
+    mat4 m_view;
+    mat4 m_view_proj;  // m_proj * m_view
+    vec3 position;
+} camera;
+
+layout (std140) uniform LightBlock {
+    vec3 position;
+    vec3 Ia;
+    vec3 Id;
+    vec3 Is;
+    mat4 m_view_proj_light;  // Orthographic projection * view of the light
+    mat4 m_shadow;  // Same as m_view_proj_light, but mapped to shadow map coordinates in [0, 1]
+    int shadow_pcf_taps;  // 1, 4, 16 or 64 (see constants.SHADOW_PCF_TAPS_OPTIONS)
+} light;
+
+
+void main() {
+    localPos = in_position;
+    uv = vec2(0.0);
+    vec4 worldPos = in_instance_model * vec4(in_position, 1.0);
+    fragPos = worldPos.xyz;
+    normal = in_instance_normal * in_normal;
+    color = in_color;
+    gl_Position = camera.m_view_proj * worldPos;
+
+    shadowCoord = light.m_shadow * worldPos;
+    shadowCoord.z -= 0.0005;
+}
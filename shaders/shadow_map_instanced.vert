@@ -0,0 +1,20 @@
+#version 330 core
+
+layout (location = 0) in vec3 in_position;
+layout (location = 3) in mat4 in_instance_model;  // Takes locations 3 to 6
+
+// Same block as in default_color (see Scene.update_uniform_buffers())
+layout (std140) uniform LightBlock {
+    vec3 position;
+    vec3 Ia;
+    vec3 Id;
+    vec3 Is;
+    mat4 m_view_proj_light;  // Orthographic projection * view of the light
+    mat4 m_shadow;  // Same as m_view_proj_light, but mapped to shadow map coordinates in [0, 1]
+    int shadow_pcf_taps;  // 1, 4, 16 or 64 (see constants.SHADOW_PCF_TAPS_OPTIONS)
+} light;
+
+void main() {
+    mat4 mvp = light.m_view_proj_light * in_instance_model;
+    gl_Position = mvp * vec4(in_position, 1.0);
+}
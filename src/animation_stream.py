@@ -0,0 +1,62 @@
+import numpy as np
+
+from src import constants
+from src.utilities import utils_io
+
+
+class AnimationStream:
+
+    """
+    Plays a terminal dump animation without loading it all in memory. Only a small window of keyframes is kept
+    at any time: the last keyframe of the previous chunk followed by the current chunk, so that any timestamp
+    inside the window can be interpolated, even across chunk boundaries.
+
+    The window moves forward by pulling chunks from utils_io.iter_hand_animation_chunks(). Seeking backwards
+    restarts the generator from the beginning of the file.
+    """
+
+    def __init__(self,
+                 txt_fpath: str,
+                 chunk_size=constants.ANIMATION_CHUNK_SIZE,
+                 use_uniform_timestamps=True):
+
+        self.txt_fpath = txt_fpath
+        self.chunk_size = chunk_size
+        self.use_uniform_timestamps = use_uniform_timestamps
+
+        self.num_records, self.duration = utils_io.scan_hand_animation(txt_fpath=txt_fpath)
+
+        self.chunks = None
+        self.timestamps = None
+        self.joint_values = None
+        self.window_offset = 0  # Index of the first keyframe of the window in the whole recording
+        self.rewind()
+
+    def rewind(self):
+        self.chunks = utils_io.iter_hand_animation_chunks(txt_fpath=self.txt_fpath,
+                                                          chunk_size=self.chunk_size,
+                                                          use_uniform_timestamps=self.use_uniform_timestamps)
+        self.timestamps, self.joint_values = next(self.chunks)
+        self.window_offset = 0
+
+    def seek(self, timestamp: float):
+
+        """
+        Moves the window so that it contains 'timestamp'. After this call, self.timestamps and
+        self.joint_values can be used as if they were the whole animation.
+
+        :param timestamp: Playback time in seconds
+        """
+
+        if timestamp < self.timestamps[0]:
+            self.rewind()
+
+        while timestamp > self.timestamps[-1]:
+            next_chunk = next(self.chunks, None)
+            if next_chunk is None:
+                return  # End of the recording, keep the last window
+
+            next_timestamps, next_joint_values = next_chunk
+            self.window_offset += self.timestamps.size - 1
+            self.timestamps = np.concatenate([self.timestamps[-1:], next_timestamps])
+            self.joint_values = np.concatenate([self.joint_values[-1:], next_joint_values], axis=0)
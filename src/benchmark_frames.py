@@ -0,0 +1,174 @@
+"""
+Measures how long the viewer takes per frame, to compare rendering changes against one reproducible number per
+configuration. A recording is played through Hand (or HandGroup, for several hands) for a fixed number of frames,
+as fast as possible: vsync off and no frame cap, with the camera fixed at its default position (keyboard and
+mouse are ignored). Frames are timed by the FrameProfiler, after a few warm-up frames that are not measured.
+
+Reports the mean and percentiles of the CPU time per frame, the GPU time of the render passes (timer queries),
+and the draw calls, uniform writes and buffer writes per frame (see RenderStats).
+
+Usage (from the repository root):
+    python src/benchmark_frames.py                                          # Window, vsync off
+    python src/benchmark_frames.py --offscreen --backend egl                # No display needed
+    python src/benchmark_frames.py --offscreen --hands 16 --pcf 64 --width 1920 --height 1080
+    python src/benchmark_frames.py --offscreen --output results.json
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+import glfw
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))  # Same imports as main.py
+
+from hand import Hand
+from hand_group import HandGroup
+from engine import Engine
+from frame_profiler import FrameProfiler
+
+import constants
+
+COUNTER_NAMES = ("draw_calls", "uniform_writes", "buffer_writes")  # See Scene.render()
+
+
+def create_hands(engine: Engine, num_hands: int, config_fpath: str, animation_fpath: str, use_instancing=False):
+
+    """
+    :return: Hand, or HandGroup if there is more than one hand, already playing the animation
+    """
+
+    if num_hands == 1:
+        hands = Hand(engine=engine,
+                     hand_config_yaml_fpath=config_fpath,
+                     hand_animation_txt_fpath=animation_fpath,
+                     use_instancing=use_instancing)
+    else:
+        hands = HandGroup(engine=engine,
+                          hand_config_yaml_fpaths=[config_fpath],
+                          hand_animation_txt_fpaths=[animation_fpath] * num_hands)
+
+    hands.play_animation = True
+    return hands
+
+
+def get_results(profiler: FrameProfiler, num_frames: int) -> dict:
+
+    """
+    :return: dict with the statistics of the last 'num_frames' frames. Times are in milliseconds
+    """
+
+    profiler.flush()
+    frames = np.arange(profiler.frame - num_frames, profiler.frame)
+    frame_times = profiler.get_samples(name=FrameProfiler.FRAME)[-num_frames:] * 1000.0
+    gpu_times = np.array([profiler.get_gpu_time(frame=frame) for frame in frames], dtype=np.float64) * 1000.0
+
+    def get_time_stats(times: np.ndarray) -> dict:
+        if np.all(np.isnan(times)):
+            return None
+        percentiles = np.nanpercentile(times, constants.FRAME_BENCHMARK_PERCENTILES)
+        stats = {"mean": float(np.nanmean(times))}
+        stats.update({f"p{p}": float(value) for p, value in zip(constants.FRAME_BENCHMARK_PERCENTILES, percentiles)})
+        return stats
+
+    results = {"num_frames": num_frames,
+               "frame_time_ms": get_time_stats(frame_times),
+               "gpu_time_ms": get_time_stats(gpu_times)}
+    for name in COUNTER_NAMES:
+        counts = profiler.get_samples(name=name, counter=True)[-num_frames:]
+        results[f"{name}_per_frame"] = float(np.nanmean(counts)) if not np.all(np.isnan(counts)) else 0.0
+
+    return results
+
+
+def format_time_stats(stats: dict) -> str:
+    if stats is None:
+        return "-"
+    return "  ".join(f"{key} {value:.3f}" for key, value in stats.items())
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hands", type=int, default=1, help="Number of hands, more than one uses a HandGroup")
+    parser.add_argument("--pcf", type=int, default=constants.SHADOW_PCF_TAPS_DEFAULT,
+                        choices=constants.SHADOW_PCF_TAPS_OPTIONS, help="Shadow samples per fragment")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--num-frames", type=int, default=constants.FRAME_BENCHMARK_NUM_FRAMES)
+    parser.add_argument("--warmup-frames", type=int, default=constants.FRAME_BENCHMARK_WARMUP_FRAMES)
+    parser.add_argument("--instancing", action="store_true", help="Draw the joints of a single hand instanced")
+    parser.add_argument("--offscreen", action="store_true", help="Render without a window (see Engine.run_headless())")
+    parser.add_argument("--backend", type=str, default=None,
+                        help="moderngl standalone backend when offscreen, e.g. 'egl'")
+    parser.add_argument("--animation", type=str, default=os.path.join(constants.DATA_DIR, "animation_1.txt"))
+    parser.add_argument("--config", type=str, default=os.path.join(constants.CONFIG_DIR, "default_hand.yaml"))
+    parser.add_argument("--output", type=str, default=None, help="Also save the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.hands < 1:
+        raise ValueError(f"[ERROR] Need at least one hand, got {args.hands}")
+
+    # Every measured frame must stay in the history of the profiler. Offscreen, run_headless() renders an extra
+    # first frame before the warm-up ones
+    num_total_frames = args.warmup_frames + args.num_frames
+    engine = Engine(window_size=(args.width, args.height),
+                    vertical_sync=False,
+                    log_level="warning",
+                    headless=args.offscreen,
+                    headless_backend=args.backend,
+                    profiler_history_size=num_total_frames + 1)
+    engine.scene.directional_light.shadow_pcf_taps = args.pcf
+    renderer = engine.ctx.info["GL_RENDERER"]
+
+    if not args.offscreen:
+        # Fixed camera
+        glfw.set_key_callback(engine.window_glfw, None)
+        glfw.set_cursor_pos_callback(engine.window_glfw, None)
+        glfw.set_mouse_button_callback(engine.window_glfw, None)
+
+    create_hands(engine=engine,
+                 num_hands=args.hands,
+                 config_fpath=args.config,
+                 animation_fpath=args.animation,
+                 use_instancing=args.instancing)
+
+    if args.offscreen:
+        engine.run_headless(num_frames=num_total_frames)
+    else:
+        engine.run(num_frames=num_total_frames)
+
+    num_measured = min(args.num_frames, max(engine.profiler.frame - args.warmup_frames, 0))
+    if num_measured == 0:
+        raise ValueError("[ERROR] Stopped before any frame could be measured")
+
+    results = get_results(profiler=engine.profiler, num_frames=num_measured)
+    results["configuration"] = {"hands": args.hands,
+                                "pcf_taps": args.pcf,
+                                "window_size": [args.width, args.height],
+                                "instancing": args.instancing or args.hands > 1,
+                                "offscreen": args.offscreen,
+                                "renderer": renderer,
+                                "animation": os.path.basename(args.animation)}
+    results["date"] = datetime.now().isoformat(timespec="seconds")
+
+    frame_time_stats = results["frame_time_ms"]
+    print(f"{args.hands} hand(s), PCF {args.pcf}x, {args.width}x{args.height}, "
+          f"{'offscreen' if args.offscreen else 'window'}, {renderer}")
+    print(f"Frame time (ms) : {format_time_stats(frame_time_stats)}  ({1000.0 / frame_time_stats['mean']:.1f} fps)")
+    print(f"GPU time (ms)   : {format_time_stats(results['gpu_time_ms'])}")
+    print(f"Per frame       : " + ", ".join(f"{results[f'{name}_per_frame']:.0f} {name.replace('_', ' ')}"
+                                            for name in COUNTER_NAMES))
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
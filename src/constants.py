@@ -12,6 +12,7 @@ DATA_DIR = os.path.join(ROOT_DIR, "data")
 CONFIG_DIR = os.path.join(ROOT_DIR, "config")
 SHADERS_DIR = os.path.join(ROOT_DIR, "shaders")
 TEXTURES_DIR = os.path.join(ROOT_DIR, "textures")
+OBJECTS_DIR = os.path.join(ROOT_DIR, "objects")
 
 # Logging
 LOGGING_MAP = {
@@ -60,6 +61,11 @@ KEY_LEFT_ALT = 56
 # ===============================================================================
 TERMINAL_RE_PATTERN = (r"datetime\.datetime\((\d{4}, \d{1,2}, \d{1,2}, \d{1,2}, "
                        r"\d{1,2}, \d{1,2}, \d{1,6})\), \[([-\d\., ']+)\]")
+TERMINAL_DATETIME_PREFIX = b"datetime.datetime"
+TERMINAL_DATETIME_NUM_FIELDS = 7  # year, month, day, hour, minute, second, microsecond
+TERMINAL_DELETE_CHARS = b"[]()' "  # Removing these leaves one comma-separated row of numbers per record
+
+HAND_SCALE = 35  # Hand configurations are in meters, which is too small for the scene
 
 FINGER_NAMES = [
     "thumb",
@@ -120,6 +126,26 @@ JOINT_NAMES = [
     PINKY_DIP_X
 ]
 
+# Extra column added by the thumb fix when loading an animation
+THUMB_CMC_Z = "thumb_cmc_z"
+THUMB_CMC_Z_DEGREES = -90.0
+
+# Columns of a loaded animation, excluding timestamps (same order as the DataFrame)
+ANIMATION_COLUMN_NAMES = JOINT_NAMES + [THUMB_CMC_Z]
+
+# Number of records per chunk when streaming an animation
+ANIMATION_CHUNK_SIZE = 4096
+
+# Binary sidecar cache of parsed animations
+ANIMATION_CACHE_EXTENSION = ".animcache"
+ANIMATION_CACHE_MAGIC = b"HANDANIM"
+ANIMATION_CACHE_VERSION = 1  # Increase this whenever the layout of the cache changes
+ANIMATION_CACHE_ALIGNMENT = 64  # bytes
+
+# Layout of the hands of a HandGroup, placed in rows along X
+HAND_GROUP_SPACING = 10.0
+HAND_GROUP_NUM_COLUMNS = 8
+
 RENDERABLES_PARENT_CHILD = [
     ("root", "thumb_cmc"),
     ("thumb_cmc", "thumb_mcp"),
@@ -174,6 +200,24 @@ KEY_PRIMITIVE_NORMALS = "normals"
 KEY_PRIMITIVE_UVS = "uvs"
 KEY_PRIMITIVE_COLORS = "colors"
 KEY_PRIMITIVE_INDICES = "indices"
+KEY_PRIMITIVE_INTERLEAVED = "interleaved"  # Structured array ready to be uploaded as a VBO
+
+# Mesh data used by each vertex shader input, when interleaving vertex buffers
+VERTEX_ATTRIBUTE_KEYS = {
+    "in_position": KEY_PRIMITIVE_VERTICES,
+    "in_normal": KEY_PRIMITIVE_NORMALS,
+    "in_color": KEY_PRIMITIVE_COLORS,
+    "in_uv": KEY_PRIMITIVE_UVS,
+}
+
+# Preprocessed meshes (.obj.bin + .obj.json)
+OBJ_BIN_VERTEX_ATTRIBUTES = {"T": "in_uv", "N": "in_normal", "V": "in_position", "C": "in_color"}
+OBJ_BIN_RAW_EXTENSION = ".raw"  # Uncompressed copy of gzip-compressed .obj.bin files
+GZIP_MAGIC = b"\x1f\x8b"
+DIFFUSE_TEXTURE_UNIT = 1  # Unit 0 is left for the shadow map
+
+DEFAULT_VERTEX_FORMAT = "3f 3f 3f"
+DEFAULT_VERTEX_ATTRIBUTES = ["in_position", "in_normal", "in_color"]
 
 KEY_SHAPE_CYLINDER = "cylinder"
 KEY_SHAPE_BOX = "box"
@@ -186,4 +230,57 @@ DEFAULT_HEIGHT = 1.0
 DEFAULT_COLOR = (1.0, 1.0, 1.0)
 DEFAULT_CYLINDER_SECTIONS = 16  # Pie wedges
 DEFAULT_CYLINDER_SEGMENTS = 1
-DEFAULT_SUBDIVISIONS = 2
\ No newline at end of file
+DEFAULT_SUBDIVISIONS = 2
+
+# Primitive mesh cache (see meshes_3d.PrimitiveCache)
+MESH_CACHE_DIR = os.path.join(ROOT_DIR, ".cache", "meshes")
+MESH_CACHE_MAX_ENTRIES = 256
+MESH_CACHE_VERSION = 2  # Increase this whenever the generated geometry changes
+
+# Texture loading (see TextureLibrary and LazyTexture)
+TEXTURE_LOADER_NUM_WORKERS = 4
+TEXTURE_PLACEHOLDER_COLOR = (128, 128, 128)  # Bound until a texture has been decoded
+
+# Decoded texture cache (see TextureCache)
+TEXTURE_CACHE_DIR = os.path.join(ROOT_DIR, ".cache", "textures")
+TEXTURE_CACHE_MAGIC = b"TEXC"
+TEXTURE_CACHE_VERSION = 1  # Increase this whenever the cached pixels change (e.g. flips or mipmap filter)
+
+# Shadows (see RenderPassShadow and DirectionalLight.fit_shadow_frustum())
+SHADOW_MAP_SIZE = (2048, 2048)
+SHADOW_MAP_TEXTURE_UNIT = 0
+SHADOW_PCF_TAPS_OPTIONS = (1, 4, 16, 64)  # Samples per fragment, trading quality for fill-rate
+SHADOW_PCF_TAPS_DEFAULT = 16
+SHADOW_FRUSTUM_MARGIN = 0.05  # Fraction of the size of the shadow casters added around them
+
+# Uniform blocks shared by all programs, updated once per frame (see Scene.update_uniform_buffers())
+UNIFORM_BLOCK_BINDINGS = {"CameraBlock": 0, "LightBlock": 1}
+CAMERA_BLOCK_SIZE = 52  # floats (std140): m_proj, m_view, m_view_proj, position
+LIGHT_BLOCK_SIZE = 52  # floats (std140): position, Ia, Id, Is, m_view_proj_light, m_shadow, shadow_pcf_taps
+
+
+# Headless rendering (see Engine.run_headless() and FrameReadback)
+HEADLESS_FRAME_COMPONENTS = 3  # Raw RGB frames, e.g. for ffmpeg's '-f rawvideo -pix_fmt rgb24'
+HEADLESS_READBACK_NUM_BUFFERS = 2  # Frames in flight between rendering and reading them on the CPU
+HEADLESS_DEFAULT_FPS = 60
+
+# Live glove data (see GloveStream)
+GLOVE_STREAM_ADDRESS = "udp://127.0.0.1:45454"  # Or 'unix://<path>'
+GLOVE_RING_BUFFER_CAPACITY = 1024  # Poses kept, several seconds at the rate of the glove
+GLOVE_SOCKET_TIMEOUT = 0.1  # seconds, how often the receiver thread checks whether it has been stopped
+
+# Glove-to-photon latency (see LatencyMonitor)
+LATENCY_WINDOW_SIZE = 600  # Frames the rolling percentiles are computed over
+LATENCY_PERCENTILES = (50, 95, 99)
+LATENCY_LOG_FPATH = os.path.join(ROOT_DIR, "logs", "latency.csv")
+
+# Frame profiler (see FrameProfiler)
+PROFILER_HISTORY_SIZE = 300  # Frames whose timings are kept
+PROFILER_QUERY_FRAMES_IN_FLIGHT = 3  # Frames before a GPU timer query is read, so reading it does not stall
+PROFILER_PERCENTILES = (50, 95, 99)
+PROFILER_STATS_INTERVAL = 30  # Frames between updates of the statistics shown in the overlay
+
+# Frame-time benchmark (see benchmark_frames.py)
+FRAME_BENCHMARK_NUM_FRAMES = 1000
+FRAME_BENCHMARK_WARMUP_FRAMES = 60  # Not measured: shader compilation, first uploads, driver caches, ...
+FRAME_BENCHMARK_PERCENTILES = (50, 95, 99)
\ No newline at end of file
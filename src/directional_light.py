@@ -1,4 +1,14 @@
 import glm
+import numpy as np
+
+from src import constants
+from src import mat4
+
+# Maps clip coordinates in [-1, 1] to shadow map coordinates in [0, 1]
+SHADOW_BIAS_MATRIX = np.array([[0.5, 0.0, 0.0, 0.5],
+                               [0.0, 0.5, 0.0, 0.5],
+                               [0.0, 0.0, 0.5, 0.5],
+                               [0.0, 0.0, 0.0, 1.0]], dtype=np.float32)
 
 
 class DirectionalLight:
@@ -16,5 +26,59 @@ class DirectionalLight:
         # view matrix
         self.m_view_light = self.get_view_matrix()
 
-    def get_view_matrix(self):
-        return glm.lookAt(self.position, self.direction, glm.vec3(0, 1, 0))
\ No newline at end of file
+        # Shadows. The projection is replaced every frame by fit_shadow_frustum()
+        self.shadow_pcf_taps = constants.SHADOW_PCF_TAPS_DEFAULT
+        self.m_proj_light = mat4.orthographic_projection(-10.0, 10.0, -10.0, 10.0, 0.1, 100.0)
+
+        # Column-major (OpenGL layout) products, ready to be written to the shaders (see update_shadow_matrices())
+        self.m_view_proj_light_gl = None
+        self.m_shadow_gl = None
+        self.update_shadow_matrices()
+
+    def get_view_matrix(self) -> np.ndarray:
+
+        """
+        :return: numpy ndarray (4, 4) <float32>, row-major, same as glm.lookAt(position, direction, up)
+        """
+
+        return mat4.look_at_inverse(position=np.array(self.position, dtype=np.float32),
+                                    target=np.array(self.direction, dtype=np.float32),
+                                    up=np.array([0, 1, 0], dtype=np.float32)).astype(np.float32)
+
+    def fit_shadow_frustum(self, caster_bounds: np.ndarray, receiver_bounds=None):
+
+        """
+        Fits the orthographic projection of the light tightly around everything that casts shadows, so the whole
+        shadow map is spent on them. Receivers (e.g. the floor) only push the far plane back, so that they are
+        still inside the depth range without taking any resolution from the casters.
+
+        :param caster_bounds: numpy ndarray (2, 3), world-space bounding box of the shadow casters
+        :param receiver_bounds: numpy ndarray (2, 3), world-space bounding box of the shadow receivers, or None
+        """
+
+        light_bounds = mat4.transform_bounds(matrices=self.m_view_light, bounds=caster_bounds)
+        margin = (light_bounds[1] - light_bounds[0]) * constants.SHADOW_FRUSTUM_MARGIN + 1e-3
+        light_bounds[0] -= margin
+        light_bounds[1] += margin
+
+        # The light looks down -Z, so the near plane is at the largest Z
+        near = -light_bounds[1, 2]
+        far = -light_bounds[0, 2]
+        if receiver_bounds is not None:
+            receiver_light_bounds = mat4.transform_bounds(matrices=self.m_view_light, bounds=receiver_bounds)
+            far = max(far, -receiver_light_bounds[0, 2] + margin[2])
+
+        self.m_proj_light = mat4.orthographic_projection(light_bounds[0, 0], light_bounds[1, 0],
+                                                         light_bounds[0, 1], light_bounds[1, 1],
+                                                         near, far)
+        self.update_shadow_matrices()
+
+    def update_shadow_matrices(self):
+
+        """
+        Combines the light matrices once per frame, so that the shaders do not multiply them for every vertex
+        """
+
+        m_view_proj_light = self.m_proj_light @ self.m_view_light
+        self.m_view_proj_light_gl = np.ascontiguousarray(m_view_proj_light.T, dtype=np.float32)
+        self.m_shadow_gl = np.ascontiguousarray((SHADOW_BIAS_MATRIX @ m_view_proj_light).T, dtype=np.float32)
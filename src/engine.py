@@ -15,6 +15,9 @@ from camera import Camera
 from scene import Scene
 from directional_light import DirectionalLight
 from texture_library import TextureLibrary
+from frame_readback import FrameReadback
+from frame_profiler import FrameProfiler
+from latency_monitor import LatencyMonitor
 from utilities import utils_logging
 
 # Renderables
@@ -22,10 +25,14 @@ from src.renderables.mesh import Mesh
 from src.renderables.chessboard_plane import ChessboardPlane
 from src.renderables.hello_triangle import HelloTriangle
 from src.renderables.finger_joint import FingerJoint
+from src.renderables.instanced_mesh import InstancedMesh
+from src.renderables.obj_bin_mesh import ObjBinMesh
 
 # Render passes
 from render_passes.render_pass_forward import RenderPassForward
+from render_passes.render_pass_forward_instanced import RenderPassForwardInstanced
 from render_passes.render_pass_shadow import RenderPassShadow
+from render_passes.render_pass_shadow_instanced import RenderPassShadowInstanced
 from render_passes.render_pass_hello_world import RenderPassHelloWorld
 
 
@@ -35,7 +42,25 @@ class Engine:
                  window_title="Manus Hand Viewer",
                  window_size=(1280, 720),
                  vertical_sync=False,
-                 log_level="info"):
+                 log_level="info",
+                 headless=False,
+                 headless_backend=None,
+                 latency_log_fpath=None,
+                 profiler_history_size=constants.PROFILER_HISTORY_SIZE):
+
+        """
+        :param window_title: Title of the GLFW window
+        :param window_size: (width, height) of the window, or of the offscreen framebuffer when headless
+        :param vertical_sync: Whether swapping the window buffers waits for the monitor. Ignored when headless
+        :param log_level: Key of constants.LOGGING_MAP
+        :param headless: If True, no window, imgui or input callbacks are created. Frames are rendered into an
+                         offscreen framebuffer of a standalone OpenGL context, see run_headless()
+        :param headless_backend: moderngl standalone backend, e.g. 'egl' on Linux machines without a display
+                                 (software rendering with llvmpipe included). None uses the platform default
+        :param latency_log_fpath: If given, the glove-to-photon latency of live poses is exported to this file
+                                  (.csv or .json) on shutdown (see LatencyMonitor)
+        :param profiler_history_size: Number of frames whose timings are kept by the FrameProfiler
+        """
 
         # Logging
         self.logger = utils_logging.get_logger()
@@ -45,12 +70,48 @@ class Engine:
         self.external_update_callback = None
         self.external_imgui_callback = None
 
+        self.window_title = window_title
+        self.window_size = window_size
+        self.headless = headless
+        self.window_glfw = None
+        self.imgui_renderer = None
+        self.imgui_exit_popup_open = False
+        self.offscreen_fbo = None
+
+        if self.headless:
+            self.initialise_headless(backend=headless_backend)
+        else:
+            self.initialise_window(vertical_sync=vertical_sync)
+
+        # Inputs
+        self.mouse_state = self.initialise_mouse_state()
+        self.keyboard_state = self.initialise_keyboard_state()
+
+        # Internal Libraries
+        self.texture_library = TextureLibrary(ctx=self.ctx, window_size=window_size)
+
+        # Internal Components
+        self.camera = Camera(window_size=window_size)
+        self.profiler = FrameProfiler(ctx=self.ctx, history_size=profiler_history_size)
+        self.latency_monitor = LatencyMonitor(profiler=self.profiler, log_fpath=latency_log_fpath)
+        self.latency_log_fpath = latency_log_fpath
+        self.scene = self.create_scene()
+
+        # Add basic light
+        self.scene.directional_light = DirectionalLight()
+
+        # Flags
+        self.close_application = False
+
+        # Assign OS signal handling callback
+        signal.signal(signal.SIGINT, self.callback_signal_handler)
+
+    def initialise_window(self, vertical_sync: bool):
+
         if not glfw.init():
             raise ValueError("[ERROR] Failed to initialize GLFW")
 
         # Create GLFW window
-        self.window_title = window_title
-        self.window_size = window_size
         self.monitor_gltf = glfw.get_primary_monitor()
         self.window_glfw = glfw.create_window(width=self.window_size[0],
                                               height=self.window_size[1],
@@ -79,30 +140,18 @@ class Engine:
         # Create main moderngl Context
         self.ctx = moderngl.create_context()
 
-        # Inputs
-        self.mouse_state = self.initialise_mouse_state()
-        self.keyboard_state = self.initialise_keyboard_state()
-
         # ImGUI
         imgui.create_context()
         self.imgui_renderer = GlfwRenderer(self.window_glfw, attach_callbacks=False)  # DISABLE attach_callbacks!!!!
-        self.imgui_exit_popup_open = False
-
-        # Internal Libraries
-        self.texture_library = TextureLibrary(ctx=self.ctx, window_size=window_size)
-
-        # Internal Components
-        self.camera = Camera(window_size=window_size)
-        self.scene = self.create_scene()
-
-        # Add basic light
-        self.scene.directional_light = DirectionalLight()
 
-        # Flags
-        self.close_application = False
+    def initialise_headless(self, backend=None):
 
-        # Assign OS signal handling callback
-        signal.signal(signal.SIGINT, self.callback_signal_handler)
+        # Standalone contexts have no default framebuffer, so the scene is rendered into an offscreen one
+        self.ctx = moderngl.create_standalone_context(**({"backend": backend} if backend is not None else {}))
+        self.offscreen_fbo = self.ctx.framebuffer(
+            color_attachments=[self.ctx.renderbuffer(self.window_size, components=4)],
+            depth_attachment=self.ctx.depth_renderbuffer(self.window_size))
+        self.logger.info(f"Headless OpenGL context: {self.ctx.info['GL_RENDERER']}")
 
     @staticmethod
     def initialise_mouse_state() -> dict:
@@ -159,61 +208,174 @@ class Engine:
         self.imgui_renderer.render(imgui.get_draw_data())
 
     def create_scene(self) -> Scene:
-        new_scene = Scene(ctx=self.ctx, texture_library=self.texture_library)
+        new_scene = Scene(ctx=self.ctx,
+                          texture_library=self.texture_library,
+                          output_framebuffer=self.offscreen_fbo,
+                          profiler=self.profiler)
 
         # Register Render Passes
         new_scene.register_render_pass(type_id="forward", render_pass_class=RenderPassForward)
         new_scene.register_render_pass(type_id="shadow", render_pass_class=RenderPassShadow)
+        new_scene.register_render_pass(type_id="shadow_instanced", render_pass_class=RenderPassShadowInstanced)
+        new_scene.register_render_pass(type_id="forward_instanced", render_pass_class=RenderPassForwardInstanced)
 
         # Register Renderables
         new_scene.register_renderable(type_id="mesh", renderable_class=Mesh)
         new_scene.register_renderable(type_id="chessboard_plane", renderable_class=ChessboardPlane)
         new_scene.register_renderable(type_id="finger_joint", renderable_class=FingerJoint)
+        new_scene.register_renderable(type_id="instanced_mesh", renderable_class=InstancedMesh)
+        new_scene.register_renderable(type_id="obj_bin_mesh", renderable_class=ObjBinMesh)
 
         # Add basic rendering passes (order matters!)
         new_scene.create_render_pass(type_id="shadow", program_name="shadow_map")
+        new_scene.create_render_pass(type_id="shadow_instanced", program_name="shadow_map_instanced")
         new_scene.create_render_pass(type_id="forward", program_name="default_color")
-
+        new_scene.create_render_pass(type_id="forward_instanced", program_name="default_color_instanced")
 
         return new_scene
 
-    def run(self):
+    def run(self, num_frames=None):
+
+        """
+        :param num_frames: Number of frames after which the engine stops. None runs until the window is closed
+        """
+
+        if self.headless:
+            raise ValueError("[ERROR] A headless engine has no window to run in, use run_headless() instead")
 
         # Main loop
         self.close_application = False
         previous_time = time.perf_counter()
+        num_rendered = 0
         while not glfw.window_should_close(self.window_glfw) and not self.close_application:
 
+            if num_frames is not None and num_rendered >= num_frames:
+                break
+            num_rendered += 1
+
+            # Every stage of the frame is timed (see FrameProfiler)
+            profiler = self.profiler
+            profiler.begin_frame()
+
             # Clear framebuffer
-            self.ctx.clear(color=(1.0, 1.0, 1.0))
+            with profiler.scope("clear"):
+                self.ctx.clear(color=(1.0, 1.0, 1.0))
 
             # Update all window events
-            glfw.poll_events()
+            with profiler.scope("poll_events"):
+                glfw.poll_events()
 
             current_time = time.perf_counter()
             delta_time = current_time - previous_time
             previous_time = current_time
 
-            self.imgui_start()
+            with profiler.scope("imgui"):
+                self.imgui_start()
 
-            self.camera.update(delta_time=delta_time, keyboard_state=self.keyboard_state)
+            with profiler.scope("camera_update"):
+                self.camera.update(delta_time=delta_time, keyboard_state=self.keyboard_state)
 
             if self.external_update_callback:
-                self.external_update_callback(delta_time)
+                with profiler.scope("external_update"):
+                    self.external_update_callback(delta_time)
 
-            self.scene.render(camera=self.camera)
+            with profiler.scope("scene_render"), self.latency_monitor.measure_render():
+                self.scene.render(camera=self.camera)
+
+            with profiler.scope("imgui"):
+                self.imgui_menu_bar()
+                self.camera.on_imgui()
+                self.latency_monitor.on_imgui()
+                self.profiler.on_imgui()
+                if self.external_imgui_callback:
+                    self.external_imgui_callback()
+                self.imgui_exit_modal()
 
-            self.imgui_menu_bar()
-            self.camera.on_imgui()
-            if self.external_imgui_callback:
-                self.external_imgui_callback()
-            self.imgui_exit_modal()
-            self.imgui_stop()
+            with profiler.scope("imgui_render", gpu=True):
+                self.imgui_stop()
 
-            glfw.swap_buffers(self.window_glfw)
+            with profiler.scope("swap_buffers"):
+                glfw.swap_buffers(self.window_glfw)
+            self.latency_monitor.end_frame()
+            profiler.end_frame()
 
         self.shutdown()
 
+    def run_headless(self, num_frames: int, frame_rate=constants.HEADLESS_DEFAULT_FPS, output_file=None):
+
+        """
+        Renders 'num_frames' frames offscreen, stepping the camera and the external update callback with a fixed
+        time step of 1 / frame_rate seconds, as fast as possible (there is no window, so no vsync either). Frames
+        are read back asynchronously (see FrameReadback) and written to 'output_file' as raw, top-row-first
+        pixels (constants.HEADLESS_FRAME_COMPONENTS per pixel), e.g. to be piped to ffmpeg with
+        '-f rawvideo -pix_fmt rgb24 -s <width>x<height> -r <frame_rate> -i -'.
+
+        :param num_frames: Number of frames to render
+        :param frame_rate: Frames per simulated second
+        :param output_file: Binary file-like object (file, pipe, sys.stdout.buffer, ...). None only renders
+        :return: Number of frames rendered, fewer than 'num_frames' if interrupted (e.g. Ctrl+C)
+        """
+
+        if not self.headless:
+            raise ValueError("[ERROR] run_headless() needs an engine created with headless=True")
+
+        delta_time = 1.0 / frame_rate
+        readback = FrameReadback(ctx=self.ctx, framebuffer=self.offscreen_fbo) if output_file is not None else None
+
+        def write_frame(frame):
+            if frame is not None:
+                output_file.write(np.ascontiguousarray(frame))
+
+        # A first frame, not written, requests every texture the scene uses. Waiting for them makes the output
+        # independent of how long they take to load
+        self.render_headless_frame(delta_time=0.0)
+        self.texture_library.wait_for_requested_textures()
+
+        self.close_application = False
+        num_rendered = 0
+        start_time = time.perf_counter()
+        while num_rendered < num_frames and not self.close_application:
+
+            # The first frame shows the initial state, like the first frame of the window
+            self.render_headless_frame(delta_time=delta_time if num_rendered > 0 else 0.0)
+            num_rendered += 1
+
+            if readback is not None:
+                write_frame(readback.push())
+
+        if readback is not None:
+            for frame in readback.flush():
+                write_frame(frame)
+            readback.release()
+
+        elapsed = time.perf_counter() - start_time
+        self.logger.info(f"Rendered {num_rendered} frames in {elapsed:.2f} s "
+                         f"({num_rendered / max(elapsed, 1e-9):.1f} frames/s)")
+
+        self.shutdown()
+        return num_rendered
+
+    def render_headless_frame(self, delta_time: float):
+
+        profiler = self.profiler
+        profiler.begin_frame()
+
+        with profiler.scope("clear"):
+            self.offscreen_fbo.clear(color=(1.0, 1.0, 1.0))
+
+        with profiler.scope("camera_update"):
+            self.camera.update(delta_time=delta_time, keyboard_state=self.keyboard_state)
+
+        if self.external_update_callback:
+            with profiler.scope("external_update"):
+                self.external_update_callback(delta_time)
+
+        with profiler.scope("scene_render"), self.latency_monitor.measure_render():
+            self.scene.render(camera=self.camera)
+
+        self.latency_monitor.end_frame()
+        profiler.end_frame()
+
     # ========================================================================
     #                       GLFW Callback functions
     # ========================================================================
@@ -293,6 +455,18 @@ class Engine:
 
                     imgui.end_menu()
 
+                if imgui.begin_menu("Shadow quality"):
+                    directional_light = self.scene.directional_light
+                    for num_taps in constants.SHADOW_PCF_TAPS_OPTIONS:
+                        clicked, _ = imgui.menu_item(f"PCF {num_taps}x", None,
+                                                     directional_light.shadow_pcf_taps == num_taps)
+                        if clicked:
+                            directional_light.shadow_pcf_taps = num_taps
+
+                    imgui.end_menu()
+
+                _, self.profiler.show_overlay = imgui.menu_item("Profiler", None, self.profiler.show_overlay)
+
                 clicked, selected = imgui.menu_item("Preferences", "Ctrl + Q", False, True)
 
                 imgui.end_menu()
@@ -333,4 +507,8 @@ class Engine:
         imgui.end_popup()
 
     def shutdown(self):
-        pass
\ No newline at end of file
+        if self.latency_log_fpath is not None and self.latency_monitor.num_window_records > 0:
+            self.logger.info(f"Latency log saved to {self.latency_monitor.export()}")
+        self.texture_library.destroy()
+        if self.offscreen_fbo is not None:
+            self.offscreen_fbo.release()
\ No newline at end of file
@@ -0,0 +1,254 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import imgui
+import moderngl
+import numpy as np
+
+from src import constants
+
+
+class FrameProfiler:
+
+    """
+    Times named scopes of every frame on the CPU (time.perf_counter()) and, optionally, on the GPU with timer
+    queries. GPU results are read 'num_frames_in_flight' frames after they were issued, so the CPU never waits for
+    the GPU to catch up. Queries are recycled from a pool, so there is no per-frame allocation on the GL side.
+
+    Samples of the last 'history_size' frames are kept per scope (see get_samples()), in seconds, NaN on frames
+    where a scope did not run, and so are per-frame counters (e.g. draw calls, see count()). Timer queries cannot
+    be nested in OpenGL, so GPU scopes must not contain each other (the render passes, see Scene.render(), and
+    the imgui draw of Engine.run() are the only ones). Only the render passes add up to the GPU time of a frame
+    (see get_gpu_time()).
+    """
+
+    FRAME = "frame"  # CPU time of the whole frame, from begin_frame() to end_frame()
+    RENDER_PASS_PREFIX = "pass/"  # Scopes of the render passes, the only ones counted by get_gpu_time()
+
+    def __init__(self,
+                 ctx: moderngl.Context,
+                 history_size=constants.PROFILER_HISTORY_SIZE,
+                 num_frames_in_flight=constants.PROFILER_QUERY_FRAMES_IN_FLIGHT,
+                 enabled=True):
+
+        """
+        :param ctx: moderngl Context
+        :param history_size: Number of frames whose samples are kept
+        :param num_frames_in_flight: Frames between issuing a timer query and reading its result
+        :param enabled: If False, scopes are not timed at all
+        """
+
+        self.ctx = ctx
+        self.history_size = history_size
+        self.num_frames_in_flight = num_frames_in_flight
+        self.enabled = enabled
+        self.show_overlay = True
+
+        self.frame = 0  # Number of the current frame
+        self.frame_start = time.perf_counter()
+
+        # Rows of the history are reused every 'history_size' frames. Each remembers the frame it holds
+        self.frame_numbers = np.full(history_size, -1, dtype=np.int64)
+        self.cpu_samples = {}
+        self.gpu_samples = {}
+        self.counter_samples = {}
+        self.gpu_frame_times = np.full(history_size, np.nan, dtype=np.float64)  # Sum of the render pass scopes
+
+        self.query_pool = []
+        self.pending_queries = deque()  # (frame, name, query), oldest first
+        self.last_collected_frame = -1  # GPU results of this frame and the ones before are all available
+
+        # Statistics shown in the overlay, only recomputed every constants.PROFILER_STATS_INTERVAL frames
+        self.overlay_stats = []
+        self.overlay_counts = []
+        self.overlay_frame_times = np.zeros(history_size, dtype=np.float32)
+
+    def begin_frame(self):
+
+        self.frame_start = time.perf_counter()
+
+        row = self.frame % self.history_size
+        self.frame_numbers[row] = self.frame
+        for samples in self.cpu_samples.values():
+            samples[row] = np.nan
+        for samples in self.gpu_samples.values():
+            samples[row] = np.nan
+        for samples in self.counter_samples.values():
+            samples[row] = np.nan
+        self.gpu_frame_times[row] = np.nan
+
+        self.collect(last_frame=self.frame - self.num_frames_in_flight)
+
+    def end_frame(self):
+        self.add_sample(samples=self.cpu_samples, name=FrameProfiler.FRAME, frame=self.frame,
+                        value=time.perf_counter() - self.frame_start)
+        self.frame += 1
+
+    @contextmanager
+    def scope(self, name: str, gpu=False):
+
+        """
+        Times the code inside the scope. Scopes with the same name add up within a frame
+
+        :param name: Name of the timer
+        :param gpu: Whether to also time the GL commands issued inside the scope with a timer query
+        """
+
+        if not self.enabled:
+            yield
+            return
+
+        query = None
+        if gpu:
+            query = self.query_pool.pop() if len(self.query_pool) > 0 else self.ctx.query(time=True)
+
+        start = time.perf_counter()
+        if query is None:
+            yield
+        else:
+            with query:
+                yield
+            self.pending_queries.append((self.frame, name, query))
+        self.add_sample(samples=self.cpu_samples, name=name, frame=self.frame, value=time.perf_counter() - start)
+
+    def count(self, name: str, value: int):
+
+        """
+        Adds 'value' to the counter 'name' of the current frame (see get_samples())
+        """
+
+        if self.enabled:
+            self.add_sample(samples=self.counter_samples, name=name, frame=self.frame, value=value)
+
+    def add_sample(self, samples: dict, name: str, frame: int, value: float):
+
+        if name not in samples:
+            samples[name] = np.full(self.history_size, np.nan, dtype=np.float64)
+
+        row = frame % self.history_size
+        if self.frame_numbers[row] != frame:
+            return  # The frame is older than the history
+        samples[name][row] = value if np.isnan(samples[name][row]) else samples[name][row] + value
+
+    def collect(self, last_frame: int):
+
+        """
+        Reads the results of the timer queries issued up to 'last_frame' (included)
+        """
+
+        while len(self.pending_queries) > 0 and self.pending_queries[0][0] <= last_frame:
+            frame, name, query = self.pending_queries.popleft()
+            elapsed = query.elapsed * 1e-9
+            self.query_pool.append(query)
+
+            self.add_sample(samples=self.gpu_samples, name=name, frame=frame, value=elapsed)
+            row = frame % self.history_size
+            if self.frame_numbers[row] == frame and name.startswith(FrameProfiler.RENDER_PASS_PREFIX):
+                self.gpu_frame_times[row] = elapsed if np.isnan(self.gpu_frame_times[row]) \
+                    else self.gpu_frame_times[row] + elapsed
+
+        self.last_collected_frame = max(self.last_collected_frame, last_frame)
+
+    def flush(self):
+
+        """
+        Reads the results of all timer queries of the previous frames, waiting for the GPU if needed
+        """
+
+        self.collect(last_frame=self.frame - 1)
+
+    def get_gpu_time(self, frame: int):
+
+        """
+        :return: Total GPU time of the render passes of 'frame' in seconds (imgui excluded), NaN if it had none (or
+                 is older than the history), None if its timer queries have not been read yet
+        """
+
+        if frame > self.last_collected_frame:
+            return None
+        row = frame % self.history_size
+        return self.gpu_frame_times[row] if self.frame_numbers[row] == frame else np.nan
+
+    def get_timer_names(self) -> list:
+        return sorted(set(self.cpu_samples.keys()) | set(self.gpu_samples.keys()))
+
+    def get_samples(self, name: str, gpu=False, counter=False) -> np.ndarray:
+
+        """
+        :param name: Name of the scope, or FrameProfiler.FRAME for the time of whole frames
+        :param gpu: Whether to return the GPU times instead of the CPU ones
+        :param counter: Whether 'name' is a counter (see count()) instead of a scope
+        :return: numpy ndarray (history_size,) <float64> of the last frames in seconds (or counts), oldest first,
+                 NaN where the scope did not run. GPU times of the last 'num_frames_in_flight' frames are not
+                 available yet
+        """
+
+        samples = self.get_sample_dict(gpu=gpu, counter=counter).get(name, None)
+        if samples is None:
+            return np.full(self.history_size, np.nan, dtype=np.float64)
+        return samples[np.argsort(self.frame_numbers, kind="stable")]
+
+    def get_percentiles(self, name: str, gpu=False, counter=False,
+                        percentiles=constants.PROFILER_PERCENTILES) -> np.ndarray:
+
+        """
+        :return: numpy ndarray (len(percentiles),) in seconds (or counts) over the history, NaN if there are no
+                 samples
+        """
+
+        samples = self.get_sample_dict(gpu=gpu, counter=counter).get(name, None)
+        if samples is None or np.all(np.isnan(samples)):
+            return np.full(len(percentiles), np.nan)
+        return np.nanpercentile(samples, percentiles)
+
+    def get_sample_dict(self, gpu=False, counter=False) -> dict:
+        if counter:
+            return self.counter_samples
+        return self.gpu_samples if gpu else self.cpu_samples
+
+    def update_overlay_stats(self):
+
+        self.overlay_frame_times[:] = np.nan_to_num(self.get_samples(name=FrameProfiler.FRAME)) * 1000.0
+        self.overlay_stats = [(name,
+                               self.get_percentiles(name=name) * 1000.0,
+                               self.get_percentiles(name=name, gpu=True) * 1000.0)
+                              for name in self.get_timer_names()]
+        self.overlay_counts = [(name, self.get_percentiles(name=name, counter=True, percentiles=(50,))[0])
+                               for name in sorted(self.counter_samples.keys())]
+
+    def on_imgui(self):
+
+        if not self.enabled or not self.show_overlay:
+            return
+
+        if self.frame % constants.PROFILER_STATS_INTERVAL == 0 or len(self.overlay_stats) == 0:
+            self.update_overlay_stats()
+
+        imgui.begin("Profiler", True)
+
+        frame_percentiles = self.get_percentiles(name=FrameProfiler.FRAME) * 1000.0
+        imgui.plot_lines("##frame_times",
+                         self.overlay_frame_times,
+                         overlay_text=f"Frame: {frame_percentiles[0]:.2f} ms (p50)",
+                         scale_min=0.0,
+                         graph_size=(0, 80))
+
+        # One row per timer, with the CPU and GPU percentiles in milliseconds
+        percentile_labels = "/".join(f"p{p}" for p in constants.PROFILER_PERCENTILES)
+        imgui.text(f"{'ms':<24}{'CPU ' + percentile_labels:>24}{'GPU ' + percentile_labels:>24}")
+        for name, cpu_percentiles, gpu_percentiles in self.overlay_stats:
+            imgui.text(f"{name:<24}{FrameProfiler.format_percentiles(cpu_percentiles):>24}"
+                       f"{FrameProfiler.format_percentiles(gpu_percentiles):>24}")
+
+        # Median per frame of every counter
+        for name, median_count in self.overlay_counts:
+            imgui.text(f"{name:<24}{'-' if np.isnan(median_count) else f'{median_count:.0f}':>24}")
+
+        imgui.end()
+
+    @staticmethod
+    def format_percentiles(percentiles: np.ndarray) -> str:
+        if np.isnan(percentiles[0]):
+            return "-"
+        return "/".join(f"{value:.2f}" for value in percentiles)
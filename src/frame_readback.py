@@ -0,0 +1,81 @@
+from collections import deque
+
+import moderngl
+import numpy as np
+
+from src import constants
+
+
+class FrameReadback:
+
+    """
+    Reads rendered frames back from a framebuffer without stalling the GPU. Each frame is copied into one of
+    several pixel buffers, which OpenGL does asynchronously, and only read on the CPU once all the other buffers
+    have been filled too. With two buffers, the frame returned by push() is the one rendered a frame earlier, so
+    the GPU has a whole frame to finish it while the next one is being prepared.
+    """
+
+    def __init__(self,
+                 ctx: moderngl.Context,
+                 framebuffer: moderngl.Framebuffer,
+                 components=constants.HEADLESS_FRAME_COMPONENTS,
+                 num_buffers=constants.HEADLESS_READBACK_NUM_BUFFERS):
+
+        """
+        :param ctx: moderngl Context
+        :param framebuffer: Framebuffer read by push(). Its first color attachment is read
+        :param components: 3 for RGB frames, 4 for RGBA
+        :param num_buffers: Number of frames in flight. 1 reads every frame synchronously
+        """
+
+        self.framebuffer = framebuffer
+        self.components = components
+
+        width, height = framebuffer.size
+        self.buffers = [ctx.buffer(reserve=width * height * components, dynamic=True) for _ in range(num_buffers)]
+        self.pending = deque()  # Buffers with a frame in flight, oldest first
+        self.next_buffer = 0
+
+        # Frames are read into the same array every time, so reading does not allocate
+        self.pixels = np.empty((height, width, components), dtype=np.uint8)
+
+    def push(self):
+
+        """
+        Starts reading the current contents of the framebuffer
+
+        :return: numpy ndarray (height, width, components) <uint8>, top row first, with the oldest frame in flight
+                 once all buffers are in use, otherwise None. It is only valid until the next call to push() or
+                 flush()
+        """
+
+        frame = None
+        if len(self.pending) == len(self.buffers):
+            frame = self.read_oldest()
+
+        buffer = self.buffers[self.next_buffer]
+        self.next_buffer = (self.next_buffer + 1) % len(self.buffers)
+        self.framebuffer.read_into(buffer, components=self.components, alignment=1)
+        self.pending.append(buffer)
+        return frame
+
+    def flush(self):
+
+        """
+        Yields all frames still in flight, oldest first, with the same caveats as push()
+        """
+
+        while len(self.pending) > 0:
+            yield self.read_oldest()
+
+    def read_oldest(self) -> np.ndarray:
+        self.pending.popleft().read_into(self.pixels)
+
+        # OpenGL rows start at the bottom of the image
+        return self.pixels[::-1]
+
+    def release(self):
+        for buffer in self.buffers:
+            buffer.release()
+        self.buffers = []
+        self.pending.clear()
@@ -0,0 +1,87 @@
+"""
+Stands in for the glove: streams a terminal dump recording to a GloveStream, pose by pose, at real-time or
+accelerated rates. Poses are sent with the time they are sent at as their sample timestamp, as the glove would.
+
+Usage (from the repository root):
+    python src/glove_replay.py                                  # Real-time, to constants.GLOVE_STREAM_ADDRESS
+    python src/glove_replay.py --speed 4 --loop
+    python src/glove_replay.py --address unix:///tmp/glove.sock
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src import constants
+from src.glove_stream import encode_pose_packet, parse_socket_address
+from src.utilities import utils_io
+
+
+def load_raw_poses(txt_fpath: str, use_uniform_timestamps=True) -> tuple:
+
+    """
+    :return: tuple (timestamps, joint_values), in seconds from the first pose and raw degrees (N, 20), as sent by
+             the glove (i.e. without the corrections of utils_io.correct_hand_joint_values())
+    """
+
+    with open(txt_fpath, "rb") as file:
+        parsed = utils_io.parse_terminal_dump(data=file.read())
+    if parsed is None:
+        raise ValueError(f"[ERROR] Could not parse '{txt_fpath}' as a terminal dump recording")
+
+    timestamps, joint_values = parsed
+    if use_uniform_timestamps:
+        # Same smoothing as the viewer applies to the bursty timestamps of the recordings
+        timestamps = np.linspace(0.0, timestamps[-1], timestamps.size)
+    return timestamps, joint_values
+
+
+def replay(address: str, timestamps: np.ndarray, joint_values: np.ndarray, speed=1.0, loop=False):
+
+    family, socket_address = parse_socket_address(address=address)
+    with socket.socket(family, socket.SOCK_DGRAM) as sender:
+
+        while True:
+            start_time = time.perf_counter()
+            for timestamp, values in zip(timestamps, joint_values):
+
+                # Sleeps until the pose is due, without accumulating drift over the recording
+                wait_time = start_time + timestamp / speed - time.perf_counter()
+                if wait_time > 0.0:
+                    time.sleep(wait_time)
+
+                try:
+                    sender.sendto(encode_pose_packet(timestamp=time.time(), joint_values=values), socket_address)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    pass  # Nobody listening yet (Unix sockets), the glove does not wait either
+
+            if not loop:
+                break
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", type=str, default=constants.GLOVE_STREAM_ADDRESS)
+    parser.add_argument("--animation", type=str, default=os.path.join(constants.DATA_DIR, "animation_1.txt"))
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed, relative to the recording")
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    timestamps, joint_values = load_raw_poses(txt_fpath=args.animation)
+    print(f"Streaming {timestamps.size} poses ({timestamps[-1] / args.speed:.1f} s) to {args.address}")
+    try:
+        replay(address=args.address, timestamps=timestamps, joint_values=joint_values, speed=args.speed,
+               loop=args.loop)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
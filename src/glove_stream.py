@@ -0,0 +1,205 @@
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+from src import constants
+from src.utilities import utils_io
+
+# One pose per datagram: the time it was sampled (seconds, sender's time.time()) followed by the raw joint values in
+# degrees, ordered as constants.JOINT_NAMES and uncorrected, exactly like the values of a terminal dump recording
+PACKET_DTYPE = np.dtype([("timestamp", "<f8"), ("joint_values", "<f4", (len(constants.JOINT_NAMES),))])
+
+
+def parse_socket_address(address: str) -> tuple:
+
+    """
+    :param address: 'udp://<host>:<port>' or 'unix://<path>'
+    :return: tuple (socket family, socket address) for socket.socket() and socket.bind() / socket.sendto()
+    """
+
+    if address.startswith("udp://"):
+        host, _, port = address[len("udp://"):].rpartition(":")
+        if len(host) == 0 or not port.isdigit():
+            raise ValueError(f"[ERROR] Invalid UDP address '{address}', expected 'udp://<host>:<port>'")
+        return socket.AF_INET, (host, int(port))
+
+    if address.startswith("unix://"):
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("[ERROR] Unix sockets are not supported on this platform")
+        return socket.AF_UNIX, address[len("unix://"):]
+
+    raise ValueError(f"[ERROR] Unsupported address '{address}', expected 'udp://<host>:<port>' or 'unix://<path>'")
+
+
+def encode_pose_packet(timestamp: float, joint_values: np.ndarray) -> bytes:
+
+    """
+    :param timestamp: Time the pose was sampled, in seconds (time.time())
+    :param joint_values: numpy ndarray (20,), raw joint values in degrees ordered as constants.JOINT_NAMES
+    :return: Datagram payload, see PACKET_DTYPE
+    """
+
+    packet = np.empty(1, dtype=PACKET_DTYPE)
+    packet["timestamp"] = timestamp
+    packet["joint_values"] = joint_values
+    return packet.tobytes()
+
+
+class PoseRingBuffer:
+
+    """
+    Fixed-size history of poses, written by a single thread (see GloveStream) and read by any other without locks.
+
+    Every record is a row of 'records': the sample timestamp, the time it was received and the joint values. The
+    writer fills the row after the newest one and only then increments 'write_count', so a reader never sees a row
+    that is being written. Readers copy the newest row and check 'write_count' again afterwards: the row can only
+    have been overwritten if the writer went around the whole buffer in the meantime, in which case they retry.
+    """
+
+    SAMPLE_TIMESTAMP = 0
+    RECEIVE_TIME = 1
+    VALUES = 2  # First column of the joint values
+
+    def __init__(self, capacity: int, num_values: int):
+
+        """
+        :param capacity: Number of poses kept. Must be at least 2
+        :param num_values: Number of joint values per pose
+        """
+
+        if capacity < 2:
+            raise ValueError(f"[ERROR] PoseRingBuffer needs a capacity of at least 2, got {capacity}")
+
+        self.capacity = capacity
+        self.records = np.zeros((capacity, PoseRingBuffer.VALUES + num_values), dtype=np.float64)
+        self.write_count = 0  # Total number of poses written. Only ever increased by the writer
+
+    def write(self, sample_timestamp: float, receive_time: float, values: np.ndarray):
+
+        record = self.records[self.write_count % self.capacity]
+        record[PoseRingBuffer.SAMPLE_TIMESTAMP] = sample_timestamp
+        record[PoseRingBuffer.RECEIVE_TIME] = receive_time
+        record[PoseRingBuffer.VALUES:] = values
+
+        # Publishes the record. A single attribute assignment is atomic, so readers see either count
+        self.write_count += 1
+
+    def read_latest(self, out_record: np.ndarray) -> int:
+
+        """
+        Copies the newest record into 'out_record', without allocating
+
+        :param out_record: numpy ndarray (2 + num_values,) <float64>
+        :return: Sequence number of the copied record (write_count when it was published), 0 if nothing has been
+                 written yet, in which case 'out_record' is left untouched
+        """
+
+        while True:
+            write_count = self.write_count
+            if write_count == 0:
+                return 0
+
+            np.copyto(out_record, self.records[(write_count - 1) % self.capacity])
+
+            # The writer is about to reuse the oldest row, so the copied one is safe unless it has been reused too
+            if self.write_count - write_count < self.capacity - 1:
+                return write_count
+
+
+class GloveStream:
+
+    """
+    Receives live glove poses (see PACKET_DTYPE) over a UDP or Unix datagram socket on a background thread, and
+    stores them in a PoseRingBuffer. Received values are corrected like recorded ones (see
+    utils_io.correct_hand_joint_values()), so they are ordered as constants.ANIMATION_COLUMN_NAMES.
+
+    Packets older than the newest pose received (e.g. reordered by UDP) are dropped, and so are malformed ones.
+    """
+
+    def __init__(self,
+                 address=constants.GLOVE_STREAM_ADDRESS,
+                 capacity=constants.GLOVE_RING_BUFFER_CAPACITY):
+
+        """
+        :param address: Address the poses are sent to, see parse_socket_address()
+        :param capacity: Number of poses kept in the ring buffer
+        """
+
+        self.address = address
+        self.family, self.socket_address = parse_socket_address(address=address)
+        self.ring_buffer = PoseRingBuffer(capacity=capacity, num_values=len(constants.ANIMATION_COLUMN_NAMES))
+
+        # Statistics, only written by the receiver thread
+        self.num_received = 0
+        self.num_dropped = 0
+
+        self.socket = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+
+        if self.thread is not None:
+            return
+
+        self.socket = socket.socket(self.family, socket.SOCK_DGRAM)
+        if self.family == socket.AF_UNIX and os.path.exists(self.socket_address):
+            os.remove(self.socket_address)  # Left behind by a previous run
+        self.socket.bind(self.socket_address)
+        self.socket.settimeout(constants.GLOVE_SOCKET_TIMEOUT)
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.receive_loop, name="glove_stream", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+
+        if self.thread is None:
+            return
+
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+        self.socket.close()
+        self.socket = None
+        if self.family == socket.AF_UNIX and os.path.exists(self.socket_address):
+            os.remove(self.socket_address)
+
+    def read_latest(self, out_record: np.ndarray) -> int:
+
+        """
+        See PoseRingBuffer.read_latest(). Safe to call from any thread, every frame
+        """
+
+        return self.ring_buffer.read_latest(out_record=out_record)
+
+    def receive_loop(self):
+
+        # Datagrams are received into the same buffer every time, and read through a view of it. The buffer has one
+        # spare byte: longer datagrams are truncated by the socket, so they can only be told apart by filling it
+        packet_buffer = bytearray(PACKET_DTYPE.itemsize + 1)
+        packet = np.frombuffer(packet_buffer, dtype=PACKET_DTYPE, count=1)[0]
+        last_sample_timestamp = -np.inf
+
+        while not self.stop_event.is_set():
+
+            try:
+                num_bytes = self.socket.recv_into(packet_buffer)
+            except socket.timeout:
+                continue  # Checks whether it has been stopped
+            except OSError:
+                break  # Socket closed
+
+            receive_time = time.time()
+            if num_bytes != PACKET_DTYPE.itemsize or packet["timestamp"] < last_sample_timestamp:
+                self.num_dropped += 1
+                continue
+
+            last_sample_timestamp = float(packet["timestamp"])
+            values = utils_io.correct_hand_joint_values(joint_values=packet["joint_values"].reshape(1, -1))
+            self.ring_buffer.write(sample_timestamp=last_sample_timestamp, receive_time=receive_time, values=values[0])
+            self.num_received += 1
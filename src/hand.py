@@ -2,33 +2,72 @@ import glm
 import imgui
 import numpy as np
 from src.engine import Engine
+from src.animation_stream import AnimationStream
+from src.glove_stream import PoseRingBuffer
+from src.keyframe_lookup import KeyframeLookup
+from src.skeleton import Skeleton
+from src.renderables.finger_joint import FingerJoint
 from utilities import utils_io
 import matplotlib.pyplot as plt
 
 from src import constants
 
-HAND_SCALE = 35
-
 
 class Hand:
 
     def __init__(self,
                  engine: Engine,
                  hand_config_yaml_fpath: str,
-                 hand_animation_txt_fpath: str):
+                 hand_animation_txt_fpath: str,
+                 stream_animation=False,
+                 use_uniform_timestamps=True,
+                 use_instancing=False,
+                 glove_stream=None):
 
         self.engine = engine
         self.engine.set_external_update_callback(self.on_update)
         self.engine.set_external_imgui_callback(self.on_imgui)
 
         self.hand_config = utils_io.load_hand_configuration(yaml_fpath=hand_config_yaml_fpath)
-        self.hand_animation = utils_io.load_hand_animation(txt_fpath=hand_animation_txt_fpath)
+
+        # When streaming, only a small window of the animation is kept in memory (see AnimationStream)
+        self.animation_stream = None
+        if stream_animation:
+            self.animation_stream = AnimationStream(txt_fpath=hand_animation_txt_fpath,
+                                                    use_uniform_timestamps=use_uniform_timestamps)
+            self.timestamps = self.animation_stream.timestamps
+            self.joint_values = self.animation_stream.joint_values
+            self.animation_duration = self.animation_stream.duration
+        else:
+            self.timestamps, self.joint_values = utils_io.load_hand_animation_cached(
+                txt_fpath=hand_animation_txt_fpath,
+                use_uniform_timestamps=use_uniform_timestamps)
+            self.animation_duration = self.timestamps[-1]
+
+        self.keyframe_lookup = KeyframeLookup(timestamps=self.timestamps, uniform=use_uniform_timestamps)
+
+        # With instancing, finger joints are not individual renderables. They are drawn as instances of
+        # InstancedMesh objects shared by all hands, one per joint archetype (see create_finger_joint_instances)
+        self.use_instancing = use_instancing
+        self.finger_joint_instance_params = {}
+        self.instance_groups = []
 
         self.renderables = self.create_renderables()
 
-        self.timestamps = self.hand_animation["timestamps"].values
-        self.joint_values = self.hand_animation.iloc[:, 1:].values
-        self.animation_duration = self.timestamps[-1]
+        # All joint transforms are computed in one go by the skeleton, and renderables read from it
+        self.skeleton = Skeleton.from_hand_configuration(hand_config=self.hand_config)
+        self.skeleton.bind_renderables(renderables=self.renderables)
+        self.create_animation_bindings()
+        if self.use_instancing:
+            self.create_finger_joint_instances()
+
+        # Live poses (see GloveStream) replace the animation as soon as the glove has sent any. They are read into
+        # the same arrays every frame, so following the glove does not allocate
+        self.glove_stream = glove_stream
+        self.live_record = np.zeros(PoseRingBuffer.VALUES + len(constants.ANIMATION_COLUMN_NAMES), dtype=np.float64)
+        self.live_values = self.live_record[PoseRingBuffer.VALUES:]
+        self.live_binding_values = np.zeros(self.binding_column_indices.size, dtype=np.float64)
+        self.live_sequence = 0
 
         #plt.plot(self.timestamps, self.joint_values, '-o')
         #plt.show()
@@ -43,6 +82,47 @@ class Hand:
 
     def create_renderables(self) -> dict:
 
+        # Step 1) Create one renderable per joint, based on their specs
+        renderables = {}
+        for key, (type_id, params) in Hand.get_renderable_specs(hand_config=self.hand_config).items():
+            if type_id == "finger_joint":
+                renderables[key] = self.create_finger_joint(key=key, params=params)
+                continue
+            renderables[key] = self.engine.scene.create_renderable(type_id=type_id, params=params)
+
+        # Instanced finger joints are not renderables on their own
+        renderables = {key: renderable for key, renderable in renderables.items() if renderable is not None}
+
+        # Step 2) Connect renderables hierarchically
+        for (parent_key, child_key) in constants.RENDERABLES_PARENT_CHILD:
+            if child_key not in renderables or parent_key not in renderables:
+                continue
+            renderables[parent_key].children.append(renderables[child_key])
+
+        # Step 3) Trigger update on all transforms so that their world matrices are validated
+        renderables["root"].update()
+
+        # Step 4) Add any other enviromental meshes necessary for rendering
+        self.engine.scene.create_renderable(
+            type_id="chessboard_plane",
+            params={
+                "position": (0, -4, 0),
+                "plane_size": 100,
+                "num_squares": 10
+            })
+
+        return renderables
+
+    @staticmethod
+    def get_renderable_specs(hand_config: dict) -> dict:
+
+        """
+        Describes the renderable used for every joint of a hand, without creating anything on the GPU
+
+        :param hand_config: dict as returned by utils_io.load_hand_configuration()
+        :return: dict {joint_name: (type_id, params)}
+        """
+
         # Step 1) Create all joint blueprints
         blueprints = {}
         for (parent_key, child_key) in constants.RENDERABLES_PARENT_CHILD:
@@ -52,12 +132,12 @@ class Hand:
                 continue
 
             finger_name, joint_name = parent_key.split("_")
-            parent_joint = self.hand_config[finger_name][joint_name]
+            parent_joint = hand_config[finger_name][joint_name]
             finger_name, joint_name = child_key.split("_")
-            child_joint = self.hand_config[finger_name][joint_name]
+            child_joint = hand_config[finger_name][joint_name]
 
-            parent_position = glm.vec3(parent_joint["position"]) * HAND_SCALE
-            child_position = glm.vec3(child_joint["position"]) * HAND_SCALE  # relative position to parent
+            parent_position = glm.vec3(parent_joint["position"]) * constants.HAND_SCALE
+            child_position = glm.vec3(child_joint["position"]) * constants.HAND_SCALE  # relative position to parent
             bone_length = glm.length(child_position)
             bone_vector = child_position
 
@@ -67,104 +147,205 @@ class Hand:
                 "bone_vector": bone_vector
             }
 
-        # Step 2) Create renderable based on blueprints
-        renderables = {}
+        # Step 2) Select the renderable of each joint based on its blueprint
+        specs = {}
         for key, blueprint in blueprints.items():
 
             if key == "root":
-                renderables[key] = self.engine.scene.create_renderable(
-                    type_id="mesh",
-                    params={"shape": "box",
-                            "position": blueprint["position"],
-                            "width": 0.5,
-                            "height": 0.1,
-                            "depth": 0.1,
-                            "color": (0.0, 1.0, 1.0)})
+                specs[key] = ("mesh", {"shape": "box",
+                                       "position": blueprint["position"],
+                                       "width": 0.5,
+                                       "height": 0.1,
+                                       "depth": 0.1,
+                                       "color": (0.0, 1.0, 1.0)})
                 continue
 
             finger_name, joint_name = key.split("_")
 
             if joint_name == "mcp" and finger_name != "thumb":
-                renderables[key] = self.engine.scene.create_renderable(
-                    type_id="finger_joint",
-                    params={"position": blueprint["position"],
-                            "bone_length": blueprint["bone_length"],
-                            "bone_radius": 0.1,
-                            "joint_radius": 0.2,
-                            "joint_type": "xy"})
-
+                specs[key] = ("finger_joint", {"position": blueprint["position"],
+                                               "bone_length": blueprint["bone_length"],
+                                               "bone_radius": 0.1,
+                                               "joint_radius": 0.2,
+                                               "joint_type": "xy"})
                 continue
 
             if finger_name == "thumb":
                 if joint_name == "cmc":
-                    renderables[key] = self.engine.scene.create_renderable(
-                        type_id="finger_joint",
-                        params={"position": blueprint["position"],
-                                "bone_length": blueprint["bone_length"],
-                                "bone_radius": 0.1,
-                                "joint_radius": 0.2,
-                                "joint_type": "xy"})
+                    specs[key] = ("finger_joint", {"position": blueprint["position"],
+                                                   "bone_length": blueprint["bone_length"],
+                                                   "bone_radius": 0.1,
+                                                   "joint_radius": 0.2,
+                                                   "joint_type": "xy"})
                     continue
 
-                renderables[key] = self.engine.scene.create_renderable(
-                    type_id="finger_joint",
-                    params={"position": blueprint["position"],
-                            "bone_length": blueprint["bone_length"],
-                            "bone_radius": 0.1,
-                            "joint_radius": 0.2,
-                            "joint_color": (0.2, 0.8, 0.2),
-                            "joint_type": "x"})
+                specs[key] = ("finger_joint", {"position": blueprint["position"],
+                                               "bone_length": blueprint["bone_length"],
+                                               "bone_radius": 0.1,
+                                               "joint_radius": 0.2,
+                                               "joint_color": (0.2, 0.8, 0.2),
+                                               "joint_type": "x"})
                 continue
 
             if joint_name in ["pip", "dip", "ip"]:
-                renderables[key] = self.engine.scene.create_renderable(
-                    type_id="finger_joint",
-                    params={"position": blueprint["position"],
-                            "bone_length": blueprint["bone_length"],
-                            "bone_radius": 0.1,
-                            "joint_radius": 0.2,
-                            "joint_type": "x"})
+                specs[key] = ("finger_joint", {"position": blueprint["position"],
+                                               "bone_length": blueprint["bone_length"],
+                                               "bone_radius": 0.1,
+                                               "joint_radius": 0.2,
+                                               "joint_type": "x"})
                 continue
 
-            renderables[key] = self.engine.scene.create_renderable(
-                type_id="mesh",
-                params={"shape": "box",
-                        "position": blueprint["position"],
-                        "width": 0.1,
-                        "height": 0.1,
-                        "depth": 0.1,
-                        "color": (1.0, 0.0, 0.0)})
+            specs[key] = ("mesh", {"shape": "box",
+                                   "position": blueprint["position"],
+                                   "width": 0.1,
+                                   "height": 0.1,
+                                   "depth": 0.1,
+                                   "color": (1.0, 0.0, 0.0)})
+
+        return specs
+
+    @staticmethod
+    def get_instance_archetypes(renderable_specs: dict) -> dict:
+
+        """
+        Groups renderables that share the same geometry, so each group can be drawn as instances of a single
+        InstancedMesh. Finger joints are split into a joint and a bone instance: joints share a mesh per joint
+        type, while bones share a single unit-length cylinder that is stretched along Z by their instance
+        matrix. Meshes share their geometry when all their params except the position are the same.
+
+        :param renderable_specs: dict {joint_name: (type_id, params)}, see get_renderable_specs()
+        :return: dict {archetype_key: (shape_blueprint, joint_names, z_scales)}
+        """
+
+        archetypes = {}
+
+        def add_instance(archetype_key: str, blueprint: dict, joint_name: str, z_scale: float):
+            if archetype_key not in archetypes:
+                archetypes[archetype_key] = (blueprint, [], [])
+            archetypes[archetype_key][1].append(joint_name)
+            archetypes[archetype_key][2].append(z_scale)
+
+        for key, (type_id, params) in renderable_specs.items():
+
+            if type_id == "finger_joint":
+                bone_radius = params.get("bone_radius", 0.1)
+                joint_radius = params.get("joint_radius", 0.1)
+                joint_type = params.get("joint_type", "xy")
+
+                add_instance(archetype_key=f"finger_joint_{joint_type}_{joint_radius}_{bone_radius}",
+                             blueprint=FingerJoint.get_joint_blueprint(joint_type=joint_type,
+                                                                       joint_radius=joint_radius,
+                                                                       bone_radius=bone_radius),
+                             joint_name=key,
+                             z_scale=1.0)
+                add_instance(archetype_key=f"finger_bone_{bone_radius}",
+                             blueprint=FingerJoint.get_bone_blueprint(bone_radius=bone_radius, bone_length=1.0),
+                             joint_name=key,
+                             z_scale=params.get("bone_length", 0.1))
+                continue
 
-        # Step 3) Connect renderables hierarchically
-        for (parent_key, child_key) in constants.RENDERABLES_PARENT_CHILD:
-            if child_key not in renderables:
+            if type_id == "mesh":
+                blueprint = {name: value for name, value in params.items() if name != "position"}
+                add_instance(archetype_key=f"mesh_{sorted(blueprint.items())}",
+                             blueprint=blueprint,
+                             joint_name=key,
+                             z_scale=1.0)
                 continue
-            renderables[parent_key].children.append(renderables[child_key])
 
-        # Step 4) Trigger update on all transforms so that their world matrices are validated
-        renderables["root"].update()
+            raise ValueError(f"[ERROR] Renderable type '{type_id}' cannot be instanced")
 
-        # Step 5) Add any other enviromental meshes necessary for rendering
-        self.engine.scene.create_renderable(
-            type_id="chessboard_plane",
-            params={
-                "position": (0, -4, 0),
-                "plane_size": 100,
-                "num_squares": 10
-            })
+        return archetypes
 
-        return renderables
+    def create_finger_joint(self, key: str, params: dict):
+
+        if not self.use_instancing:
+            return self.engine.scene.create_renderable(type_id="finger_joint", params=params)
+
+        self.finger_joint_instance_params[key] = params
+        return None
+
+    def create_finger_joint_instances(self):
+
+        # Finger joints are the only renderables replaced by instances, the rest are still drawn on their own
+        finger_joint_specs = {key: ("finger_joint", params)
+                              for key, params in self.finger_joint_instance_params.items()}
+        archetypes = Hand.get_instance_archetypes(renderable_specs=finger_joint_specs)
+
+        for archetype_key, (blueprint, keys, z_scales) in archetypes.items():
+            self.instance_groups.append(Hand.create_instance_group(
+                scene=self.engine.scene,
+                archetype_key=archetype_key,
+                blueprint=blueprint,
+                joint_indices=[self.skeleton.joint_indices[key] for key in keys],
+                z_scales=z_scales))
+
+        self.update_finger_joint_instances()
+
+    def update_finger_joint_instances(self):
+        Hand.update_instance_groups(instance_groups=self.instance_groups, skeleton=self.skeleton)
+
+    @staticmethod
+    def create_instance_group(scene, archetype_key: str, blueprint: dict, joint_indices: list, z_scales: list):
+
+        """
+        Reserves one instance per joint in the InstancedMesh shared under 'archetype_key' (see
+        get_instance_archetypes()), creating it the first time
+
+        :param scene: Scene holding the instanced renderables
+        :param joint_indices: Skeleton joints whose world matrices the instances follow
+        :param z_scales: Scale along Z of each instance, e.g. bone lengths for the unit-length bone cylinder
+        :return: tuple (instanced_mesh, first_instance, joint_indices, row_scales), see update_instance_groups()
+        """
+
+        instanced_mesh = scene.get_instanced_renderable(key=archetype_key,
+                                                        type_id="instanced_mesh",
+                                                        params={"shape_blueprints": [blueprint],
+                                                                "max_instances": len(joint_indices)})
+
+        # Scaling the Z column of a world matrix is the same as scaling row 2 of its column-major version
+        row_scales = np.ones((len(joint_indices), 4, 1), dtype=np.float32)
+        row_scales[:, 2, 0] = z_scales
+
+        first_instance = instanced_mesh.add_instances(num_instances=len(joint_indices))
+        return instanced_mesh, first_instance, np.array(joint_indices, dtype=np.int32), row_scales
+
+    @staticmethod
+    def update_instance_groups(instance_groups: list, skeleton: Skeleton):
+
+        """
+        Writes the current world matrices of the skeleton to the instances of every group (see
+        create_instance_group())
+        """
+
+        for (instanced_mesh, first_instance, joint_indices, row_scales) in instance_groups:
+            instanced_mesh.write_instances(first_instance=first_instance,
+                                           matrices_gl=skeleton.world_matrices_gl[joint_indices] * row_scales)
+
+    def create_animation_bindings(self):
+
+        """
+        Matches every animation column to the skeleton joint and rotation axis it drives. This is done only
+        once, so that updating the joints every frame is a single scatter of the interpolated values into
+        self.skeleton.rotations.
+        """
+
+        self.binding_joint_indices, self.binding_axis_indices, self.binding_column_indices = \
+            self.skeleton.get_animation_bindings()
 
     def on_update(self, delta_time):
 
-        if self.play_animation:
-            self.playback_timestamp += delta_time * self.time_dilation_factor
-            if self.playback_timestamp > self.animation_duration:
-                self.playback_timestamp = 0.0
+        if self.glove_stream is None or not self.update_hand_joints_from_glove():
 
-        self.update_hand_joints_from_animation(query_timestamp=self.playback_timestamp)
+            if self.play_animation:
+                self.playback_timestamp += delta_time * self.time_dilation_factor
+                if self.playback_timestamp > self.animation_duration:
+                    self.playback_timestamp = 0.0
 
-        self.renderables["root"].update()
+            self.update_hand_joints_from_animation(query_timestamp=self.playback_timestamp)
+
+        self.skeleton.update()
+        if self.use_instancing:
+            self.update_finger_joint_instances()
 
     def on_imgui(self):
 
@@ -177,10 +358,41 @@ class Hand:
                                                         "%.3f")
         imgui.text(f"Index: {self.lower_index}")
         _, self.play_animation = imgui.checkbox("Play animation", self.play_animation)
+        if self.glove_stream is not None:
+            imgui.text(f"Live: {self.glove_stream.num_received} poses received, "
+                       f"{self.glove_stream.num_dropped} dropped")
         imgui.end()
 
+    def update_hand_joints_from_glove(self) -> bool:
+
+        """
+        Poses the hand with the newest pose received from the glove
+
+        :return: False if no pose has been received yet
+        """
+
+        self.live_sequence = self.glove_stream.read_latest(out_record=self.live_record)
+        if self.live_sequence == 0:
+            return False
+
+        np.take(self.live_values, self.binding_column_indices, out=self.live_binding_values)
+        np.radians(self.live_binding_values, out=self.live_binding_values)
+        self.skeleton.rotations[self.binding_joint_indices, self.binding_axis_indices] = self.live_binding_values
+
+        # From here on, this frame shows the pose, so its latency is measured
+        self.engine.latency_monitor.set_pose(sample_timestamp=self.live_record[PoseRingBuffer.SAMPLE_TIMESTAMP],
+                                             receive_time=self.live_record[PoseRingBuffer.RECEIVE_TIME])
+        return True
+
     def update_hand_joints_from_animation(self, query_timestamp: float):
 
+        if self.animation_stream is not None:
+            self.animation_stream.seek(timestamp=query_timestamp)
+            if self.timestamps is not self.animation_stream.timestamps:
+                self.timestamps = self.animation_stream.timestamps
+                self.joint_values = self.animation_stream.joint_values
+                self.keyframe_lookup.set_timestamps(timestamps=self.timestamps)
+
         self.lower_index = self.get_lower_index(query_timestamp=query_timestamp)
 
         lower_index = self.lower_index
@@ -196,26 +408,10 @@ class Hand:
                         (self.timestamps[upper_index] - self.timestamps[lower_index]))
             interpolated_values = self.joint_values[lower_index, :] + fraction * (self.joint_values[upper_index, :] - self.joint_values[lower_index, :])
 
-        for renderable_name, renderable in self.renderables.items():
-
-            if renderable_name == "root":
-                continue
-
-            matched_axes = [(column_index - 1, key) for column_index, key in enumerate(self.hand_animation.keys()) if key.startswith(renderable_name)]
-
-            for (column_index, matched_axis) in matched_axes:
-                angle = np.radians(interpolated_values[column_index])
-                if matched_axis.endswith("x"):
-                    renderable.rotation.x = angle
-                elif matched_axis.endswith("y"):
-                    renderable.rotation.y = angle
-                elif matched_axis.endswith("z"):
-                    renderable.rotation.z = angle
+        self.skeleton.rotations[self.binding_joint_indices, self.binding_axis_indices] = \
+            np.radians(interpolated_values[self.binding_column_indices])
 
     def get_lower_index(self, query_timestamp: float) -> int:
 
-        # Find indices for interpolation
-        lower_values_mask = self.timestamps <= query_timestamp
-        index = int(np.sum(lower_values_mask))
-
-        return np.minimum(index, self.timestamps.size -1 )
\ No newline at end of file
+        # Last keyframe at or before the query timestamp (see KeyframeLookup)
+        return self.keyframe_lookup.find(query_timestamp=query_timestamp)
\ No newline at end of file
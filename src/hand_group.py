@@ -0,0 +1,227 @@
+import imgui
+import numpy as np
+from src.engine import Engine
+from src.hand import Hand
+from src.keyframe_lookup import KeyframeLookup
+from src.skeleton import Skeleton
+from src.utilities import utils_io
+
+from src import constants
+
+
+class HandGroup:
+
+    """
+    Plays several hand animations at once, side by side.
+
+    All hands are merged into a single Skeleton (see Skeleton.stack()), so the pose of every hand lives in the same
+    packed arrays and all of them are updated with one call per frame. Geometry is shared too: every joint
+    archetype (see Hand.get_instance_archetypes()) is a single InstancedMesh holding the instances of all hands,
+    so the number of draw calls does not grow with the number of hands.
+    """
+
+    def __init__(self,
+                 engine: Engine,
+                 hand_config_yaml_fpaths: list,
+                 hand_animation_txt_fpaths: list,
+                 use_uniform_timestamps=True,
+                 hand_spacing=constants.HAND_GROUP_SPACING,
+                 num_columns=constants.HAND_GROUP_NUM_COLUMNS):
+
+        """
+        :param engine: Engine
+        :param hand_config_yaml_fpaths: list of hand configurations, one per hand. A single one is used by all hands
+        :param hand_animation_txt_fpaths: list of terminal dump animations, one per hand
+        :param use_uniform_timestamps: See utils_io.load_hand_animation_cached()
+        :param hand_spacing: Distance between neighbouring hands
+        :param num_columns: Number of hands per row
+        """
+
+        if len(hand_config_yaml_fpaths) == 1:
+            hand_config_yaml_fpaths = hand_config_yaml_fpaths * len(hand_animation_txt_fpaths)
+        if len(hand_config_yaml_fpaths) != len(hand_animation_txt_fpaths):
+            raise ValueError(f"[ERROR] Got {len(hand_config_yaml_fpaths)} hand configurations for "
+                             f"{len(hand_animation_txt_fpaths)} animations")
+
+        self.engine = engine
+        self.engine.set_external_update_callback(self.on_update)
+        self.engine.set_external_imgui_callback(self.on_imgui)
+
+        self.num_hands = len(hand_animation_txt_fpaths)
+
+        # Hands sharing the same files also share the loaded data
+        hand_configs = {}
+        animations = {}
+        for yaml_fpath in set(hand_config_yaml_fpaths):
+            hand_configs[yaml_fpath] = utils_io.load_hand_configuration(yaml_fpath=yaml_fpath)
+        for txt_fpath in set(hand_animation_txt_fpaths):
+            animations[txt_fpath] = utils_io.load_hand_animation_cached(txt_fpath=txt_fpath,
+                                                                        use_uniform_timestamps=use_uniform_timestamps)
+
+        self.hand_configs = [hand_configs[yaml_fpath] for yaml_fpath in hand_config_yaml_fpaths]
+        self.timestamps = [animations[txt_fpath][0] for txt_fpath in hand_animation_txt_fpaths]
+        self.joint_values = [animations[txt_fpath][1] for txt_fpath in hand_animation_txt_fpaths]
+        self.animation_durations = np.array([timestamps[-1] for timestamps in self.timestamps], dtype=np.float64)
+        self.animation_duration = float(self.animation_durations.max())
+        self.keyframe_lookups = [KeyframeLookup(timestamps=timestamps, uniform=use_uniform_timestamps)
+                                 for timestamps in self.timestamps]
+
+        # Packed pose of all hands
+        hand_skeletons = [Skeleton.from_hand_configuration(hand_config=hand_config)
+                          for hand_config in self.hand_configs]
+        self.skeleton, self.first_joint_indices = Skeleton.stack(skeletons=hand_skeletons)
+        self.hand_positions = self.get_hand_positions(hand_spacing=hand_spacing, num_columns=num_columns)
+        self.skeleton.positions[self.first_joint_indices, :] = self.hand_positions
+        self.skeleton.update()
+
+        self.create_animation_bindings(hand_skeletons=hand_skeletons)
+
+        # Per-hand keyframes, gathered every frame before interpolating all hands at once
+        num_columns = len(constants.ANIMATION_COLUMN_NAMES)
+        self.lower_values = np.zeros((self.num_hands, num_columns), dtype=np.float64)
+        self.upper_values = np.zeros((self.num_hands, num_columns), dtype=np.float64)
+        self.fractions = np.zeros((self.num_hands, 1), dtype=np.float64)
+
+        self.instance_groups = []
+        self.create_instances()
+        self.create_environment()
+
+        self.time_dilation_factor = 0.25
+        self.play_animation = False
+        self.playback_timestamp = 0
+
+    def get_hand_positions(self, hand_spacing: float, num_columns: int) -> np.ndarray:
+
+        """
+        Places the hands on a grid on the XZ plane, centered around the origin
+
+        :return: numpy ndarray (num_hands, 3) <float32>
+        """
+
+        hand_indices = np.arange(self.num_hands)
+        num_columns = max(min(num_columns, self.num_hands), 1)
+        num_rows = (self.num_hands + num_columns - 1) // num_columns
+
+        positions = np.zeros((self.num_hands, 3), dtype=np.float32)
+        positions[:, 0] = (hand_indices % num_columns - (num_columns - 1) / 2.0) * hand_spacing
+        positions[:, 2] = (hand_indices // num_columns - (num_rows - 1) / 2.0) * hand_spacing
+        return positions
+
+    def create_animation_bindings(self, hand_skeletons: list):
+
+        """
+        Same as Hand.create_animation_bindings(), but for all hands at once. Each binding also stores the hand it
+        belongs to, so the interpolated values of all hands are scattered into the packed skeleton with a single
+        fancy-index assignment.
+        """
+
+        joint_indices = []
+        axis_indices = []
+        column_indices = []
+        hand_indices = []
+
+        for hand_index, hand_skeleton in enumerate(hand_skeletons):
+            first_joint_index = self.first_joint_indices[hand_index]
+            hand_joint_indices, hand_axis_indices, hand_column_indices = hand_skeleton.get_animation_bindings()
+            joint_indices.append(hand_joint_indices + first_joint_index)
+            axis_indices.append(hand_axis_indices)
+            column_indices.append(hand_column_indices)
+            hand_indices.append(np.full_like(hand_joint_indices, hand_index))
+
+        self.binding_joint_indices = np.concatenate(joint_indices)
+        self.binding_axis_indices = np.concatenate(axis_indices)
+        self.binding_column_indices = np.concatenate(column_indices)
+        self.binding_hand_indices = np.concatenate(hand_indices)
+
+    def create_instances(self):
+
+        # Gather the instances of every archetype across all hands
+        archetypes = {}
+        for hand_index, hand_config in enumerate(self.hand_configs):
+
+            renderable_specs = Hand.get_renderable_specs(hand_config=hand_config)
+            hand_archetypes = Hand.get_instance_archetypes(renderable_specs=renderable_specs)
+
+            for archetype_key, (blueprint, keys, z_scales) in hand_archetypes.items():
+                if archetype_key not in archetypes:
+                    archetypes[archetype_key] = (blueprint, [], [])
+                archetypes[archetype_key][1].extend([self.skeleton.joint_indices[f"{hand_index}/{key}"]
+                                                     for key in keys])
+                archetypes[archetype_key][2].extend(z_scales)
+
+        for archetype_key, (blueprint, joint_indices, z_scales) in archetypes.items():
+            self.instance_groups.append(Hand.create_instance_group(scene=self.engine.scene,
+                                                                   archetype_key=archetype_key,
+                                                                   blueprint=blueprint,
+                                                                   joint_indices=joint_indices,
+                                                                   z_scales=z_scales))
+
+        self.update_instances()
+
+    def create_environment(self):
+
+        center = self.hand_positions.mean(axis=0)
+        extent = float(np.abs(self.hand_positions - center).max()) if self.num_hands > 0 else 0.0
+        self.engine.scene.create_renderable(
+            type_id="chessboard_plane",
+            params={
+                "position": (float(center[0]), -4, float(center[2])),
+                "plane_size": max(100, 2 * extent + 50),
+                "num_squares": 10
+            })
+
+    def on_update(self, delta_time):
+
+        if self.play_animation:
+            self.playback_timestamp += delta_time * self.time_dilation_factor
+            if self.playback_timestamp > self.animation_duration:
+                self.playback_timestamp = 0.0
+
+        self.update_joints_from_animation(query_timestamp=self.playback_timestamp)
+
+        self.skeleton.update()
+        self.update_instances()
+
+    def on_imgui(self):
+
+        imgui.begin(f"Hand Animation", True)
+
+        _, self.playback_timestamp = imgui.slider_float("Timestamp",
+                                                        self.playback_timestamp,
+                                                        0.0,
+                                                        self.animation_duration,
+                                                        "%.3f")
+        imgui.text(f"Hands: {self.num_hands}")
+        _, self.play_animation = imgui.checkbox("Play animation", self.play_animation)
+        imgui.end()
+
+    def update_joints_from_animation(self, query_timestamp: float):
+
+        # Shorter animations loop on their own while the longest one plays
+        for hand_index in range(self.num_hands):
+
+            timestamps = self.timestamps[hand_index]
+            joint_values = self.joint_values[hand_index]
+            hand_timestamp = query_timestamp
+            if self.animation_durations[hand_index] > 0.0:
+                hand_timestamp = query_timestamp % self.animation_durations[hand_index]
+
+            lower_index = self.keyframe_lookups[hand_index].find(query_timestamp=hand_timestamp)
+            upper_index = min(lower_index + 1, timestamps.size - 1)
+
+            self.lower_values[hand_index, :] = joint_values[lower_index, :]
+            self.upper_values[hand_index, :] = joint_values[upper_index, :]
+
+            # Avoid division by zero and ensure valid interpolation
+            time_span = timestamps[upper_index] - timestamps[lower_index]
+            self.fractions[hand_index, 0] = (hand_timestamp - timestamps[lower_index]) / time_span \
+                if time_span > 0.0 else 0.0
+
+        # Linear interpolation of all hands at once
+        interpolated_values = self.lower_values + self.fractions * (self.upper_values - self.lower_values)
+
+        self.skeleton.rotations[self.binding_joint_indices, self.binding_axis_indices] = \
+            np.radians(interpolated_values[self.binding_hand_indices, self.binding_column_indices])
+
+    def update_instances(self):
+        Hand.update_instance_groups(instance_groups=self.instance_groups, skeleton=self.skeleton)
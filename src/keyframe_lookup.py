@@ -0,0 +1,83 @@
+import numpy as np
+
+# How many keyframes the cursor is allowed to move forward before falling back to binary search
+MAX_CURSOR_STEPS = 4
+
+
+class KeyframeLookup:
+
+    """
+    Finds the keyframe right before (or at) a query timestamp, i.e. the largest index 'i' such that
+    timestamps[i] <= query_timestamp, clamped to the valid range of indices.
+
+    Three strategies are used, from fastest to slowest:
+    - Uniform timestamps: The index is computed directly from the sample period -> O(1)
+    - Cursor: Playback usually moves forward a little every frame, so the previous result is checked first,
+      and then the next few keyframes -> O(1)
+    - Binary search with np.searchsorted -> O(log n)
+    """
+
+    def __init__(self, timestamps: np.ndarray, uniform=False):
+
+        self.timestamps = None
+        self.uniform = uniform
+        self.sample_period = 0.0
+        self.cursor = 0
+        self.set_timestamps(timestamps=timestamps, uniform=uniform)
+
+    def set_timestamps(self, timestamps: np.ndarray, uniform=None):
+
+        """
+        Replaces the keyframe timestamps (must be sorted in ascending order) and resets the cursor
+
+        :param timestamps: numpy ndarray (N,)
+        :param uniform: If True, timestamps are assumed to be linearly spaced. None keeps the current setting
+        """
+
+        self.timestamps = np.asarray(timestamps).reshape(-1)
+        if uniform is not None:
+            self.uniform = uniform
+
+        self.sample_period = 0.0
+        if self.uniform and self.timestamps.size > 1:
+            self.sample_period = (self.timestamps[-1] - self.timestamps[0]) / (self.timestamps.size - 1)
+
+        self.cursor = 0
+
+    def find(self, query_timestamp: float) -> int:
+
+        timestamps = self.timestamps
+        last_index = timestamps.size - 1
+
+        if query_timestamp <= timestamps[0]:
+            self.cursor = 0
+            return 0
+
+        if query_timestamp >= timestamps[last_index]:
+            self.cursor = last_index
+            return last_index
+
+        if self.sample_period > 0.0:
+            index = int((query_timestamp - timestamps[0]) / self.sample_period)
+            index = min(max(index, 0), last_index)
+
+            # Correct any floating point error so the result matches a binary search exactly
+            if timestamps[index] > query_timestamp:
+                index -= 1
+            elif index < last_index and timestamps[index + 1] <= query_timestamp:
+                index += 1
+
+            self.cursor = index
+            return index
+
+        # Cursor fast path
+        index = self.cursor
+        if timestamps[index] <= query_timestamp:
+            for _ in range(MAX_CURSOR_STEPS):
+                if query_timestamp < timestamps[index + 1]:
+                    self.cursor = index
+                    return index
+                index += 1
+
+        self.cursor = int(np.searchsorted(timestamps, query_timestamp, side="right")) - 1
+        return self.cursor
@@ -0,0 +1,204 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import imgui
+import numpy as np
+
+from src import constants
+from src.frame_profiler import FrameProfiler
+
+# Stages of the glove-to-photon path, in milliseconds (see LatencyMonitor.finish_record())
+STAGES = ("ingestion", "queue", "render_cpu", "render_gpu", "present", "total")
+STAGE_DESCRIPTIONS = {
+    "ingestion": "Sampled by the glove -> received by GloveStream",
+    "queue": "Received -> pose applied to the hand",
+    "render_cpu": "Pose applied -> Scene.render() submitted",
+    "render_gpu": "GPU time of the render passes (timer queries, see FrameProfiler)",
+    "present": "Scene.render() submitted -> presented (estimate)",
+    "total": "Sampled by the glove -> presented (estimate)",
+}
+
+# Raw timestamps of every record, all in time.time() seconds but 'render_gpu', which is a duration
+LOG_FIELDS = ("frame", "sample_timestamp", "receive_time", "pose_time", "render_start", "render_end", "swap_end",
+              "render_gpu")
+
+
+class LatencyMonitor:
+
+    """
+    Measures how stale the displayed pose is: for every frame that shows a live pose (see Hand and GloveStream),
+    the time the pose was sampled, received, applied, rendered and presented.
+
+    The GPU part comes from the timer queries of the render passes (see FrameProfiler), so records are only
+    finished once their results have been read, a few frames later. OpenGL has no way to tell when a frame reaches
+    the screen, so presentation is estimated as the latest of the buffer swap returning and the GPU finishing the
+    frame (assuming it started as soon as it was submitted).
+
+    Rolling percentiles over the last 'window_size' frames are shown in an imgui panel, and all records can be
+    exported as CSV or JSON (see export()).
+    """
+
+    def __init__(self,
+                 profiler: FrameProfiler,
+                 window_size=constants.LATENCY_WINDOW_SIZE,
+                 log_fpath=None):
+
+        """
+        :param profiler: FrameProfiler timing the render passes on the GPU
+        :param window_size: Number of frames the rolling percentiles are computed over
+        :param log_fpath: Where export() writes to by default (.csv or .json). None uses constants.LATENCY_LOG_FPATH
+        """
+
+        self.profiler = profiler
+        self.log_fpath = log_fpath if log_fpath is not None else constants.LATENCY_LOG_FPATH
+
+        # Rolling window of stage latencies, in milliseconds
+        self.window = np.zeros((window_size, len(STAGES)), dtype=np.float64)
+        self.num_window_records = 0
+
+        # Finished records, see LOG_FIELDS
+        self.log = []
+
+        # Records wait for the GPU times of their frame, oldest first
+        self.pending_records = deque()
+        self.record = None  # Record of the current frame, if it shows a live pose
+
+    def set_pose(self, sample_timestamp: float, receive_time: float):
+
+        """
+        Called when a live pose is applied to the scene, this frame is then measured
+
+        :param sample_timestamp: time.time() the pose was sampled at, by the glove
+        :param receive_time: time.time() the pose was received at
+        """
+
+        self.record = {"frame": self.profiler.frame,
+                       "sample_timestamp": sample_timestamp,
+                       "receive_time": receive_time,
+                       "pose_time": time.time()}
+
+    @contextmanager
+    def measure_render(self):
+
+        """
+        Wraps Scene.render(). Does nothing if the frame does not show a live pose
+        """
+
+        if self.record is None:
+            yield
+            return
+
+        self.record["render_start"] = time.time()
+        yield
+        self.record["render_end"] = time.time()
+
+    def end_frame(self):
+
+        """
+        Called right after the buffers are swapped, before FrameProfiler.end_frame()
+        """
+
+        if self.record is not None and "render_end" in self.record:
+            self.record["swap_end"] = time.time()
+            self.pending_records.append(self.record)
+        self.record = None
+        self.collect()
+
+    def collect(self):
+
+        while len(self.pending_records) > 0:
+            render_gpu = self.profiler.get_gpu_time(frame=self.pending_records[0]["frame"])
+            if render_gpu is None:
+                return  # Not read yet, nor the ones of the following frames
+
+            record = self.pending_records.popleft()
+            record["render_gpu"] = render_gpu
+            self.finish_record(record=record)
+
+    def flush(self):
+
+        """
+        Finishes all pending records, waiting for the GPU if needed
+        """
+
+        self.profiler.flush()
+        self.collect()
+
+    def finish_record(self, record: dict):
+
+        # Without GPU times (e.g. the profiler is disabled), the swap is the only estimate left
+        presentation_time = record["swap_end"]
+        if not np.isnan(record["render_gpu"]):
+            presentation_time = max(presentation_time, record["render_start"] + record["render_gpu"])
+        latencies = (record["receive_time"] - record["sample_timestamp"],
+                     record["pose_time"] - record["receive_time"],
+                     record["render_end"] - record["pose_time"],
+                     record["render_gpu"],
+                     presentation_time - record["render_end"],
+                     presentation_time - record["sample_timestamp"])
+
+        row = self.window[self.num_window_records % self.window.shape[0]]
+        row[:] = latencies
+        row *= 1000.0
+        self.num_window_records += 1
+        self.log.append(tuple(record[field] for field in LOG_FIELDS))
+
+    def get_percentiles(self, percentiles=constants.LATENCY_PERCENTILES) -> np.ndarray:
+
+        """
+        :return: numpy ndarray (len(percentiles), len(STAGES)) in milliseconds over the rolling window, or None if
+                 nothing has been measured yet
+        """
+
+        num_records = min(self.num_window_records, self.window.shape[0])
+        if num_records == 0:
+            return None
+        return np.percentile(self.window[:num_records], percentiles, axis=0)
+
+    def export(self, fpath=None) -> str:
+
+        """
+        Writes all records measured so far, with their raw timestamps (see LOG_FIELDS). The format follows the
+        extension of the file: .json, otherwise CSV
+
+        :return: Path of the file written
+        """
+
+        self.flush()
+        fpath = fpath if fpath is not None else self.log_fpath
+        os.makedirs(os.path.dirname(os.path.abspath(fpath)), exist_ok=True)
+
+        if fpath.lower().endswith(".json"):
+            with open(fpath, "w") as file:
+                json.dump({"fields": LOG_FIELDS, "records": self.log}, file)
+        else:
+            with open(fpath, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(LOG_FIELDS)
+                writer.writerows(self.log)
+
+        return fpath
+
+    def on_imgui(self):
+
+        percentiles = self.get_percentiles()
+        if percentiles is None:
+            return
+
+        imgui.begin("Latency", True)
+        imgui.text(f"Last {min(self.num_window_records, self.window.shape[0])} frames (ms)")
+        imgui.text(f"{'':<12}" + "".join(f"{f'p{p}':>9}" for p in constants.LATENCY_PERCENTILES))
+        for stage_index, stage in enumerate(STAGES):
+            imgui.text(f"{stage:<12}" + "".join(f"{value:9.2f}" for value in percentiles[:, stage_index]))
+            if imgui.is_item_hovered():
+                imgui.set_tooltip(STAGE_DESCRIPTIONS[stage])
+
+        if imgui.button("Export log"):
+            self.export()
+        imgui.same_line()
+        imgui.text(os.path.basename(self.log_fpath))
+        imgui.end()
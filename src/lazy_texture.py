@@ -0,0 +1,85 @@
+from concurrent.futures import Executor, Future
+from typing import Callable
+
+
+class LazyTexture:
+
+    """
+    Handle to a texture that is only loaded when it is first used.
+
+    Loading is split in two steps: 'decode_function' reads the pixels from disk and runs on 'executor' (a thread
+    pool), while 'upload_function' creates the OpenGL texture from them. The upload is only ever done from get()
+    or use(), which are called while rendering, so it always happens on the thread that owns the GL context.
+    Until the pixels are ready, 'placeholder' is bound instead.
+    """
+
+    def __init__(self,
+                 decode_function: Callable,
+                 upload_function: Callable,
+                 placeholder,
+                 executor: Executor):
+
+        """
+        :param decode_function: Callable with no arguments returning the decoded pixels. Must not use OpenGL
+        :param upload_function: Callable taking the decoded pixels and returning a moderngl texture
+        :param placeholder: moderngl texture bound while the real one is not ready
+        :param executor: Executor that runs 'decode_function'
+        """
+
+        self.decode_function = decode_function
+        self.upload_function = upload_function
+        self.placeholder = placeholder
+        self.executor = executor
+
+        self.future = None  # Future of the decoded pixels, once requested
+        self.texture = None
+
+    @property
+    def ready(self) -> bool:
+        return self.texture is not None
+
+    def request(self) -> Future:
+
+        """
+        Starts decoding the texture in the background, if it has not started yet
+        """
+
+        if self.future is None:
+            self.future = self.executor.submit(self.decode_function)
+        return self.future
+
+    def get(self):
+
+        """
+        :return: The moderngl texture if its pixels are decoded (uploading them first if needed), otherwise the
+                 placeholder. Exceptions raised while decoding are raised here
+        """
+
+        if self.texture is None and self.request().done():
+            self.upload(pixels=self.future.result())
+        return self.texture if self.texture is not None else self.placeholder
+
+    def wait(self):
+
+        """
+        Same as get(), but blocks until the texture is decoded, so the real texture is always returned
+        """
+
+        if self.texture is None:
+            self.upload(pixels=self.request().result())
+        return self.texture
+
+    def upload(self, pixels):
+        self.texture = self.upload_function(pixels)
+        self.future = None  # The decoded pixels are no longer needed
+
+    def use(self, location=0):
+        self.get().use(location=location)
+
+    def release(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+        if self.texture is not None:
+            self.texture.release()
+            self.texture = None
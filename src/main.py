@@ -1,6 +1,8 @@
 from utilities import utils_io
 from hand import Hand
 from engine import Engine
+from glove_stream import GloveStream
+import argparse
 import os
 import glm
 
@@ -9,18 +11,35 @@ import constants
 
 def main():
 
-    engine = Engine(vertical_sync=True)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", nargs="?", const=constants.GLOVE_STREAM_ADDRESS, default=None,
+                        help="Follow the glove live, receiving poses on this address (see glove_replay.py)")
+    parser.add_argument("--latency-log", type=str, default=None,
+                        help="Export the glove-to-photon latency of live poses to this .csv or .json file on exit")
+    args = parser.parse_args()
+
+    engine = Engine(vertical_sync=True, latency_log_fpath=args.latency_log)
+
+    # Live glove poses, received in the background
+    glove_stream = None
+    if args.live is not None:
+        glove_stream = GloveStream(address=args.live)
+        glove_stream.start()
 
     # Configure hand
     config_fpath = os.path.join(constants.CONFIG_DIR, "default_hand.yaml")
     animation_fpath = os.path.join(constants.DATA_DIR, "animation_1.txt")
     hand = Hand(engine=engine,
                 hand_config_yaml_fpath=config_fpath,
-                hand_animation_txt_fpath=animation_fpath)
+                hand_animation_txt_fpath=animation_fpath,
+                glove_stream=glove_stream)
 
     # And now you can run it :)
     engine.run()
 
+    if glove_stream is not None:
+        glove_stream.stop()
+
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,5 @@
 import numpy as np
-from numba import njit, float32
+from numba import njit, prange, float32
 from src import mat3
 
 DEG2RAD = np.pi / 180.0
@@ -55,7 +55,7 @@ def compute_transform(position: tuple, rotation_rad: tuple, scale=1.0, order='xy
     return transform
 
 
-@njit(float32[:, :](float32[:], float32[:], float32[:]))
+@njit(float32[:, :](float32[:], float32[:], float32[:]), cache=True)
 def create_transform_euler_xyz(position: np.array, rotation: np.array, scale: np.array):
 
     """
@@ -93,6 +93,109 @@ def create_transform_euler_xyz(position: np.array, rotation: np.array, scale: np
     return transform
 
 
+@njit(cache=True)
+def mul_mat4(in_mat4_a: np.ndarray, in_mat4_b: np.ndarray, out_mat4: np.ndarray):
+    # IMPORTANT: out_mat4 must not be the same array as any of the inputs!
+    for row in range(4):
+        for col in range(4):
+            out_mat4[row, col] = (in_mat4_a[row, 0] * in_mat4_b[0, col] +
+                                  in_mat4_a[row, 1] * in_mat4_b[1, col] +
+                                  in_mat4_a[row, 2] * in_mat4_b[2, col] +
+                                  in_mat4_a[row, 3] * in_mat4_b[3, col])
+
+
+@njit(cache=True)
+def compute_hierarchy_transforms_euler_xyz(positions: np.ndarray,
+                                           rotations: np.ndarray,
+                                           scales: np.ndarray,
+                                           parent_indices: np.ndarray,
+                                           out_local_mat4s: np.ndarray,
+                                           out_world_mat4s: np.ndarray):
+
+    """
+    Computes local and world transforms of a whole hierarchy in a single pass. Joints MUST be sorted
+    topologically, so that every parent comes before its children.
+
+    :param positions: numpy ndarray (N, 3) <float32>
+    :param rotations: numpy ndarray (N, 3) <float32> Euler XYZ angles in radians
+    :param scales: numpy ndarray (N, 3) <float32>
+    :param parent_indices: numpy ndarray (N,) <int32>. Negative values mean no parent
+    :param out_local_mat4s: numpy ndarray (N, 4, 4) <float32>
+    :param out_world_mat4s: numpy ndarray (N, 4, 4) <float32>
+    """
+
+    for i in range(positions.shape[0]):
+        out_local_mat4s[i, :, :] = create_transform_euler_xyz(positions[i, :], rotations[i, :], scales[i, :])
+
+        parent_index = parent_indices[i]
+        if parent_index < 0:
+            out_world_mat4s[i, :, :] = out_local_mat4s[i, :, :]
+        else:
+            mul_mat4(out_world_mat4s[parent_index], out_local_mat4s[i], out_world_mat4s[i])
+
+
+@njit(cache=True)
+def compute_normal_matrices(in_mat4s: np.ndarray, out_mat3s: np.ndarray):
+
+    """
+    Computes the normal matrix (inverse transpose of the upper 3x3) of every matrix, as the cofactor matrix
+    divided by the determinant, so scaled transforms are supported too (unlike even_faster_inverse()).
+    Transposing the input transposes the output, so column-major (OpenGL) matrices give column-major results.
+
+    :param in_mat4s: numpy ndarray (N, 4, 4) <float32>
+    :param out_mat3s: numpy ndarray (N, 3, 3) <float32>
+    """
+
+    for i in range(in_mat4s.shape[0]):
+        a = in_mat4s[i]
+        c00 = a[1, 1] * a[2, 2] - a[1, 2] * a[2, 1]
+        c01 = a[1, 2] * a[2, 0] - a[1, 0] * a[2, 2]
+        c02 = a[1, 0] * a[2, 1] - a[1, 1] * a[2, 0]
+        determinant = a[0, 0] * c00 + a[0, 1] * c01 + a[0, 2] * c02
+        inv_determinant = 1.0 / determinant if determinant != 0.0 else 0.0
+
+        out_mat3s[i, 0, 0] = c00 * inv_determinant
+        out_mat3s[i, 0, 1] = c01 * inv_determinant
+        out_mat3s[i, 0, 2] = c02 * inv_determinant
+        out_mat3s[i, 1, 0] = (a[0, 2] * a[2, 1] - a[0, 1] * a[2, 2]) * inv_determinant
+        out_mat3s[i, 1, 1] = (a[0, 0] * a[2, 2] - a[0, 2] * a[2, 0]) * inv_determinant
+        out_mat3s[i, 1, 2] = (a[0, 1] * a[2, 0] - a[0, 0] * a[2, 1]) * inv_determinant
+        out_mat3s[i, 2, 0] = (a[0, 1] * a[1, 2] - a[0, 2] * a[1, 1]) * inv_determinant
+        out_mat3s[i, 2, 1] = (a[0, 2] * a[1, 0] - a[0, 0] * a[1, 2]) * inv_determinant
+        out_mat3s[i, 2, 2] = (a[0, 0] * a[1, 1] - a[0, 1] * a[1, 0]) * inv_determinant
+
+
+@njit(parallel=True, cache=True)
+def compute_hierarchy_positions_euler_xyz_batch(positions: np.ndarray,
+                                                rotations: np.ndarray,
+                                                scales: np.ndarray,
+                                                parent_indices: np.ndarray,
+                                                out_world_positions: np.ndarray):
+
+    """
+    Same as compute_hierarchy_transforms_euler_xyz(), but for many poses of the same hierarchy at once. Poses
+    are evaluated in parallel and only the world positions are kept.
+
+    :param positions: numpy ndarray (N, 3) <float32> Shared by all poses
+    :param rotations: numpy ndarray (F, N, 3) <float32> Euler XYZ angles in radians, one set per pose
+    :param scales: numpy ndarray (N, 3) <float32> Shared by all poses
+    :param parent_indices: numpy ndarray (N,) <int32>. Negative values mean no parent
+    :param out_world_positions: numpy ndarray (F, N, 3) <float32>
+    """
+
+    num_joints = positions.shape[0]
+    for frame in prange(rotations.shape[0]):
+        world_mat4s = np.empty((num_joints, 4, 4), dtype=np.float32)
+        for i in range(num_joints):
+            local_mat4 = create_transform_euler_xyz(positions[i, :], rotations[frame, i, :], scales[i, :])
+            parent_index = parent_indices[i]
+            if parent_index < 0:
+                world_mat4s[i, :, :] = local_mat4
+            else:
+                mul_mat4(world_mat4s[parent_index], local_mat4, world_mat4s[i])
+            out_world_positions[frame, i, :] = world_mat4s[i, :3, 3]
+
+
 #@njit(float32[:](float32[:, :]), cache=True)
 def to_euler_xyz(rotation_matrix) -> np.array:
 
@@ -265,3 +368,23 @@ def orthographic_projection(left: float32, right: float32, bottom: float32, top:
                      [0, 2.0 / dy, 0, ry],
                      [0, 0, -2.0 / dz, rz],
                      [0, 0, 0, 1]], dtype=np.float32)
+
+
+def transform_bounds(matrices: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+
+    """
+    Computes the axis-aligned bounding box of a transformed axis-aligned bounding box, without transforming its
+    8 corners (the extent is projected onto the new axes with the absolute value of the rotation)
+
+    :param matrices: numpy ndarray (4, 4) or (N, 4, 4), row-major
+    :param bounds: numpy ndarray (2, 3), minimum and maximum corners
+    :return: numpy ndarray (2, 3) or (N, 2, 3) <float32>
+    """
+
+    center = (bounds[0] + bounds[1]) * 0.5
+    extent = (bounds[1] - bounds[0]) * 0.5
+    rotation = matrices[..., :3, :3]
+
+    new_center = rotation @ center + matrices[..., :3, 3]
+    new_extent = np.abs(rotation) @ extent
+    return np.stack([new_center - new_extent, new_center + new_extent], axis=-2).astype(np.float32)
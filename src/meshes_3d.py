@@ -1,25 +1,30 @@
 import numpy as np
-import trimesh
+import hashlib
+import os
+import zipfile
+from collections import OrderedDict
 from src import constants
 
 from src import mat4
 
 
-def create_composite_mesh(shape_blueprint_list: list):
+def create_composite_mesh(shape_blueprint_list: list,
+                          data_format=constants.DEFAULT_VERTEX_FORMAT,
+                          attributes=constants.DEFAULT_VERTEX_ATTRIBUTES):
 
     """
-    Input should be a list of dictionaries describing the shape
-    :param shape_blueprint_list:
-    :return:
+    Input should be a list of dictionaries describing the shape. All shapes are written straight into a single
+    interleaved vertex array (see create_vertex_array()), so the result can be uploaded without further copies.
+
+    :param shape_blueprint_list: list of dict, each with a 'shape' field and the parameters of create_mesh()
+    :param data_format: Vertex layout of the interleaved array, as used by moderngl
+    :param attributes: Vertex shader inputs, one per component of 'data_format'
+    :return: dict with the same fields as create_mesh(), plus the interleaved array. Vertices, normals and
+             colors are views into the interleaved array
     """
 
-    vertices_list = []
-    normals_list = []
-    colors_list = []
-    indices_list = []
-    total_num_vertices = 0
-
-    for blueprint_index, shape_blueprint in enumerate(shape_blueprint_list):
+    meshes_data = []
+    for shape_blueprint in shape_blueprint_list:
 
         shape = shape_blueprint.get(constants.KEY_SHAPE, None)
         params = {key: value for key, value in shape_blueprint.items() if key != constants.KEY_SHAPE}
@@ -27,90 +32,308 @@ def create_composite_mesh(shape_blueprint_list: list):
         if shape is None:
             raise ValueError(f"[ERROR] Shape blueprint does not have a '{constants.KEY_SHAPE}' field")
 
-        mesh_data = create_mesh(shape=shape, params=params)
-
-        vertices_list.append(mesh_data["vertices"])
-        normals_list.append(mesh_data["normals"])
-        colors_list.append(mesh_data["colors"])
-
-        mesh_data["indices"] += total_num_vertices
-        indices_list.append(mesh_data["indices"])
-        total_num_vertices += mesh_data["vertices"].shape[0]
+        meshes_data.append(create_mesh(shape=shape, params=params))
 
     # And Assemble final mesh here
-    return {
-        constants.KEY_PRIMITIVE_VERTICES: np.concatenate(vertices_list, axis=0),
-        constants.KEY_PRIMITIVE_NORMALS: np.concatenate(normals_list, axis=0),
-        constants.KEY_PRIMITIVE_COLORS: np.concatenate(colors_list, axis=0),
-        constants.KEY_PRIMITIVE_INDICES: np.concatenate(indices_list, axis=0)
+    total_num_vertices = sum(mesh_data[constants.KEY_PRIMITIVE_VERTICES].shape[0] for mesh_data in meshes_data)
+    total_num_indices = sum(mesh_data[constants.KEY_PRIMITIVE_INDICES].size for mesh_data in meshes_data)
+    vertex_array = create_vertex_array(num_vertices=total_num_vertices, data_format=data_format, attributes=attributes)
+    indices = np.empty(total_num_indices, dtype=np.int32)
+
+    first_vertex = 0
+    first_index = 0
+    for mesh_data in meshes_data:
+        num_vertices = mesh_data[constants.KEY_PRIMITIVE_VERTICES].shape[0]
+        num_indices = mesh_data[constants.KEY_PRIMITIVE_INDICES].size
+
+        write_vertex_attributes(mesh_data=mesh_data,
+                                vertex_array=vertex_array[first_vertex:first_vertex + num_vertices])
+
+        # Cached indices are read-only, so the offset is written directly into the output
+        np.add(mesh_data[constants.KEY_PRIMITIVE_INDICES].reshape(-1), first_vertex,
+               out=indices[first_index:first_index + num_indices], casting="unsafe")
+
+        first_vertex += num_vertices
+        first_index += num_indices
+
+    composite_mesh_data = {
+        constants.KEY_PRIMITIVE_INDICES: indices,
+        constants.KEY_PRIMITIVE_INTERLEAVED: vertex_array
     }
+    for attribute in vertex_array.dtype.names:
+        composite_mesh_data[constants.VERTEX_ATTRIBUTE_KEYS[attribute]] = vertex_array[attribute]
+    return composite_mesh_data
 
 
-def create_mesh(shape: str, params: dict) -> dict:
+def get_vertex_dtype(data_format: str, attributes: list) -> np.dtype:
 
-    vertices = None
-    normals = None
-    indices = None
+    """
+    Creates the numpy structured type matching a moderngl vertex layout made of floats, e.g. '3f 3f 3f'. Each
+    field is named after its vertex shader input, so an array of this type has exactly the same bytes as the
+    VBO it describes.
+    """
 
-    if shape == constants.KEY_SHAPE_CYLINDER:
+    components = data_format.split()
+    if len(components) != len(attributes):
+        raise ValueError(f"[ERROR] Vertex format '{data_format}' does not match attributes {attributes}")
+
+    fields = []
+    for component, attribute in zip(components, attributes):
+        size, _, component_type = component.partition("f")
+        if not size.isdigit() or component_type not in ("", "4"):
+            raise ValueError(f"[ERROR] Vertex format component '{component}' is not supported")
+        fields.append((attribute, np.float32, (int(size),)))
+
+    return np.dtype(fields)
+
+
+def create_vertex_array(num_vertices: int, data_format: str, attributes: list) -> np.ndarray:
+
+    """
+    Preallocates an interleaved vertex array. Writing to one of its fields (e.g. vertex_array['in_position'])
+    writes directly to the final layout, and the array can be given to ctx.buffer() as it is.
+
+    :return: numpy structured ndarray (num_vertices,), see get_vertex_dtype()
+    """
+
+    return np.empty(num_vertices, dtype=get_vertex_dtype(data_format=data_format, attributes=attributes))
+
+
+def write_vertex_attributes(mesh_data: dict, vertex_array: np.ndarray):
+
+    """
+    Copies each vertex attribute of a mesh into its field of an interleaved vertex array
+    (see constants.VERTEX_ATTRIBUTE_KEYS). Broadcast arrays, like uniform colors, are written without being
+    expanded first.
+    """
+
+    for attribute in vertex_array.dtype.names:
+        key = constants.VERTEX_ATTRIBUTE_KEYS.get(attribute, None)
+        if key is None or mesh_data.get(key, None) is None:
+            raise KeyError(f"[ERROR] Mesh data has nothing for vertex attribute '{attribute}'")
+        vertex_array[attribute] = mesh_data[key]
+
+
+def interleave_mesh_data(mesh_data: dict, data_format: str, attributes: list) -> np.ndarray:
+
+    """
+    Returns the interleaved vertex array of a mesh, ready to be uploaded. Meshes built directly in the right
+    layout are returned as they are, anything else is copied once into a new array.
+    """
+
+    dtype = get_vertex_dtype(data_format=data_format, attributes=attributes)
+
+    vertex_array = mesh_data.get(constants.KEY_PRIMITIVE_INTERLEAVED, None)
+    if vertex_array is not None and vertex_array.dtype == dtype and vertex_array.flags.c_contiguous:
+        return vertex_array
+
+    vertex_array = np.empty(mesh_data[constants.KEY_PRIMITIVE_VERTICES].shape[0], dtype=dtype)
+    write_vertex_attributes(mesh_data=mesh_data, vertex_array=vertex_array)
+    return vertex_array
+
+
+class PrimitiveCache:
+
+    """
+    Memoizes the geometry of primitive shapes, so identical meshes (e.g. the joints and bones of every finger)
+    are only generated once. Entries are keyed by the shape and its normalized parameters (see
+    get_primitive_key()), kept in memory up to 'max_entries' (least recently used entries are dropped first) and,
+    if 'cache_dir' is given, persisted to disk so later runs do not generate them again either.
+
+    Cached arrays are read-only and returned as they are, without copies. Anyone who needs to modify them
+    (e.g. to apply a transform) must copy them first.
+    """
 
-        point_a = params.get(constants.KEY_POINT_A, (0, 0, 0))
-        point_b = params.get(constants.KEY_POINT_B, (0, 0, constants.DEFAULT_HEIGHT))
-        radius = params.get(constants.KEY_RADIUS, constants.DEFAULT_RADIUS)
-        sections = params.get(constants.KEY_SECTIONS, constants.DEFAULT_CYLINDER_SECTIONS)
-
-        #vertices, normals, indices = generate_cylinder_mesh(point_a, point_b, radius, sections)
-        primitive = trimesh.creation.cylinder(segment=(point_a, point_b),
-                                              radius=radius,
-                                              sections=sections)
-        vertices = np.array(primitive.vertices).astype('f4')
-        normals = np.array(primitive.vertex_normals).astype('f4')
-        indices = np.array(primitive.faces).astype('i4')
-
-    elif shape == constants.KEY_SHAPE_BOX:
-        width = params.get(constants.KEY_WIDTH, 1.0)
-        height = params.get(constants.KEY_HEIGHT, 1.0)
-        depth = params.get(constants.KEY_DEPTH, 1.0)
-        vertices, normals, indices = generate_box_mesh(width=width, height=height, depth=depth)
-
-    elif shape == constants.KEY_SHAPE_CONE:
-        radius = params.get(constants.KEY_RADIUS, 0.5)
-        height = params.get(constants.KEY_HEIGHT, 0.5)
-        segments = params.get(constants.KEY_SECTIONS, 32)
-        primitive = trimesh.creation.cone(radius=radius, height=height, sections=segments)
-        vertices = np.array(primitive.vertices).astype('f4')
-        normals = np.array(primitive.vertex_normals).astype('f4')
-        indices = np.array(primitive.faces).astype('i4')
-
-    elif shape == constants.KEY_SHAPE_ICOSPHERE:
-        radius = params.get(constants.KEY_RADIUS, constants.DEFAULT_RADIUS)
-        subdivisions = params.get(constants.KEY_SUBDIVISIONS, constants.DEFAULT_SUBDIVISIONS)
-        primitive = trimesh.creation.icosphere(radius=radius, subdivisions=subdivisions)
-        vertices = np.array(primitive.vertices).astype('f4')
-        normals = np.array(primitive.vertex_normals).astype('f4')
-        indices = np.array(primitive.faces).astype('i4')
-
-    elif shape == constants.KEY_SHAPE_CAPSULE:
-        radius = params.get(constants.KEY_RADIUS, 0.25)
-        height = params.get(constants.KEY_HEIGHT, 1.0)
-        segments = params.get(constants.KEY_SEGMENTS, 16)
-        primitive = trimesh.creation.capsule(height=height, radius=radius, count=segments)
-        vertices = np.array(primitive.vertices).astype('f4')
-        normals = np.array(primitive.vertex_normals).astype('f4')
-        indices = np.array(primitive.faces).astype('i4')
-
-    else:
+    def __init__(self, max_entries=constants.MESH_CACHE_MAX_ENTRIES, cache_dir=None):
+
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def get(self, shape: str, params: dict) -> tuple:
+
+        """
+        :param shape: One of the constants.KEY_SHAPE_* values
+        :param params: Shape parameters. Missing ones take their default value
+        :return: tuple (vertices, normals, indices) of read-only numpy ndarrays, (N, 3) <float32>, (N, 3) <float32>
+                 and (M, 3) or (M,) <int32>
+        """
+
+        key = get_primitive_key(shape=shape, params=params)
+
+        entry = self.entries.get(key, None)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.num_hits += 1
+            return entry
+
+        self.num_misses += 1
+
+        entry = self.load_entry(key=key)
+        if entry is None:
+            entry = generate_primitive(shape=shape, **dict(key[1]))
+            for array in entry:
+                array.setflags(write=False)
+            self.save_entry(key=key, entry=entry)
+
+        self.entries[key] = entry
+        while len(self.entries) > max(self.max_entries, 0):
+            self.entries.popitem(last=False)
+
+        return entry
+
+    def clear(self):
+        self.entries.clear()
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def get_entry_fpath(self, key: tuple) -> str:
+        salt = f"{constants.MESH_CACHE_VERSION}_{key}"
+        return os.path.join(self.cache_dir, f"{hashlib.sha1(salt.encode()).hexdigest()}.npz")
+
+    def load_entry(self, key: tuple):
+
+        if self.cache_dir is None:
+            return None
+
+        try:
+            with np.load(self.get_entry_fpath(key=key), allow_pickle=False) as data:
+                entry = (data["vertices"], data["normals"], data["indices"])
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None  # Missing or corrupted, it will be generated (and saved) again
+
+        for array in entry:
+            array.setflags(write=False)
+        return entry
+
+    def save_entry(self, key: tuple, entry: tuple):
+
+        if self.cache_dir is None:
+            return
+
+        # Write to a temporary file first, so other processes never read a partial file
+        entry_fpath = self.get_entry_fpath(key=key)
+        temp_fpath = f"{entry_fpath}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_fpath, "wb") as file:
+                np.savez(file, vertices=entry[0], normals=entry[1], indices=entry[2])
+            os.replace(temp_fpath, entry_fpath)
+        except OSError:
+            pass  # The disk cache is only an optimisation, e.g. the directory may be read-only
+
+
+# Parameters (and their defaults) that define the geometry of each primitive. Anything else, like the color or
+# the transform, is applied after the geometry is retrieved from the cache
+PRIMITIVE_PARAMETERS = {
+    constants.KEY_SHAPE_CYLINDER: {
+        constants.KEY_POINT_A: (0, 0, 0),
+        constants.KEY_POINT_B: (0, 0, constants.DEFAULT_HEIGHT),
+        constants.KEY_RADIUS: constants.DEFAULT_RADIUS,
+        constants.KEY_SECTIONS: constants.DEFAULT_CYLINDER_SECTIONS},
+    constants.KEY_SHAPE_BOX: {
+        constants.KEY_WIDTH: 1.0,
+        constants.KEY_HEIGHT: 1.0,
+        constants.KEY_DEPTH: 1.0},
+    constants.KEY_SHAPE_CONE: {
+        constants.KEY_RADIUS: 0.5,
+        constants.KEY_HEIGHT: 0.5,
+        constants.KEY_SECTIONS: 32},
+    constants.KEY_SHAPE_ICOSPHERE: {
+        constants.KEY_RADIUS: constants.DEFAULT_RADIUS,
+        constants.KEY_SUBDIVISIONS: constants.DEFAULT_SUBDIVISIONS},
+    constants.KEY_SHAPE_CAPSULE: {
+        constants.KEY_RADIUS: 0.25,
+        constants.KEY_HEIGHT: 1.0,
+        constants.KEY_SEGMENTS: 16},
+}
+
+
+def get_primitive_key(shape: str, params: dict) -> tuple:
+
+    """
+    Creates a hashable key from the parameters that define the geometry of a primitive. Missing parameters are
+    replaced by their defaults and values are converted to plain python types, so that, for example, a
+    glm.vec3, a numpy array and a tuple with the same values all produce the same key.
+
+    :return: tuple (shape, ((param_name, value), ...))
+    """
+
+    defaults = PRIMITIVE_PARAMETERS.get(shape, None)
+    if defaults is None:
         raise Exception(f"[ERROR] Shape '{shape}' not supported")
 
-    color = params.get(constants.KEY_COLOR, constants.DEFAULT_COLOR)
-    transform = params.get("transform", np.eye(4, dtype=np.float32))
+    normalized_params = []
+    for name, default_value in defaults.items():
+        value = np.asarray(params.get(name, default_value))
+        value = tuple(value.reshape(-1).tolist()) if value.ndim > 0 else value.item()
+        normalized_params.append((name, value))
+
+    return shape, tuple(normalized_params)
+
+
+def generate_primitive(shape: str, **params) -> tuple:
+
+    """
+    Generates the geometry of a primitive. All parameters must be given (see PRIMITIVE_PARAMETERS)
+
+    :return: tuple (vertices, normals, indices)
+    """
+
+    if shape == constants.KEY_SHAPE_CYLINDER:
+        return generate_cylinder_mesh(point_a=params[constants.KEY_POINT_A],
+                                      point_b=params[constants.KEY_POINT_B],
+                                      radius=params[constants.KEY_RADIUS],
+                                      num_sections=params[constants.KEY_SECTIONS])
+
+    if shape == constants.KEY_SHAPE_BOX:
+        return generate_box_mesh(width=params[constants.KEY_WIDTH],
+                                 height=params[constants.KEY_HEIGHT],
+                                 depth=params[constants.KEY_DEPTH])
+
+    if shape == constants.KEY_SHAPE_CONE:
+        return generate_cone_mesh(radius=params[constants.KEY_RADIUS],
+                                  height=params[constants.KEY_HEIGHT],
+                                  num_sections=params[constants.KEY_SECTIONS])
+
+    if shape == constants.KEY_SHAPE_ICOSPHERE:
+        return generate_icosphere_mesh(radius=params[constants.KEY_RADIUS],
+                                       subdivisions=params[constants.KEY_SUBDIVISIONS])
+
+    if shape == constants.KEY_SHAPE_CAPSULE:
+        return generate_capsule_mesh(radius=params[constants.KEY_RADIUS],
+                                     height=params[constants.KEY_HEIGHT],
+                                     segments=params[constants.KEY_SEGMENTS])
+
+    raise Exception(f"[ERROR] Shape '{shape}' not supported")
+
+
+# Shared by all meshes created with create_mesh()
+primitive_cache = PrimitiveCache(max_entries=constants.MESH_CACHE_MAX_ENTRIES, cache_dir=constants.MESH_CACHE_DIR)
+
+
+def create_mesh(shape: str, params: dict) -> dict:
+
+    """
+    Geometry comes from the primitive cache. Vertices and normals are only copied if a transform needs to be
+    applied, otherwise the returned arrays are the read-only ones owned by the cache.
+    """
+
+    vertices, normals, indices = primitive_cache.get(shape=shape, params=params)
 
     # Apply transform to both vertices and normals
-    mat4.mul_vectors3(transform, vertices, vertices)
-    mat4.mul_vectors3_rotation_only(transform, normals, normals)
+    transform = params.get(constants.KEY_TRANSFORM, None)
+    if transform is not None:
+        vertices = vertices.copy()
+        normals = normals.copy()
+        mat4.mul_vectors3(transform, vertices, vertices)
+        mat4.mul_vectors3_rotation_only(transform, normals, normals)
 
     # All vertices receive the same color
-    colors = np.tile(np.array(color, dtype=np.float32), (vertices.shape[0], 1))
+    color = params.get(constants.KEY_COLOR, constants.DEFAULT_COLOR)
+    colors = np.broadcast_to(np.array(color, dtype=np.float32), (vertices.shape[0], 3))
 
     return {
         constants.KEY_PRIMITIVE_VERTICES: vertices,
@@ -119,6 +342,7 @@ def create_mesh(shape: str, params: dict) -> dict:
         constants.KEY_PRIMITIVE_INDICES: indices
     }
 
+
 def generate_box_mesh(width: float, height: float, depth: float):
     vertices = np.array([
         # Back face
@@ -166,87 +390,261 @@ def generate_box_mesh(width: float, height: float, depth: float):
     ], dtype='f4')
 
     # Indices for each triangle, since vertices are now unique per triangle, we just go sequentially
-    indices = np.array([
-        i for i in range(36)
-    ], dtype='i4')
+    indices = np.arange(36, dtype='i4')
 
     return vertices, normals, indices
 
 
 def generate_cylinder_mesh(point_a, point_b, radius, num_sections):
-    # Calculate directional vector and length between points
-    dir_vector = np.array(point_b) - np.array(point_a)
-    length = np.linalg.norm(dir_vector)
-    cylinder_axis = dir_vector / length
-
-    # Create a rotation matrix that aligns the z-axis to the cylinder axis
-    z_axis = np.array([0, 0, 1])
-    axis = np.cross(z_axis, cylinder_axis)
-    axis_length = np.linalg.norm(axis)
-    if axis_length != 0:
-        axis /= axis_length
-        angle = np.arccos(np.dot(z_axis, cylinder_axis))
-        K = np.array([[0, -axis[2], axis[1]],
-                      [axis[2], 0, -axis[0]],
-                      [-axis[1], axis[0], 0]])
-        rotation_matrix = np.eye(3) + np.sin(angle) * K + (1 - np.cos(angle)) * np.dot(K, K)
-    else:
-        rotation_matrix = np.eye(3) if np.dot(z_axis, cylinder_axis) > 0 else np.eye(3) * np.array([1, 1, -1])
-
-    # Generate circle points
-    angle_step = 2 * np.pi / num_sections
-    circle_points = np.array([
-        [np.cos(i * angle_step) * radius, np.sin(i * angle_step) * radius, 0] for i in range(num_sections)
-    ])
-
-    # Rotate circle points and translate to create top and bottom vertices
-    bottom_vertices = np.dot(circle_points, rotation_matrix.T) + point_a
-    top_vertices = np.dot(circle_points, rotation_matrix.T) + point_b
-
-    # Side vertices: duplicate for separate normals
-    vertices = np.vstack((bottom_vertices, top_vertices, bottom_vertices, top_vertices))
-
-    # Normals
-    bottom_normals = np.tile([0, 0, -1], (num_sections, 1))
-    top_normals = np.tile([0, 0, 1], (num_sections, 1))
-    side_normals = np.vstack((
-        np.dot(circle_points[:, :3], rotation_matrix.T)[:, :3],
-        np.dot(circle_points[:, :3], rotation_matrix.T)[:, :3]
-    ))
-    normals = np.vstack((np.dot(bottom_normals, rotation_matrix.T),
-                         np.dot(top_normals, rotation_matrix.T),
-                         side_normals))
-
-    # Indices
-    indices = []
-    for i in range(num_sections):
-        next_i = (i + 1) % num_sections
-        # Sides - corrected to reference the duplicated vertices correctly
-        base_index_for_sides = 2 * num_sections  # Starting index for the side vertices
-
-        # Each side face is defined by two triangles, hence four indices are involved: i, next_i, i + num_sections, next_i + num_sections
-        # First triangle
-        indices.append([base_index_for_sides + i,
-                        base_index_for_sides + next_i,
-                        base_index_for_sides + num_sections + i])
-        # Second triangle
-        indices.append([base_index_for_sides + next_i,
-                        base_index_for_sides + num_sections + next_i,
-                        base_index_for_sides + num_sections + i])
-
-    center_bottom_index = len(vertices) - 2
-    center_top_index = len(vertices) - 1
-
-    # Top Lid
-    for i in range(num_sections):
-        next_i = (i + 1) % num_sections
-        indices.append([num_sections + i,
-                        num_sections + next_i,
-                        center_top_index])
-
-    # Bottom lid
-    for i in range(num_sections):
-        next_i = (i + 1) % num_sections
-        indices.append([next_i, i, center_bottom_index])
-
-    return np.array(vertices, dtype='f4'), np.array(normals, dtype='f4'), np.array(indices, dtype='i4')
+
+    """
+    Cylinder going from point_a to point_b, with smooth sides and flat lids. Side and lid vertices are
+    duplicated so that each one gets its own normal.
+
+    :return: tuple (vertices, normals, indices) as numpy ndarrays (N, 3) <float32>, (N, 3) <float32> and
+             (M, 3) <int32>
+    """
+
+    point_a = np.asarray(point_a, dtype=np.float32).reshape(3)
+    point_b = np.asarray(point_b, dtype=np.float32).reshape(3)
+    length = float(np.linalg.norm(point_b - point_a))
+    rotation = get_rotation_from_z_axis(direction=point_b - point_a)
+
+    ring, ring_normals = get_circle_points(num_sections=num_sections)
+    ring *= radius
+    bottom_ring = ring
+    top_ring = ring + np.array([0, 0, length], dtype=np.float32)
+    bottom_center = np.zeros((1, 3), dtype=np.float32)
+    top_center = np.array([[0, 0, length]], dtype=np.float32)
+
+    # Layout: side bottom ring, side top ring, bottom lid ring + center, top lid ring + center
+    vertices = np.concatenate([bottom_ring, top_ring, bottom_ring, bottom_center, top_ring, top_center], axis=0)
+    normals = np.empty_like(vertices)
+    normals[:2 * num_sections] = np.tile(ring_normals, (2, 1))
+    normals[2 * num_sections:3 * num_sections + 1] = (0, 0, -1)
+    normals[3 * num_sections + 1:] = (0, 0, 1)
+
+    current = np.arange(num_sections, dtype=np.int32)
+    following = np.roll(current, -1)
+    side_bottom = 0
+    side_top = num_sections
+    lid_bottom = 2 * num_sections
+    lid_top = 3 * num_sections + 1
+
+    indices = np.concatenate([
+        np.stack([side_bottom + current, side_bottom + following, side_top + following], axis=1),
+        np.stack([side_bottom + current, side_top + following, side_top + current], axis=1),
+        np.stack([np.full_like(current, lid_bottom + num_sections), lid_bottom + following, lid_bottom + current],
+                 axis=1),
+        np.stack([np.full_like(current, lid_top + num_sections), lid_top + current, lid_top + following], axis=1)
+    ], axis=0)
+
+    vertices = vertices @ rotation.T + point_a
+    normals = normals @ rotation.T
+
+    return vertices.astype(np.float32), normals.astype(np.float32), indices.astype(np.int32)
+
+
+def generate_cone_mesh(radius: float, height: float, num_sections: int):
+
+    """
+    Cone with its base centered at the origin and its apex at (0, 0, height). The apex is duplicated once per
+    section so that the sides are smooth.
+
+    :return: tuple (vertices, normals, indices), see generate_cylinder_mesh()
+    """
+
+    ring, ring_normals = get_circle_points(num_sections=num_sections)
+    base_ring = ring * radius
+
+    # Side normals are tilted up by the slope of the cone. Each apex copy uses the normal halfway between the
+    # two ring vertices of its triangle
+    slope_length = np.hypot(radius, height)
+    side_normals = np.empty_like(ring)
+    side_normals[:, :2] = ring_normals[:, :2] * (height / slope_length)
+    side_normals[:, 2] = radius / slope_length
+
+    half_angles = (np.arange(num_sections, dtype=np.float64) + 0.5) * (2.0 * np.pi / num_sections)
+    apex_normals = np.empty_like(ring)
+    apex_normals[:, 0] = np.cos(half_angles) * (height / slope_length)
+    apex_normals[:, 1] = np.sin(half_angles) * (height / slope_length)
+    apex_normals[:, 2] = radius / slope_length
+    apexes = np.tile(np.array([0, 0, height], dtype=np.float32), (num_sections, 1))
+
+    # Layout: side ring, apexes, base ring + center
+    vertices = np.concatenate([base_ring, apexes, base_ring, np.zeros((1, 3), dtype=np.float32)], axis=0)
+    normals = np.concatenate([side_normals, apex_normals, np.tile((0, 0, -1), (num_sections + 1, 1))], axis=0)
+
+    current = np.arange(num_sections, dtype=np.int32)
+    following = np.roll(current, -1)
+    base = 2 * num_sections
+
+    indices = np.concatenate([
+        np.stack([current, following, num_sections + current], axis=1),
+        np.stack([np.full_like(current, base + num_sections), base + following, base + current], axis=1)
+    ], axis=0)
+
+    return vertices.astype(np.float32), normals.astype(np.float32), indices.astype(np.int32)
+
+
+def generate_icosphere_mesh(radius: float, subdivisions: int):
+
+    """
+    Sphere made by subdividing an icosahedron. Every subdivision splits each triangle in 4, adding one vertex
+    per edge, and all edges of a level are processed at once.
+
+    :return: tuple (vertices, normals, indices), see generate_cylinder_mesh()
+    """
+
+    golden_ratio = (1.0 + np.sqrt(5.0)) / 2.0
+    vertices = np.array([
+        [-1, golden_ratio, 0], [1, golden_ratio, 0], [-1, -golden_ratio, 0], [1, -golden_ratio, 0],
+        [0, -1, golden_ratio], [0, 1, golden_ratio], [0, -1, -golden_ratio], [0, 1, -golden_ratio],
+        [golden_ratio, 0, -1], [golden_ratio, 0, 1], [-golden_ratio, 0, -1], [-golden_ratio, 0, 1]
+    ], dtype=np.float64)
+    vertices /= np.linalg.norm(vertices, axis=1, keepdims=True)
+
+    faces = np.array([
+        [0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+        [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+        [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+        [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1]
+    ], dtype=np.int64)
+
+    for _ in range(subdivisions):
+
+        # Each edge is shared by two faces, so they are sorted before removing duplicates
+        edges = faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+        edges.sort(axis=1)
+        unique_edges, edge_indices = np.unique(edges, axis=0, return_inverse=True)
+
+        midpoints = vertices[unique_edges[:, 0]] + vertices[unique_edges[:, 1]]
+        midpoints /= np.linalg.norm(midpoints, axis=1, keepdims=True)
+
+        midpoint_indices = (edge_indices.reshape(-1, 3) + vertices.shape[0])
+        vertices = np.concatenate([vertices, midpoints], axis=0)
+
+        a, b, c = faces[:, 0], faces[:, 1], faces[:, 2]
+        ab, bc, ca = midpoint_indices[:, 0], midpoint_indices[:, 1], midpoint_indices[:, 2]
+        faces = np.concatenate([
+            np.stack([a, ab, ca], axis=1),
+            np.stack([b, bc, ab], axis=1),
+            np.stack([c, ca, bc], axis=1),
+            np.stack([ab, bc, ca], axis=1)
+        ], axis=0)
+
+    return (vertices * radius).astype(np.float32), vertices.astype(np.float32), faces.astype(np.int32)
+
+
+def generate_capsule_mesh(radius: float, height: float, segments):
+
+    """
+    Capsule aligned with the Z axis and centered at the origin, where 'height' is the distance between the
+    centers of its two hemispheres. The surface is a single grid of latitude rings, so each vertex gets the
+    normal of the sphere it belongs to.
+
+    :param segments: int or (int, int). Number of latitude steps from pole to pole, and number of sections
+                     around the Z axis. A single int is used for both
+    :return: tuple (vertices, normals, indices), see generate_cylinder_mesh()
+    """
+
+    segments = np.asarray(segments).reshape(-1)
+    num_rings = max(int(segments[0]) // 2, 1)  # Per hemisphere
+    num_sections = max(int(segments[-1]), 3)
+
+    # The equator of each hemisphere is repeated, and the band between both is the cylindrical part
+    latitudes = np.concatenate([np.linspace(-np.pi / 2.0, 0.0, num_rings + 1),
+                                np.linspace(0.0, np.pi / 2.0, num_rings + 1)])
+    z_offsets = np.repeat([-height / 2.0, height / 2.0], num_rings + 1)
+
+    # One extra column repeats the first one, so the texture seam does not need special indices
+    longitudes = np.linspace(0.0, 2.0 * np.pi, num_sections + 1)
+    cos_latitudes = np.cos(latitudes)[:, np.newaxis]
+
+    normals = np.empty((latitudes.size, longitudes.size, 3), dtype=np.float64)
+    normals[:, :, 0] = cos_latitudes * np.cos(longitudes)
+    normals[:, :, 1] = cos_latitudes * np.sin(longitudes)
+    normals[:, :, 2] = np.sin(latitudes)[:, np.newaxis]
+
+    vertices = normals * radius
+    vertices[:, :, 2] += z_offsets[:, np.newaxis]
+
+    num_columns = longitudes.size
+    rows, columns = np.meshgrid(np.arange(latitudes.size - 1), np.arange(num_columns - 1), indexing="ij")
+    bottom_left = (rows * num_columns + columns).reshape(-1)
+    bottom_right = bottom_left + 1
+    top_left = bottom_left + num_columns
+    top_right = top_left + 1
+
+    indices = np.concatenate([
+        np.stack([bottom_left, bottom_right, top_right], axis=1),
+        np.stack([bottom_left, top_right, top_left], axis=1)
+    ], axis=0)
+
+    return (vertices.reshape(-1, 3).astype(np.float32),
+            normals.reshape(-1, 3).astype(np.float32),
+            indices.astype(np.int32))
+
+
+def get_circle_points(num_sections: int) -> tuple:
+
+    """
+    :return: tuple (points, normals), both numpy ndarrays (num_sections, 3) <float32>. Points are on the unit
+             circle on the XY plane, counter-clockwise starting from +X, and normals point outwards
+    """
+
+    angles = np.arange(num_sections, dtype=np.float64) * (2.0 * np.pi / num_sections)
+    points = np.zeros((num_sections, 3), dtype=np.float32)
+    points[:, 0] = np.cos(angles)
+    points[:, 1] = np.sin(angles)
+    return points, points.copy()
+
+
+def get_rotation_from_z_axis(direction: np.ndarray) -> np.ndarray:
+
+    """
+    :param direction: numpy ndarray (3,), doesn't need to be normalized
+    :return: numpy ndarray (3, 3) rotation matrix that aligns the Z axis with 'direction'
+    """
+
+    z_axis = np.array([0.0, 0.0, 1.0])
+    length = np.linalg.norm(direction)
+    if length == 0.0:
+        return np.eye(3)
+
+    direction = np.asarray(direction, dtype=np.float64) / length
+    axis = np.cross(z_axis, direction)
+    sin_angle = np.linalg.norm(axis)
+    cos_angle = np.dot(z_axis, direction)
+
+    if sin_angle < 1e-8:
+        # Parallel or opposite. Half a turn around X keeps the handedness, unlike a reflection
+        return np.eye(3) if cos_angle > 0 else np.diag([1.0, -1.0, -1.0])
+
+    axis /= sin_angle
+    k = np.array([[0, -axis[2], axis[1]],
+                  [axis[2], 0, -axis[0]],
+                  [-axis[1], axis[0], 0]])
+    return np.eye(3) + sin_angle * k + (1 - cos_angle) * (k @ k)
+
+
+def load_mesh_file(fpath: str, color=constants.DEFAULT_COLOR) -> dict:
+
+    """
+    Loads a mesh file in any of the formats supported by trimesh. Trimesh is only imported here, as it takes a
+    significant part of the startup time and primitives do not need it.
+
+    :return: dict with the same layout as create_mesh()
+    """
+
+    import trimesh
+
+    primitive = trimesh.load(fpath, force="mesh")
+    vertices = np.array(primitive.vertices, dtype=np.float32)
+
+    return {
+        constants.KEY_PRIMITIVE_VERTICES: vertices,
+        constants.KEY_PRIMITIVE_NORMALS: np.array(primitive.vertex_normals, dtype=np.float32),
+        constants.KEY_PRIMITIVE_COLORS: np.broadcast_to(np.array(color, dtype=np.float32), (vertices.shape[0], 3)),
+        constants.KEY_PRIMITIVE_INDICES: np.array(primitive.faces, dtype=np.int32)
+    }
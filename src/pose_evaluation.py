@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import numba
+
+from src import constants
+from src import mat4
+from src.skeleton import Skeleton
+
+DEFAULT_CHUNK_SIZE = 65536  # frames
+
+
+def evaluate_joint_positions(hand_animation: pd.DataFrame,
+                             hand_config: dict,
+                             chunk_size=DEFAULT_CHUNK_SIZE,
+                             num_workers=None,
+                             scale=constants.HAND_SCALE) -> tuple:
+
+    """
+    Computes the world-space position of every joint (including fingertips) for every frame of an animation,
+    without any window or OpenGL context. Frames are evaluated in parallel by a numba kernel, in chunks, so
+    memory usage does not depend on the length of the recording beyond the output array itself.
+
+    :param hand_animation: DataFrame as returned by utils_io.load_hand_animation_bulk()
+    :param hand_config: dict as returned by utils_io.load_hand_configuration()
+    :param chunk_size: Max number of frames whose rotations are expanded at once
+    :param num_workers: Number of threads used by numba. None uses all available cores
+    :param scale: Same scale used when rendering the hand
+    :return: tuple (positions, joint_names) where positions is a numpy ndarray (frames, joints, 3) <float32>
+             and joint_names is the list of joint names along the second axis
+    """
+
+    skeleton = Skeleton.from_hand_configuration(hand_config=hand_config, scale=scale)
+    joint_values = hand_animation[constants.ANIMATION_COLUMN_NAMES].values
+
+    positions = evaluate_joint_positions_from_values(joint_values=joint_values,
+                                                     skeleton=skeleton,
+                                                     chunk_size=chunk_size,
+                                                     num_workers=num_workers)
+    return positions, list(skeleton.joint_names)
+
+
+def evaluate_joint_positions_from_values(joint_values: np.ndarray,
+                                         skeleton: Skeleton,
+                                         chunk_size=DEFAULT_CHUNK_SIZE,
+                                         num_workers=None) -> np.ndarray:
+
+    """
+    Same as evaluate_joint_positions(), but working directly on a joint value matrix
+
+    :param joint_values: numpy ndarray (frames, 21) in degrees, ordered as constants.ANIMATION_COLUMN_NAMES
+    :param skeleton: Skeleton providing the rest pose and hierarchy
+    :return: numpy ndarray (frames, joints, 3) <float32>
+    """
+
+    num_frames = joint_values.shape[0]
+    positions = np.empty((num_frames, skeleton.num_joints, 3), dtype=np.float32)
+    joint_indices, axis_indices, column_indices = skeleton.get_animation_bindings()
+
+    previous_num_threads = numba.get_num_threads()
+    if num_workers is not None:
+        numba.set_num_threads(min(num_workers, numba.config.NUMBA_NUM_THREADS))
+
+    try:
+        for start in range(0, num_frames, max(chunk_size, 1)):
+            stop = min(start + chunk_size, num_frames)
+
+            rotations = np.broadcast_to(skeleton.rotations, (stop - start,) + skeleton.rotations.shape).copy()
+            rotations[:, joint_indices, axis_indices] = np.radians(joint_values[start:stop, column_indices])
+
+            mat4.compute_hierarchy_positions_euler_xyz_batch(skeleton.positions,
+                                                             rotations,
+                                                             skeleton.scales,
+                                                             skeleton.parent_indices,
+                                                             positions[start:stop])
+    finally:
+        numba.set_num_threads(previous_num_threads)
+
+    return positions
@@ -0,0 +1,24 @@
+class RenderStats:
+
+    """
+    Counts the OpenGL commands issued to draw the scene, reset at the start of every Scene.render() and recorded
+    per frame by the FrameProfiler. Only the commands that scale with the content of the scene are counted:
+
+        draw_calls      : VertexArray.render() calls
+        uniform_writes  : Uniforms written one by one (model matrices, material and checker parameters, ...)
+        buffer_writes   : Uniform blocks and per-instance data uploaded to buffers
+    """
+
+    def __init__(self):
+        self.draw_calls = 0
+        self.uniform_writes = 0
+        self.buffer_writes = 0
+
+    def reset(self):
+        self.draw_calls = 0
+        self.uniform_writes = 0
+        self.buffer_writes = 0
+
+
+# Shared by all render passes and renderables. Always import it as 'src.render_stats', so there is only one
+render_stats = RenderStats()
@@ -0,0 +1,91 @@
+"""
+Renders a hand animation without a window, e.g. to review recordings on servers without a display. The animation
+is stepped at a fixed frame rate and every frame is written as raw RGB pixels to a file, to stdout, or to ffmpeg
+when the output is a video file.
+
+Usage (from the repository root):
+    python src/render_video.py --backend egl --output review.mp4             # Needs ffmpeg on the PATH
+    python src/render_video.py --backend egl --output frames.rgb             # Raw RGB frames
+    python src/render_video.py --backend egl --output - | \
+        ffmpeg -f rawvideo -pix_fmt rgb24 -s 1280x720 -r 60 -i - review.mp4
+"""
+import argparse
+import math
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))  # Same imports as main.py
+
+from hand import Hand
+from engine import Engine
+
+import constants
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm")
+
+
+def open_output(output: str, frame_size: tuple, frame_rate: int):
+
+    """
+    :return: tuple (output_file, ffmpeg_process), where ffmpeg_process is None unless 'output' is a video file
+    """
+
+    if output == "-":
+        return sys.stdout.buffer, None
+
+    if os.path.splitext(output)[1].lower() not in VIDEO_EXTENSIONS:
+        return open(output, "wb"), None
+
+    ffmpeg_process = subprocess.Popen(["ffmpeg", "-y", "-loglevel", "error",
+                                       "-f", "rawvideo", "-pix_fmt", "rgb24",
+                                       "-s", f"{frame_size[0]}x{frame_size[1]}", "-r", str(frame_rate),
+                                       "-i", "-",
+                                       "-pix_fmt", "yuv420p", output],
+                                      stdin=subprocess.PIPE)
+    return ffmpeg_process.stdin, ffmpeg_process
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", type=str, required=True,
+                        help="Video file (encoded with ffmpeg), raw RGB file, or '-' for raw RGB on stdout")
+    parser.add_argument("--animation", type=str, default=os.path.join(constants.DATA_DIR, "animation_1.txt"))
+    parser.add_argument("--config", type=str, default=os.path.join(constants.CONFIG_DIR, "default_hand.yaml"))
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=int, default=constants.HEADLESS_DEFAULT_FPS)
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed, relative to the recording")
+    parser.add_argument("--num-frames", type=int, default=None, help="Defaults to the whole animation")
+    parser.add_argument("--backend", type=str, default=None, help="moderngl standalone backend, e.g. 'egl'")
+    args = parser.parse_args()
+
+    engine = Engine(window_size=(args.width, args.height), headless=True, headless_backend=args.backend)
+
+    hand = Hand(engine=engine,
+                hand_config_yaml_fpath=args.config,
+                hand_animation_txt_fpath=args.animation)
+    hand.time_dilation_factor = args.speed
+    hand.play_animation = True
+
+    num_frames = args.num_frames
+    if num_frames is None:
+        num_frames = math.ceil(hand.animation_duration / args.speed * args.fps) + 1
+
+    output_file, ffmpeg_process = open_output(output=args.output,
+                                              frame_size=(args.width, args.height),
+                                              frame_rate=args.fps)
+    try:
+        engine.run_headless(num_frames=num_frames, frame_rate=args.fps, output_file=output_file)
+    finally:
+        if output_file is not sys.stdout.buffer:
+            output_file.close()
+        if ffmpeg_process is not None and ffmpeg_process.wait() != 0:
+            raise RuntimeError(f"[ERROR] ffmpeg failed with exit code {ffmpeg_process.returncode}")
+
+
+if __name__ == "__main__":
+    main()
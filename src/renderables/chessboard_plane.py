@@ -2,23 +2,96 @@ from src import constants
 import numpy as np
 
 from src.renderables.renderable import Renderable
+from src.render_stats import render_stats
 from src import meshes_3d
 
 
 class ChessboardPlane(Renderable):
 
+    """
+    Square plane with a chessboard pattern. By default every square is its own quad, with its color stored in
+    the vertices. With "procedural": True, the plane is a single quad and the pattern is computed in the fragment
+    shader instead (see the checker_* uniforms of default_color.frag), so the vertex count does not depend on
+    the number of squares.
+
+    The plane receives shadows but does not cast them, unless "cast_shadows" is set, so it does not enlarge
+    the shadow map frustum.
+    """
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.casts_shadows = self.params.get("cast_shadows", False)
+
+        # Values of the checker uniforms never change, so they are computed once
+        self.procedural = self.params.get("procedural", False)
+        plane_size = self.params.get("plane_size", 10.0)
+        _, v1, v2 = ChessboardPlane.get_plane_axes(plane_axes=self.params.get("plane_axes", "xz"))
+        self.checker_values = (plane_size / self.params.get("num_squares", 10),
+                               plane_size,
+                               tuple(v1.tolist()),
+                               tuple(v2.tolist()),
+                               tuple(self.params.get("color_dark", (0.9, 0.9, 0.9))))
+        self.checker_uniforms = {}  # program_name: tuple of uniforms, in the same order as self.checker_values
 
     def get_vertex_data(self):
 
         color_light = self.params.get("color_light", (0.98, 0.98, 0.98))
         color_dark = self.params.get("color_dark", (0.9, 0.9, 0.9))
-        plane_axes = self.params.get("plane_axes", "xz")
         plane_size = self.params.get("plane_size", 10.0)
         num_squares = self.params.get("num_squares", 10)
+        normal, v1, v2 = ChessboardPlane.get_plane_axes(plane_axes=self.params.get("plane_axes", "xz"))
+
+        if self.params.get("procedural", False):
+            num_squares = 1
+
+        square_size = plane_size / num_squares
+
+        # Bottom left corner of every square, in the same order as the squares were traditionally built
+        # (i along v1, j along v2)
+        i, j = np.meshgrid(np.arange(num_squares, dtype=np.float32),
+                           np.arange(num_squares, dtype=np.float32),
+                           indexing="ij")
+        corners = ((i.reshape(-1, 1) * v1 + j.reshape(-1, 1) * v2) * square_size -
+                   (v1 + v2) * (plane_size / 2.0))
+
+        # Everything is written straight into the interleaved vertex array that will be uploaded
+        num_vertices = 4 * num_squares * num_squares
+        vertex_array = meshes_3d.create_vertex_array(num_vertices=num_vertices,
+                                                     data_format=self.format,
+                                                     attributes=self.attributes)
+        vertices = vertex_array["in_position"]
+        normals = vertex_array["in_normal"]
+        colors = vertex_array["in_color"]
+
+        # Four vertices per square: corner, corner + v2, corner + v1, corner + v1 + v2
+        corner_offsets = np.stack([np.zeros(3, dtype=np.float32), v2, v1, v1 + v2]) * square_size
+        np.add(corners[:, np.newaxis, :], corner_offsets[np.newaxis, :, :], out=vertices.reshape(-1, 4, 3))
+        normals[:] = normal
+
+        square_colors = np.array([color_light, color_dark], dtype=np.float32)
+        parity = (i.astype(np.int64) + j.astype(np.int64)).reshape(-1) % 2
+        colors.reshape(-1, 4, 3)[:] = square_colors[parity][:, np.newaxis, :]
+
+        # Two triangles per square
+        base_indices = np.arange(0, num_vertices, 4, dtype=np.uint32).reshape(-1, 1)
+        indices = (base_indices + np.array([0, 1, 2, 2, 1, 3], dtype=np.uint32)).reshape(-1)
+
+        return {
+            constants.KEY_PRIMITIVE_VERTICES: vertices,
+            constants.KEY_PRIMITIVE_NORMALS: normals,
+            constants.KEY_PRIMITIVE_COLORS: colors,
+            constants.KEY_PRIMITIVE_INDICES: indices,
+            constants.KEY_PRIMITIVE_INTERLEAVED: vertex_array
+        }
+
+    @staticmethod
+    def get_plane_axes(plane_axes: str) -> tuple:
+
+        """
+        :param plane_axes: "xz", "xy" or "yz"
+        :return: tuple (normal, v1, v2) of numpy ndarrays (3,) <float32>
+        """
 
-        # Axis vectors based on the chosen plane
         if plane_axes == "xz":
             normal = np.array([0, 1, 0], dtype=np.float32)
             v1 = np.array([1, 0, 0], dtype=np.float32)
@@ -32,53 +105,39 @@ class ChessboardPlane(Renderable):
             v1 = np.array([0, 1, 0], dtype=np.float32)
             v2 = np.array([0, 0, 1], dtype=np.float32)
 
-        square_size = plane_size / num_squares
+        return normal, v1, v2
 
-        vertices = []
-        normals = []
-        colors = []
-        indices = []
-
-        for i in range(num_squares):
-            for j in range(num_squares):
-                # Calculate the bottom left corner of the current square
-                corner = (i * v1 + j * v2) * square_size - np.array([plane_size / 2, 0, plane_size / 2]) * np.array(
-                    [v1, normal, v2]).sum(axis=0)
-                square_vertices = [
-                    corner,
-                    corner + v2 * square_size,
-                    corner + v1 * square_size,
-                    corner + v1 * square_size + v2 * square_size
-                ]
-
-                # Choose color based on the square's position
-                square_color = color_light if (i + j) % 2 == 0 else color_dark
-
-                # Add vertices and colors for two triangles per square
-                vertices.extend(square_vertices)
-                colors.extend([square_color] * 4)  # Same color for all vertices in the square
-                normals.extend([normal] * 4)
-
-                # Calculate indices (two triangles per square)
-                base_index = 4 * (i * num_squares + j)
-                indices.extend(
-                    [base_index, base_index + 1, base_index + 2, base_index + 2, base_index + 1, base_index + 3])
-
-        vertices = np.array(vertices, dtype=np.float32).reshape(-1, 3)
-        normals = np.array(normals, dtype=np.float32).reshape(-1, 3)
-        colors = np.array(colors, dtype=np.float32).reshape(-1, 3)
-        indices = np.array(indices, dtype=np.uint32)
+    def cache_uniforms(self):
 
-        return {
-            constants.KEY_PRIMITIVE_VERTICES: vertices,
-            constants.KEY_PRIMITIVE_NORMALS: normals,
-            constants.KEY_PRIMITIVE_COLORS: colors,
-            constants.KEY_PRIMITIVE_INDICES: indices
-        }
+        if not self.procedural:
+            return
+
+        # Programs without the checker uniforms (e.g. shadows) just draw the quad
+        for program_name, vao in self.vaos.items():
+            uniforms = tuple(vao.program.get(name, None) for name in ("checker_square_size",
+                                                                      "checker_plane_size",
+                                                                      "checker_axis_u",
+                                                                      "checker_axis_v",
+                                                                      "checker_color_dark"))
+            if all(uniform is not None for uniform in uniforms):
+                self.checker_uniforms[program_name] = uniforms
+
+    def render(self, program_name: str):
+
+        uniforms = self.checker_uniforms.get(program_name, None)
+        if uniforms is None:
+            super().render(program_name=program_name)
+            return
+
+        for uniform, value in zip(uniforms, self.checker_values):
+            uniform.value = value
+        super().render(program_name=program_name)
+
+        # The program is shared with all other renderables, which must not get the pattern
+        uniforms[0].value = 0.0
+        render_stats.uniform_writes += len(uniforms) + 1
 
     def get_format_and_attributes(self) -> tuple:
         data_format = "3f 3f 3f"
         attributes = ['in_position', 'in_normal', 'in_color']
         return data_format, attributes
-
-
@@ -15,9 +15,19 @@ class FingerJoint(Renderable):
         bone_length = self.params.get("bone_length", 0.1)
         joint_type = self.params.get("joint_type", "xy")
 
+        shape_blueprints = [
+            FingerJoint.get_joint_blueprint(joint_type=joint_type, joint_radius=joint_radius, bone_radius=bone_radius),
+            FingerJoint.get_bone_blueprint(bone_radius=bone_radius, bone_length=bone_length)
+        ]
+
+        return meshes_3d.create_composite_mesh(shape_blueprint_list=shape_blueprints)
+
+    @staticmethod
+    def get_joint_blueprint(joint_type: str, joint_radius: float, bone_radius: float) -> dict:
+
         # Select joint type based on the number of axes
         if joint_type == "x":
-            joint_blueprint = {
+            return {
                 "shape": "cylinder",
                 "point_a": (-bone_radius * 1.25, 0, 0),
                 "point_b": (bone_radius * 1.25, 0, 0),
@@ -26,8 +36,8 @@ class FingerJoint(Renderable):
                 "color": (0.9, 0, 0)
             }
 
-        elif joint_type == "y":
-            joint_blueprint = {
+        if joint_type == "y":
+            return {
                 "shape": "cylinder",
                 "point_a": (0, -bone_radius * 1.1, 0),
                 "point_b": (0, bone_radius * 1.1, 0),
@@ -36,19 +46,19 @@ class FingerJoint(Renderable):
                 "color": (0, 0.9, 0)
             }
 
-        elif joint_type == "xy":
-            joint_blueprint = {
+        if joint_type == "xy":
+            return {
                 "shape": "icosphere",
                 "radius": joint_radius,
                 "subdivisions": 3,
                 "color": (0.3, 0.5, 0.9)
             }
 
-        else:
-            raise Exception(f"[ERROR] Joint type '{joint_type}' not suported")
+        raise Exception(f"[ERROR] Joint type '{joint_type}' not suported")
 
-        # Select bone type based on whether or not it is a the tip of the finger
-        bone_blueprint = {
+    @staticmethod
+    def get_bone_blueprint(bone_radius: float, bone_length: float) -> dict:
+        return {
             "shape": "cylinder",
             "point_a": (0, 0, 0),
             "point_b": (0, 0, bone_length),
@@ -56,13 +66,6 @@ class FingerJoint(Renderable):
             "color": (0.85, 0.85, 0.85)
         }
 
-        shape_blueprints = [
-            joint_blueprint,
-            bone_blueprint
-        ]
-
-        return meshes_3d.create_composite_mesh(shape_blueprint_list=shape_blueprints)
-
     def get_format_and_attributes(self) -> tuple:
         data_format = "3f 3f 3f"
         attributes = ['in_position', 'in_normal', 'in_color']
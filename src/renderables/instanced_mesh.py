@@ -0,0 +1,116 @@
+from src.renderables.renderable import Renderable
+from src import mat4
+from src import meshes_3d
+from src.render_stats import render_stats
+import numpy as np
+
+
+class InstancedMesh(Renderable):
+
+    """
+    Mesh drawn many times with a single draw call. The geometry is created once (from a list of shape
+    blueprints, like FingerJoint) and every instance only contributes its model matrix, stored column-major
+    in self.instance_matrices and uploaded as a per-instance vertex attribute (in_instance_model).
+
+    Several owners (e.g. hands) can share the same InstancedMesh: each one reserves a range of instances with
+    add_instances() and writes its matrices there every frame with write_instances().
+
+    Normal matrices are computed for all instances at once when they are uploaded, and passed as a second
+    per-instance attribute (in_instance_normal), so the vertex shader does not invert any matrix.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self.instanced = True
+        capacity = self.params.get("max_instances", 64)
+        self.instance_matrices = np.tile(np.eye(4, dtype=np.float32), (capacity, 1, 1))
+        self.instance_normal_matrices = np.tile(np.eye(3, dtype=np.float32), (capacity, 1, 1))
+        self.instance_vbo = self.ctx.buffer(reserve=self.instance_matrices.nbytes, dynamic=True)
+        self.instance_normal_vbo = self.ctx.buffer(reserve=self.instance_normal_matrices.nbytes, dynamic=True)
+        self.num_instances = 0
+        self.instances_dirty = False
+
+    def get_vertex_data(self):
+
+        if "shape_blueprints" not in self.params:
+            raise Exception("[ERROR] Cannot create instanced mesh: 'shape_blueprints' not specified")
+
+        return meshes_3d.create_composite_mesh(shape_blueprint_list=self.params["shape_blueprints"])
+
+    def get_format_and_attributes(self) -> tuple:
+        data_format = "3f 3f 3f"
+        attributes = ['in_position', 'in_normal', 'in_color']
+        return data_format, attributes
+
+    def get_vao_content(self) -> list:
+        return super().get_vao_content() + [(self.instance_vbo, "16f/i", "in_instance_model"),
+                                            (self.instance_normal_vbo, "9f/i", "in_instance_normal")]
+
+    def add_instances(self, num_instances: int) -> int:
+
+        """
+        Reserves a contiguous range of instances, growing the buffers if necessary
+        :return: int, index of the first reserved instance
+        """
+
+        first_instance = self.num_instances
+        self.num_instances += num_instances
+
+        capacity = self.instance_matrices.shape[0]
+        if self.num_instances > capacity:
+            new_capacity = max(self.num_instances, capacity * 2)
+            new_matrices = np.tile(np.eye(4, dtype=np.float32), (new_capacity, 1, 1))
+            new_matrices[:capacity] = self.instance_matrices
+            self.instance_matrices = new_matrices
+            self.instance_normal_matrices = np.tile(np.eye(3, dtype=np.float32), (new_capacity, 1, 1))
+
+            # Orphaning keeps the same OpenGL buffer object, so all VAOs stay valid
+            self.instance_vbo.orphan(self.instance_matrices.nbytes)
+            self.instance_normal_vbo.orphan(self.instance_normal_matrices.nbytes)
+
+        self.instances_dirty = True
+        return first_instance
+
+    def write_instances(self, first_instance: int, matrices_gl: np.ndarray):
+
+        """
+        :param first_instance: Index returned by add_instances()
+        :param matrices_gl: numpy ndarray (K, 4, 4) <float32> model matrices, column-major (OpenGL layout)
+        """
+
+        self.instance_matrices[first_instance:first_instance + matrices_gl.shape[0]] = matrices_gl
+        self.instances_dirty = True
+
+    def upload_instances(self):
+        if not self.instances_dirty:
+            return
+        # Column-major in, column-major out (see mat4.compute_normal_matrices())
+        mat4.compute_normal_matrices(self.instance_matrices[:self.num_instances],
+                                     self.instance_normal_matrices[:self.num_instances])
+        self.instance_vbo.write(self.instance_matrices[:self.num_instances])
+        self.instance_normal_vbo.write(self.instance_normal_matrices[:self.num_instances])
+        render_stats.buffer_writes += 2
+        self.instances_dirty = False
+
+    def get_world_bounds(self):
+
+        if self.local_bounds is None or self.num_instances == 0:
+            return None
+
+        # Instance matrices are stored column-major, so they are transposed back to row-major
+        matrices = self.instance_matrices[:self.num_instances].transpose(0, 2, 1)
+        instance_bounds = mat4.transform_bounds(matrices=matrices, bounds=self.local_bounds)
+        return np.stack([instance_bounds[:, 0, :].min(axis=0), instance_bounds[:, 1, :].max(axis=0)])
+
+    def render(self, program_name: str):
+        if self.num_instances == 0:
+            return
+        self.upload_instances()
+        self.vaos[program_name].render(self.render_mode, instances=self.num_instances)
+        render_stats.draw_calls += 1
+
+    def release(self):
+        super().release()
+        self.instance_vbo.release()
+        self.instance_normal_vbo.release()
@@ -0,0 +1,137 @@
+import os
+import numpy as np
+
+from src import constants
+from src import meshes_3d
+from src.renderables.renderable import Renderable
+from src.render_stats import render_stats
+from src.utilities import utils_io
+
+
+class ObjBinMesh(Renderable):
+
+    """
+    Mesh preprocessed into a '<name>.obj.bin' file of raw interleaved vertices, plus a '<name>.obj.json' header
+    describing each vertex buffer (material, vertex format, byte offset and length).
+
+    The .obj.bin file is memory-mapped and given to ctx.buffer() as it is, so vertices are never copied into
+    Python objects. All vertex buffers must share the same vertex format, and each one is drawn as a range of
+    the single VBO, with the diffuse texture of its material (from the .mtl files, through the TextureLibrary).
+
+    Params:
+        obj_fpath: Path of the original mesh, e.g. 'objects/cat/20430_Cat_v1_NEW.obj'
+    """
+
+    def __init__(self, **kwargs):
+
+        # The vertex layout comes from the header, and must be known before the base class creates the VBO
+        params = kwargs.get("params", None) or {}
+        if "obj_fpath" not in params:
+            raise Exception("[ERROR] Cannot create obj bin mesh: 'obj_fpath' not specified")
+
+        self.obj_fpath = params["obj_fpath"]
+        self.header = utils_io.load_obj_bin_header(obj_fpath=self.obj_fpath)
+
+        vertex_formats = {vertex_buffer["vertex_format"] for vertex_buffer in self.header["vertex_buffers"]}
+        if len(vertex_formats) != 1:
+            raise ValueError(f"[ERROR] Vertex buffers of '{self.obj_fpath}' must share the same vertex format, "
+                             f"found {sorted(vertex_formats)}")
+        self.data_format, self.data_attributes = utils_io.get_obj_bin_vertex_layout(vertex_format=vertex_formats.pop())
+
+        self.draw_ranges = []  # (first_vertex, num_vertices, material_name)
+        self.material_uniforms = {}  # program_name: (uniform material_diffuse, uniform use_texture)
+
+        super().__init__(**kwargs)
+
+        self.materials = self.load_materials()
+
+        # Used by draw ranges whose material is missing from the .mtl files
+        self.default_material = (self.texture_library.textures["white"] if self.texture_library is not None else None,
+                                 (1.0, 1.0, 1.0))
+
+    def get_vertex_data(self):
+
+        bin_fpath = utils_io.get_uncompressed_obj_bin_fpath(bin_fpath=f"{self.obj_fpath}.bin")
+        vertex_dtype = meshes_3d.get_vertex_dtype(data_format=self.data_format, attributes=self.data_attributes)
+        vertex_array = np.memmap(bin_fpath, dtype=vertex_dtype, mode="r")
+
+        for vertex_buffer in self.header["vertex_buffers"]:
+            byte_offset = vertex_buffer["byte_offset"]
+            byte_length = vertex_buffer["byte_length"]
+            if byte_offset % vertex_dtype.itemsize != 0 or byte_length % vertex_dtype.itemsize != 0:
+                raise ValueError(f"[ERROR] Vertex buffer of material '{vertex_buffer['material']}' is not aligned "
+                                 f"to whole vertices of {vertex_dtype.itemsize} bytes")
+            self.draw_ranges.append((byte_offset // vertex_dtype.itemsize,
+                                     byte_length // vertex_dtype.itemsize,
+                                     vertex_buffer["material"]))
+
+        return {
+            constants.KEY_PRIMITIVE_VERTICES: vertex_array["in_position"],
+            constants.KEY_PRIMITIVE_INDICES: None,
+            constants.KEY_PRIMITIVE_INTERLEAVED: vertex_array
+        }
+
+    def get_format_and_attributes(self) -> tuple:
+        return self.data_format, self.data_attributes
+
+    def load_materials(self) -> dict:
+
+        """
+        :return: dict {material_name: (texture, diffuse_color)}. Materials without a diffuse texture use a white
+                 one, so they can be drawn the same way
+        """
+
+        mtl_dir = os.path.dirname(os.path.abspath(self.obj_fpath))
+        materials = {}
+
+        for mtl_fname in self.header.get("mtllibs", []):
+            for material_name, material in utils_io.load_mtl(mtl_fpath=os.path.join(mtl_dir, mtl_fname)).items():
+
+                texture = None
+                if self.texture_library is not None:
+                    texture = self.texture_library.textures["white"]
+                    if material["map_Kd"] is not None:
+                        texture = self.texture_library.get_texture_from_file(path=material["map_Kd"])
+
+                materials[material_name] = (texture, material["Kd"])
+
+        return materials
+
+    def cache_uniforms(self):
+
+        # Programs without materials (e.g. shadows) just draw the vertex ranges
+        for program_name, vao in self.vaos.items():
+            uniform_texture = vao.program.get("texture_diffuse", None)
+            uniform_diffuse = vao.program.get("material_diffuse", None)
+            uniform_use_texture = vao.program.get("use_texture", None)
+            if uniform_texture is None or uniform_diffuse is None or uniform_use_texture is None:
+                continue
+
+            # Diffuse textures always use the same unit
+            uniform_texture.value = constants.DIFFUSE_TEXTURE_UNIT
+            self.material_uniforms[program_name] = (uniform_diffuse, uniform_use_texture)
+
+    def render(self, program_name: str):
+
+        vao = self.vaos[program_name]
+        uniforms = self.material_uniforms.get(program_name, None)
+
+        for (first_vertex, num_vertices, material_name) in self.draw_ranges:
+
+            # Every range sets its own state, so none is drawn with the material of the previous one
+            texture, diffuse_color = self.materials.get(material_name, self.default_material)
+            if uniforms is not None:
+                if texture is not None:
+                    texture.use(location=constants.DIFFUSE_TEXTURE_UNIT)
+                    uniforms[0].value = diffuse_color
+                    render_stats.uniform_writes += 1
+                uniforms[1].value = texture is not None
+                render_stats.uniform_writes += 1
+
+            vao.render(self.render_mode, vertices=num_vertices, first=first_vertex)
+            render_stats.draw_calls += 1
+
+        # The program is shared with all other renderables, which use their vertex colors
+        if uniforms is not None:
+            uniforms[1].value = False
+            render_stats.uniform_writes += 1
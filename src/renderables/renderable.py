@@ -2,35 +2,53 @@ import moderngl
 import glm
 import numpy as np
 
+from src import constants
+from src import mat4
+from src import meshes_3d
+from src.render_stats import render_stats
+
 
 class Renderable:
 
-    def __init__(self, ctx: moderngl.Context, params=None, children=None):
+    def __init__(self, ctx: moderngl.Context, params=None, children=None, texture_library=None):
 
         self.ctx = ctx
+        self.texture_library = texture_library
         self.children = children if children is not None else []
         self.params = params if params is not None else {}
 
-        mesh_data = self.get_vertex_data()
-        concatenated_data = np.hstack([mesh_data["vertices"],
-                                       mesh_data["normals"],
-                                       mesh_data["colors"]])
-        self.vbo = self.ctx.buffer(concatenated_data.astype("f4").tobytes())
-        self.ibo_indices = self.ctx.buffer(mesh_data["indices"].astype("i4").tobytes())
+        # Vertex data is uploaded straight from an interleaved array, through the buffer protocol
         self.format, self.attributes = self.get_format_and_attributes()
+        mesh_data = self.get_vertex_data()
+        vertex_array = meshes_3d.interleave_mesh_data(mesh_data=mesh_data,
+                                                      data_format=self.format,
+                                                      attributes=self.attributes)
+        self.vbo = self.ctx.buffer(vertex_array)
+
+        # Meshes without indices are drawn as plain triangle lists
+        self.ibo_indices = None
+        if mesh_data.get("indices", None) is not None:
+            self.ibo_indices = self.ctx.buffer(np.ascontiguousarray(mesh_data["indices"], dtype="i4"))
+
+        # Local axis-aligned bounding box (min, max), used to fit the shadow map to what casts shadows
+        self.local_bounds = Renderable.get_bounds(vertices=mesh_data.get(constants.KEY_PRIMITIVE_VERTICES, None))
 
         self.vaos = {}
         self.program = None
         self.render_mode = moderngl.TRIANGLES
+        self.instanced = False  # Instanced renderables provide their own model matrices per instance
+        self.casts_shadows = self.params.get("cast_shadows", True)
 
         # Transform parameters
         self.position = glm.vec3(self.params.get("position", (0, 0, 0)))
         self.rotation = glm.vec3(self.params.get("rotation", (0, 0, 0)))
         self.scale = glm.vec3(self.params.get("scale", (1, 1, 1)))
 
-        # Transforms
+        # Transforms. The normal matrix is computed on the CPU whenever the world matrix changes, instead of for
+        # every vertex in the shaders
         self.local_matrix = self.calculate_model_matrix()
         self.world_matrix = self.local_matrix
+        self.normal_matrix = self.calculate_normal_matrix()
 
     def update(self, parent=None):
 
@@ -46,6 +64,7 @@ class Renderable:
             self.world_matrix = parent.world_matrix * self.local_matrix
         else:
             self.world_matrix = self.local_matrix
+        self.normal_matrix = self.calculate_normal_matrix()
 
         for child in self.children:
             child.update(parent=self)
@@ -56,11 +75,69 @@ class Renderable:
     def get_format_and_attributes(self) -> tuple:
         pass
 
+    def get_vao_content(self) -> list:
+        # TODO: You can change this list to individual VBOs!
+        return [(self.vbo, self.format, *self.attributes)]
+
+    def cache_uniforms(self):
+
+        """
+        Called once the VAOs of all render passes exist. Renderables that write uniforms themselves look up their
+        handles here, once per program, instead of by name on every draw
+        """
+
+        pass
+
     def render(self, program_name: str):
         self.vaos[program_name].render(self.render_mode)
+        render_stats.draw_calls += 1
 
-    def render_shadow(self):
-        pass
+    def render_shadow(self, program_name: str):
+        self.render(program_name=program_name)
+
+    @staticmethod
+    def get_bounds(vertices):
+
+        """
+        :param vertices: numpy ndarray (N, 3) or None
+        :return: numpy ndarray (2, 3) <float32> with the minimum and maximum corners, or None if there are no vertices
+        """
+
+        if vertices is None or len(vertices) == 0:
+            return None
+        return np.stack([np.min(vertices, axis=0), np.max(vertices, axis=0)]).astype(np.float32)
+
+    def get_world_bounds(self):
+
+        """
+        :return: numpy ndarray (2, 3) <float32>, world-space axis-aligned bounding box, or None if empty
+        """
+
+        if self.local_bounds is None:
+            return None
+        return mat4.transform_bounds(matrices=self.get_world_matrix_array(), bounds=self.local_bounds)
+
+    def get_world_matrix_array(self) -> np.ndarray:
+
+        """
+        :return: numpy ndarray (4, 4) <float32>, row-major
+        """
+
+        # Renderables bound to a Skeleton use a view of its column-major matrices instead of a glm.mat4
+        if isinstance(self.world_matrix, np.ndarray):
+            return self.world_matrix.T
+        return np.array(self.world_matrix, dtype=np.float32)
+
+    def calculate_normal_matrix(self) -> np.ndarray:
+
+        """
+        :return: numpy ndarray (3, 3) <float32>, inverse transpose of the world matrix, column-major (OpenGL layout)
+        """
+
+        normal_matrix = np.empty((1, 3, 3), dtype=np.float32)
+        mat4.compute_normal_matrices(np.ascontiguousarray(self.get_world_matrix_array().T)[np.newaxis],
+                                     normal_matrix)
+        return normal_matrix[0]
 
     def calculate_model_matrix(self):
         m_model = glm.mat4()
@@ -76,5 +153,7 @@ class Renderable:
             vao.release()
         if self.vbo:
             self.vbo.release()
+        if self.ibo_indices:
+            self.ibo_indices.release()
 
 
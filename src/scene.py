@@ -1,22 +1,40 @@
 import moderngl
+import numpy as np
 
+from src import constants
 from texture_library import TextureLibrary
 from utilities import utils_io
 from src.directional_light import DirectionalLight
 from src.camera import Camera
+from src.frame_profiler import FrameProfiler
+from src.render_stats import render_stats
 
 
 class Scene:
 
-    def __init__(self, ctx: moderngl.Context, texture_library: TextureLibrary):
+    def __init__(self,
+                 ctx: moderngl.Context,
+                 texture_library: TextureLibrary,
+                 output_framebuffer=None,
+                 profiler=None):
+
+        """
+        :param ctx: moderngl Context
+        :param texture_library: TextureLibrary shared by all renderables and render passes
+        :param output_framebuffer: moderngl Framebuffer the render passes draw to. None draws to the screen
+        :param profiler: FrameProfiler timing every render pass on the CPU and the GPU. None disables the timing
+        """
 
         self.ctx = ctx
+        self.output_framebuffer = output_framebuffer
+        self.profiler = profiler if profiler is not None else FrameProfiler(ctx=ctx, enabled=False)
 
         self.registered_render_passes = {}
         self.registered_renderables = {}
 
         self.render_passes = []
         self.renderables = []
+        self.instanced_renderables = {}  # Shared by everything that draws the same geometry
 
         self.point_lights = []
         self.directional_light = None
@@ -25,6 +43,12 @@ class Scene:
         self.depth_texture = texture_library.textures["depth_texture"]
         self.depth_fbo = self.ctx.framebuffer(depth_attachment=self.depth_texture)
 
+        # Per-frame state shared by all programs (see update_uniform_buffers())
+        self.camera_block = np.zeros(constants.CAMERA_BLOCK_SIZE, dtype=np.float32)
+        self.light_block = np.zeros(constants.LIGHT_BLOCK_SIZE, dtype=np.float32)
+        self.camera_ubo = self.ctx.buffer(reserve=self.camera_block.nbytes, dynamic=True)
+        self.light_ubo = self.ctx.buffer(reserve=self.light_block.nbytes, dynamic=True)
+
     def register_render_pass(self, type_id: str, render_pass_class):
         if type_id in self.registered_render_passes:
             raise KeyError(f"[ERROR] RenderPass '{type_id}' already registered")
@@ -37,32 +61,113 @@ class Scene:
 
     def create_renderable(self, type_id: str, params=None):
         params = params if params is not None else {}
-        new_renderable = self.registered_renderables[type_id](ctx=self.ctx, params=params)
+        new_renderable = self.registered_renderables[type_id](ctx=self.ctx,
+                                                              params=params,
+                                                              texture_library=self.texture_library)
 
         # Each renderable gets a VAO per render pass. It's how it works with ModernGL
         for render_pass in self.render_passes:
             new_renderable.vaos[render_pass.program_name] = self.ctx.vertex_array(
                 render_pass.program,
-                # TODO: You can change this list to individual VBOs!
-                [(new_renderable.vbo, new_renderable.format, *new_renderable.attributes)],
+                new_renderable.get_vao_content(),
                 new_renderable.ibo_indices,
                 skip_errors=True)
+        new_renderable.cache_uniforms()
 
         self.renderables.append(new_renderable)
         return new_renderable
 
+    def get_instanced_renderable(self, key: str, type_id: str, params=None):
+
+        """
+        Returns the instanced renderable registered under 'key', creating it the first time
+        """
+
+        if key not in self.instanced_renderables:
+            self.instanced_renderables[key] = self.create_renderable(type_id=type_id, params=params)
+        return self.instanced_renderables[key]
+
     def create_render_pass(self, type_id: str, program_name: str):
         new_render_pass = self.registered_render_passes[type_id](
             ctx=self.ctx,
             program_name=program_name,
-            texture_library=self.texture_library)
+            texture_library=self.texture_library,
+            output_framebuffer=self.output_framebuffer)
         self.render_passes.append(new_render_pass)
         return new_render_pass
 
     def render(self, camera: Camera):
 
+        render_stats.reset()
+        with self.profiler.scope("scene/prepare"):
+            if self.directional_light is not None:
+                self.fit_shadow_frustum()
+            self.update_uniform_buffers(camera=camera)
+
         for render_pass in self.render_passes:
-            render_pass.render(
-                camera=camera,
-                renderables=self.renderables,
-                directional_light=self.directional_light)
+            with self.profiler.scope(f"{FrameProfiler.RENDER_PASS_PREFIX}{render_pass.program_name}", gpu=True):
+                render_pass.render(
+                    camera=camera,
+                    renderables=self.renderables,
+                    directional_light=self.directional_light)
+
+        self.profiler.count(name="draw_calls", value=render_stats.draw_calls)
+        self.profiler.count(name="uniform_writes", value=render_stats.uniform_writes)
+        self.profiler.count(name="buffer_writes", value=render_stats.buffer_writes)
+
+    def fit_shadow_frustum(self):
+
+        """
+        Fits the shadow map of the directional light to the bounds of all renderables that cast shadows (see
+        DirectionalLight.fit_shadow_frustum()). Without any, the previous frustum is kept
+        """
+
+        caster_bounds = []
+        receiver_bounds = []
+        for renderable in self.renderables:
+            bounds = renderable.get_world_bounds()
+            if bounds is None:
+                continue
+            receiver_bounds.append(bounds)
+            if renderable.casts_shadows:
+                caster_bounds.append(bounds)
+
+        if len(caster_bounds) == 0:
+            return
+
+        caster_bounds = np.stack(caster_bounds)
+        receiver_bounds = np.stack(receiver_bounds)
+        self.directional_light.fit_shadow_frustum(
+            caster_bounds=np.stack([caster_bounds[:, 0].min(axis=0), caster_bounds[:, 1].max(axis=0)]),
+            receiver_bounds=np.stack([receiver_bounds[:, 0].min(axis=0), receiver_bounds[:, 1].max(axis=0)]))
+
+    def update_uniform_buffers(self, camera: Camera):
+
+        """
+        Writes the camera and light state to their uniform buffers, once per frame, and binds them to the binding
+        points every program uses for CameraBlock and LightBlock (see RenderPass.load_program()). Offsets follow
+        the std140 layout of the blocks declared in the shaders
+        """
+
+        # glm matrices are stored column-major, as OpenGL expects them
+        m_view_proj = camera.projection_matrix * camera.view_matrix
+        self.camera_block[0:16] = np.frombuffer(camera.projection_matrix.to_bytes(), dtype=np.float32)
+        self.camera_block[16:32] = np.frombuffer(camera.view_matrix.to_bytes(), dtype=np.float32)
+        self.camera_block[32:48] = np.frombuffer(m_view_proj.to_bytes(), dtype=np.float32)
+        self.camera_block[48:51] = camera.position
+        self.camera_ubo.write(self.camera_block)
+        render_stats.buffer_writes += 1
+        self.camera_ubo.bind_to_uniform_block(constants.UNIFORM_BLOCK_BINDINGS["CameraBlock"])
+
+        light = self.directional_light
+        if light is not None:
+            self.light_block[0:3] = light.position
+            self.light_block[4:7] = light.Ia
+            self.light_block[8:11] = light.Id
+            self.light_block[12:15] = light.Is
+            self.light_block[16:32] = light.m_view_proj_light_gl.reshape(-1)
+            self.light_block[32:48] = light.m_shadow_gl.reshape(-1)
+            self.light_block[48:49].view(np.int32)[0] = light.shadow_pcf_taps
+            self.light_ubo.write(self.light_block)
+            render_stats.buffer_writes += 1
+        self.light_ubo.bind_to_uniform_block(constants.UNIFORM_BLOCK_BINDINGS["LightBlock"])
@@ -0,0 +1,167 @@
+import numpy as np
+
+from src import constants
+from src import mat4
+
+
+class Skeleton:
+
+    """
+    Array-backed joint hierarchy. All joints are stored in contiguous (N, ...) float32 arrays, sorted
+    topologically (parents before children), so local and world transforms of the whole hierarchy are computed
+    with one call to mat4.compute_hierarchy_transforms_euler_xyz() instead of walking Renderable objects.
+
+    Transforms follow the same convention as Renderable.calculate_model_matrix():
+        T(position) @ R(z) @ R(y) @ R(x) @ S(scale)
+
+    Renderables bound to a joint (see bind_renderables()) get their world_matrix and normal_matrix replaced by
+    views into self.world_matrices_gl and self.normal_matrices_gl, so they are always up-to-date after calling
+    update().
+    """
+
+    def __init__(self, parent_child_pairs: list, root_name="root"):
+
+        self.joint_names = [root_name]
+        self.joint_indices = {root_name: 0}
+        parent_indices = [-1]
+        for (parent_name, child_name) in parent_child_pairs:
+            if parent_name not in self.joint_indices:
+                raise ValueError(f"[ERROR] Parent joint '{parent_name}' must be declared before '{child_name}'")
+            parent_indices.append(self.joint_indices[parent_name])
+            self.joint_indices[child_name] = len(self.joint_names)
+            self.joint_names.append(child_name)
+
+        self.parent_indices = np.array(parent_indices, dtype=np.int32)
+        self.num_joints = len(self.joint_names)
+
+        # Pose
+        self.positions = np.zeros((self.num_joints, 3), dtype=np.float32)
+        self.rotations = np.zeros((self.num_joints, 3), dtype=np.float32)  # Euler XYZ in radians
+        self.scales = np.ones((self.num_joints, 3), dtype=np.float32)
+
+        # Transforms. World matrices are also kept transposed (column-major), ready to be uploaded to OpenGL
+        self.local_matrices = np.tile(np.eye(4, dtype=np.float32), (self.num_joints, 1, 1))
+        self.world_matrices = np.tile(np.eye(4, dtype=np.float32), (self.num_joints, 1, 1))
+        self.world_matrices_gl = np.tile(np.eye(4, dtype=np.float32), (self.num_joints, 1, 1))
+        self.normal_matrices_gl = np.tile(np.eye(3, dtype=np.float32), (self.num_joints, 1, 1))
+
+    @staticmethod
+    def from_hand_configuration(hand_config: dict, scale=constants.HAND_SCALE):
+
+        """
+        Creates the hand skeleton described by constants.RENDERABLES_PARENT_CHILD, with joint positions
+        (relative to their parents) taken from a hand configuration (see config/default_hand.yaml)
+        """
+
+        skeleton = Skeleton(parent_child_pairs=constants.RENDERABLES_PARENT_CHILD)
+        for joint_index, joint_name in enumerate(skeleton.joint_names[1:], start=1):
+            finger_name, finger_joint_name = joint_name.split("_")
+            skeleton.positions[joint_index, :] = np.array(hand_config[finger_name][finger_joint_name]["position"],
+                                                          dtype=np.float32) * scale
+        skeleton.update()
+        return skeleton
+
+    @staticmethod
+    def stack(skeletons: list, name_prefixes=None) -> tuple:
+
+        """
+        Merges several skeletons into a single one, so that all of them are updated with one call to update().
+        The root of every skeleton becomes a child of a new common root, and their joint names are prefixed to
+        keep them unique. The current pose of every skeleton is copied.
+
+        :param skeletons: list of Skeleton
+        :param name_prefixes: list of str, one per skeleton. Defaults to '0/', '1/', etc
+        :return: tuple (skeleton, first_indices) where first_indices is a numpy ndarray (len(skeletons),) <int32>
+                 with the index, in the new skeleton, of the root of each of the original ones
+        """
+
+        if name_prefixes is None:
+            name_prefixes = [f"{skeleton_index}/" for skeleton_index in range(len(skeletons))]
+
+        root_name = "root"
+        parent_child_pairs = []
+        first_indices = []
+        num_joints = 1
+        for skeleton, prefix in zip(skeletons, name_prefixes):
+            first_indices.append(num_joints)
+            for joint_name, parent_index in zip(skeleton.joint_names, skeleton.parent_indices):
+                parent_name = root_name if parent_index < 0 else prefix + skeleton.joint_names[parent_index]
+                parent_child_pairs.append((parent_name, prefix + joint_name))
+            num_joints += skeleton.num_joints
+
+        stacked_skeleton = Skeleton(parent_child_pairs=parent_child_pairs, root_name=root_name)
+        for skeleton, first_index in zip(skeletons, first_indices):
+            joints = slice(first_index, first_index + skeleton.num_joints)
+            stacked_skeleton.positions[joints, :] = skeleton.positions
+            stacked_skeleton.rotations[joints, :] = skeleton.rotations
+            stacked_skeleton.scales[joints, :] = skeleton.scales
+        stacked_skeleton.update()
+
+        return stacked_skeleton, np.array(first_indices, dtype=np.int32)
+
+    def get_animation_bindings(self, column_names=constants.ANIMATION_COLUMN_NAMES) -> tuple:
+
+        """
+        Matches every animation column (e.g. 'index_mcp_x') to the joint and rotation axis it drives, so that
+        a row of joint values can be scattered into the rotations with a single fancy-index assignment:
+            rotations[joint_indices, axis_indices] = np.radians(joint_values[column_indices])
+
+        :param column_names: list of column names, in the order of the joint values
+        :return: tuple (joint_indices, axis_indices, column_indices) as numpy ndarrays (K,) <int32>
+        """
+
+        joint_indices = []
+        axis_indices = []
+        column_indices = []
+
+        for joint_index, joint_name in enumerate(self.joint_names):
+
+            if joint_index == 0:
+                continue  # Root is never animated
+
+            for column_index, key in enumerate(column_names):
+                if not key.startswith(joint_name):
+                    continue
+                joint_indices.append(joint_index)
+                axis_indices.append("xyz".index(key[-1]))
+                column_indices.append(column_index)
+
+        return (np.array(joint_indices, dtype=np.int32),
+                np.array(axis_indices, dtype=np.int32),
+                np.array(column_indices, dtype=np.int32))
+
+    def bind_renderables(self, renderables: dict):
+
+        """
+        Copies the initial transform of each renderable into the skeleton and makes its world_matrix read
+        from the skeleton's buffer
+
+        :param renderables: dict {joint_name: Renderable}. Names not in the skeleton are ignored
+        """
+
+        for joint_name, renderable in renderables.items():
+            joint_index = self.joint_indices.get(joint_name, None)
+            if joint_index is None:
+                continue
+
+            self.positions[joint_index, :] = renderable.position
+            self.rotations[joint_index, :] = renderable.rotation
+            self.scales[joint_index, :] = renderable.scale
+
+        self.update()
+
+        for joint_name, renderable in renderables.items():
+            joint_index = self.joint_indices.get(joint_name, None)
+            if joint_index is not None:
+                renderable.world_matrix = self.world_matrices_gl[joint_index]
+                renderable.normal_matrix = self.normal_matrices_gl[joint_index]
+
+    def update(self):
+        mat4.compute_hierarchy_transforms_euler_xyz(self.positions,
+                                                    self.rotations,
+                                                    self.scales,
+                                                    self.parent_indices,
+                                                    self.local_matrices,
+                                                    self.world_matrices)
+        np.copyto(self.world_matrices_gl, self.world_matrices.transpose(0, 2, 1))
+        mat4.compute_normal_matrices(self.world_matrices_gl, self.normal_matrices_gl)
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+from src import constants
+
+# magic, version, source digest, width, height, components, number of faces, number of mipmap levels
+HEADER_STRUCT = struct.Struct("<4sI20sIIIII")
+
+
+class TextureCache:
+
+    """
+    Stores decoded textures on disk, so they can be loaded without decoding their source images again. Each
+    entry is a small binary file: a fixed header (see HEADER_STRUCT) followed by the raw pixels, already flipped
+    and converted as they are uploaded, level by level (mipmaps included) and face by face within each level.
+
+    Entries are memory-mapped when loaded. They are invalidated when any of their source files changes (path,
+    size or modification time), or when constants.TEXTURE_CACHE_VERSION is increased.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def get_entry_fpath(self, source_fpaths: list) -> str:
+        key = "|".join(os.path.normpath(os.path.abspath(fpath)) for fpath in source_fpaths)
+        return os.path.join(self.cache_dir, f"{hashlib.sha1(key.encode()).hexdigest()}.tex")
+
+    @staticmethod
+    def get_source_digest(source_fpaths: list) -> bytes:
+
+        """
+        :return: 20-byte digest that changes whenever any of the source files changes
+        """
+
+        digest = hashlib.sha1(f"{constants.TEXTURE_CACHE_VERSION}".encode())
+        for fpath in source_fpaths:
+            stat = os.stat(fpath)
+            digest.update(f"|{os.path.abspath(fpath)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        return digest.digest()
+
+    def load_entry(self, source_fpaths: list):
+
+        """
+        :param source_fpaths: Images the texture was decoded from
+        :return: tuple (size, components, levels) where levels is a list, from the largest mipmap to the smallest,
+                 of lists of numpy ndarrays <uint8> (one per face) mapped from the cache file. None if there is
+                 no valid entry
+        """
+
+        try:
+            source_digest = TextureCache.get_source_digest(source_fpaths=source_fpaths)
+            data = np.memmap(self.get_entry_fpath(source_fpaths=source_fpaths), dtype=np.uint8, mode="r")
+        except (OSError, ValueError):
+            return None  # Missing (or empty), it will be decoded (and saved) again
+
+        if data.size < HEADER_STRUCT.size:
+            return None
+        magic, version, digest, width, height, components, num_faces, num_levels = \
+            HEADER_STRUCT.unpack(data[:HEADER_STRUCT.size].tobytes())
+        if magic != constants.TEXTURE_CACHE_MAGIC or version != constants.TEXTURE_CACHE_VERSION or \
+                digest != source_digest:
+            return None
+
+        levels = []
+        offset = HEADER_STRUCT.size
+        for level in range(num_levels):
+            level_size = get_mipmap_size(size=(width, height), level=level)
+            num_bytes = level_size[0] * level_size[1] * components
+            if offset + num_bytes * num_faces > data.size:
+                return None  # Truncated
+            levels.append([data[offset + face * num_bytes: offset + (face + 1) * num_bytes]
+                           for face in range(num_faces)])
+            offset += num_bytes * num_faces
+
+        return (width, height), components, levels
+
+    def save_entry(self, source_fpaths: list, size: tuple, components: int, levels: list):
+
+        """
+        :param levels: Same as returned by load_entry(), with any bytes-like objects as faces
+        """
+
+        # Write to a temporary file first, so other processes never read a partial file
+        entry_fpath = self.get_entry_fpath(source_fpaths=source_fpaths)
+        temp_fpath = f"{entry_fpath}.{os.getpid()}.tmp"
+        try:
+            header = HEADER_STRUCT.pack(constants.TEXTURE_CACHE_MAGIC,
+                                        constants.TEXTURE_CACHE_VERSION,
+                                        TextureCache.get_source_digest(source_fpaths=source_fpaths),
+                                        size[0], size[1], components, len(levels[0]), len(levels))
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_fpath, "wb") as file:
+                file.write(header)
+                for faces in levels:
+                    for face in faces:
+                        file.write(face)
+            os.replace(temp_fpath, entry_fpath)
+        except OSError:
+            pass  # The disk cache is only an optimisation, e.g. the directory may be read-only
+
+
+def get_mipmap_size(size: tuple, level: int) -> tuple:
+    return max(size[0] >> level, 1), max(size[1] >> level, 1)
+
+
+def generate_mipmaps(pixels: np.ndarray) -> list:
+
+    """
+    Generates the full mipmap chain of an image, down to 1x1, with a 2x2 box filter (odd rows or columns are
+    dropped, so each level is exactly half the size of the previous one, rounded down, as OpenGL expects)
+
+    :param pixels: numpy ndarray (height, width, components) <uint8>
+    :return: list of numpy ndarrays (height, width, components) <uint8>, starting with 'pixels'
+    """
+
+    levels = [pixels]
+    while pixels.shape[0] > 1 or pixels.shape[1] > 1:
+
+        level = pixels.astype(np.uint16)
+        if level.shape[0] > 1:
+            num_rows = level.shape[0] // 2 * 2
+            level = level[0:num_rows:2] + level[1:num_rows:2]
+        else:
+            level = level * 2
+        if level.shape[1] > 1:
+            num_columns = level.shape[1] // 2 * 2
+            level = level[:, 0:num_columns:2] + level[:, 1:num_columns:2]
+        else:
+            level = level * 2
+
+        pixels = ((level + 2) // 4).astype(np.uint8)
+        levels.append(pixels)
+
+    return levels
@@ -1,29 +1,57 @@
 import moderngl
+import numpy as np
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import os
 
 import constants
+from src.lazy_texture import LazyTexture
+from src.texture_cache import TextureCache, generate_mipmaps
 
 
 class TextureLibrary:
 
-    def __init__(self, ctx: moderngl.Context, window_size: tuple):
+    """
+    Textures loaded from files are LazyTexture handles: nothing is read from disk until a texture is first used,
+    and images are then decoded by a thread pool, so creating the library does not depend on how many textures it
+    holds. Textures generated in memory (depth, solid colors) are created immediately.
+
+    Decoded pixels, with their mipmaps, are also cached on disk (see TextureCache), so later runs only need to
+    memory-map them.
+    """
+
+    def __init__(self, ctx: moderngl.Context, window_size: tuple, texture_cache_dir=constants.TEXTURE_CACHE_DIR):
+
+        """
+        :param ctx: moderngl Context
+        :param window_size: Size of the depth texture
+        :param texture_cache_dir: Directory where decoded textures are cached (see TextureCache). None disables it
+        """
 
         self.ctx = ctx
         self.window_size = window_size
+        self.texture_cache = TextureCache(cache_dir=texture_cache_dir) if texture_cache_dir is not None else None
+
+        self.executor = ThreadPoolExecutor(max_workers=constants.TEXTURE_LOADER_NUM_WORKERS,
+                                           thread_name_prefix="texture_loader")
+        self.placeholder_texture = self.generate_solid_texture(color=constants.TEXTURE_PLACEHOLDER_COLOR)
+        self.placeholder_texture_cube = self.generate_solid_texture_cube(color=constants.TEXTURE_PLACEHOLDER_COLOR)
 
-        self.textures = {
+        # Textures loaded from files are also registered under their path (see get_texture_from_file())
+        self.textures = {}
+        self.textures.update({
             0: self.load_texture(path=os.path.join(constants.TEXTURES_DIR, "img.png")),
             1: self.load_texture(path=os.path.join(constants.TEXTURES_DIR, "img_1.png")),
             2: self.load_texture(path=os.path.join(constants.TEXTURES_DIR, "img_2.png")),
-            "cat": self.load_texture(path=os.path.join(constants.ROOT_DIR,
-                                                       "objects",
-                                                       "cat",
-                                                       "20430_cat_diff_v1.jpg")),
+            "cat": self.get_texture_from_file(path=os.path.join(constants.OBJECTS_DIR,
+                                                                "cat",
+                                                                "20430_cat_diff_v1.jpg")),
             "skybox": self.get_texture_cube(dir_path=os.path.join(constants.TEXTURES_DIR, "skybox1"),
                                             ext='png'),
-            "depth_texture": self.generate_depth_texture()
-        }
+            "depth_texture": self.generate_depth_texture(),
+            "white": self.generate_solid_texture(color=(255, 255, 255))
+        })
 
     def generate_depth_texture(self):
         depth_texture = self.ctx.depth_texture(self.window_size)
@@ -31,13 +59,50 @@ class TextureLibrary:
         depth_texture.repeat_y = False
         return depth_texture
 
-    def get_texture_cube(self, dir_path, ext='png'):
+    def generate_solid_texture(self, color: tuple):
+        return self.ctx.texture(size=(1, 1), components=3, data=bytes(color))
+
+    def generate_solid_texture_cube(self, color: tuple):
+        return self.ctx.texture_cube(size=(1, 1), components=3, data=bytes(color) * 6)
+
+    def get_texture_from_file(self, path: str):
+
+        """
+        Returns the texture loaded from 'path', loading it the first time. Textures are registered under their
+        absolute path, so materials that share an image also share the texture.
+        """
+
+        key = os.path.normpath(os.path.abspath(path))
+        if key not in self.textures:
+            self.textures[key] = self.load_texture(path=key)
+        return self.textures[key]
+
+    def get_texture_cube(self, dir_path, ext='png') -> LazyTexture:
+        return LazyTexture(decode_function=partial(self.decode_texture_cube, dir_path=dir_path, ext=ext),
+                           upload_function=self.upload_texture_cube,
+                           placeholder=self.placeholder_texture_cube,
+                           executor=self.executor)
+
+    def decode_texture_cube(self, dir_path: str, ext: str) -> tuple:
+
+        """
+        Runs on the loader threads, so it must not use OpenGL
+
+        :return: tuple (size, faces) where faces is a list of 6 RGB bytes-like objects, in texture_cube face order
+        """
+
         faces = ['right', 'left', 'top', 'bottom'] + ['front', 'back'][::-1]
-        textures = []
+        face_fpaths = [os.path.join(dir_path, f"{face}.{ext}") for face in faces]
 
-        for face in faces:
+        if self.texture_cache is not None:
+            entry = self.texture_cache.load_entry(source_fpaths=face_fpaths)
+            if entry is not None:
+                return entry[0], entry[2][0]
+
+        textures = []
+        for face, face_fpath in zip(faces, face_fpaths):
             # Load the image using Pillow
-            texture = Image.open(os.path.join(dir_path, f"{face}.{ext}"))
+            texture = Image.open(face_fpath)
 
             # Apply the necessary flips
             if face in ['right', 'left', 'front', 'back']:
@@ -48,38 +113,96 @@ class TextureLibrary:
 
             textures.append(texture)
 
-        # Assuming all textures have the same size
-        width, height = textures[0].size
-        texture_cube = self.ctx.texture_cube(size=(width, height), components=3, data=None)
+        # Assuming all textures have the same size, converted to raw bytes in RGB format
+        size = textures[0].size
+        face_data = [texture.convert("RGB").tobytes() for texture in textures]
 
-        for i, texture in enumerate(textures):
-            # Convert the image to raw bytes in RGB format
-            texture_data = texture.convert("RGB").tobytes()
+        # The skybox does not use mipmaps, so only the first level is stored
+        if self.texture_cache is not None:
+            self.texture_cache.save_entry(source_fpaths=face_fpaths, size=size, components=3, levels=[face_data])
+
+        return size, face_data
+
+    def upload_texture_cube(self, pixels: tuple):
+
+        size, faces = pixels
+        texture_cube = self.ctx.texture_cube(size=size, components=3, data=None)
+
+        for i, texture_data in enumerate(faces):
             texture_cube.write(face=i, data=texture_data)
 
         return texture_cube
 
-    def load_texture(self, path):
+    def load_texture(self, path) -> LazyTexture:
+        return LazyTexture(decode_function=partial(self.decode_texture, path=path),
+                           upload_function=self.upload_texture,
+                           placeholder=self.placeholder_texture,
+                           executor=self.executor)
+
+    def decode_texture(self, path: str) -> tuple:
+
+        """
+        Runs on the loader threads, so it must not use OpenGL
+
+        :return: tuple (size, levels) where levels are the RGB bytes-like objects of every mipmap level, from
+                 the largest to the smallest, flipped vertically
+        """
+
+        if self.texture_cache is not None:
+            entry = self.texture_cache.load_entry(source_fpaths=[path])
+            if entry is not None:
+                return entry[0], [faces[0] for faces in entry[2]]
+
         # Load the image using Pillow
         texture_image = Image.open(path)
 
         # Flip the image vertically
         texture_image = texture_image.transpose(Image.FLIP_TOP_BOTTOM)
 
-        # Convert the Pillow image to raw bytes in RGB format
-        texture_data = texture_image.convert("RGB").tobytes()
+        # Convert the Pillow image to raw pixels in RGB format, and compute its mipmaps on the CPU, so that
+        # they can be cached along with it
+        pixels = np.asarray(texture_image.convert("RGB"))
+        levels = generate_mipmaps(pixels=pixels)
+
+        if self.texture_cache is not None:
+            self.texture_cache.save_entry(source_fpaths=[path],
+                                          size=texture_image.size,
+                                          components=3,
+                                          levels=[[level] for level in levels])
+
+        return texture_image.size, levels
+
+    def upload_texture(self, pixels: tuple):
 
-        # Assuming texture_image.size returns (width, height)
-        texture = self.ctx.texture(size=texture_image.size, components=3, data=texture_data)
+        # Size is (width, height), as returned by Pillow
+        size, levels = pixels
+        texture = self.ctx.texture(size=size, components=3, data=levels[0])
 
-        # mipmaps
+        # mipmaps. moderngl can only write levels that already exist, and build_mipmaps() is the only way it has
+        # to create them, so they are built first and then overwritten with the precomputed ones
         texture.filter = (moderngl.LINEAR_MIPMAP_LINEAR, moderngl.LINEAR)
-        texture.build_mipmaps()
+        texture.build_mipmaps(base=0, max_level=len(levels) - 1)
+        for level in range(1, len(levels)):
+            texture.write(data=levels[level], level=level)
 
         # Anisotropic Filtering (AF) - adjust the value as needed or make it configurable
         texture.anisotropy = 32.0
 
         return texture
 
+    def wait_for_requested_textures(self):
+
+        """
+        Blocks until every texture that has been requested (i.e. used while rendering) is on the GPU, so that
+        frames rendered afterwards never show placeholders. Textures that were never used are not loaded
+        """
+
+        for texture in set(self.textures.values()):
+            if isinstance(texture, LazyTexture) and texture.future is not None:
+                texture.wait()
+
     def destroy(self):
-        [tex.release() for tex in self.textures.values()]
\ No newline at end of file
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        [tex.release() for tex in set(self.textures.values())]
+        self.placeholder_texture.release()
+        self.placeholder_texture_cube.release()
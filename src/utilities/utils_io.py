@@ -2,10 +2,22 @@ import numpy as np
 import pandas as pd
 from datetime import datetime
 import yaml
+import hashlib
+import inspect
+import json
+import io
+import os
 import re
+import gzip
+import shutil
 
 from src import constants
 
+TERMINAL_DUMP_RECORD_SIZE = constants.TERMINAL_DATETIME_NUM_FIELDS + len(constants.JOINT_NAMES)
+TERMINAL_RE_PATTERN_BYTES = re.compile(constants.TERMINAL_RE_PATTERN.encode())
+ANIMATION_CACHE_HEADER_KEYS = ("version", "corrections_hash", "source_size", "source_mtime_ns", "source_sha1",
+                               "num_records", "columns")
+
 
 def load_hand_animation(txt_fpath: str, use_uniform_timestamps=True, ):
 
@@ -40,39 +52,601 @@ def load_hand_animation(txt_fpath: str, use_uniform_timestamps=True, ):
             joint_values_str = match.group(2).replace(",", "").replace("'", "").split(" ")
             hand_poses.append([float(value_str) for value_str in joint_values_str])
 
-        timestamps_array = np.array(timestamps, dtype=float).reshape(-1, 1)
+        timestamps_array = np.array(timestamps, dtype=float)
         timestamps_array -= timestamps_array[0]  # Time starts from zero
 
-        if use_uniform_timestamps:
-            # Replaces all timestamps with a linearly spaced version of them
-            duration = np.max(timestamps_array)
-            timestamps_array = np.linspace(start=0,
-                                           stop=duration,
-                                           num=timestamps_array.size,
-                                           endpoint=True).reshape(-1, 1)
+        return create_hand_animation_dataframe(timestamps=timestamps_array,
+                                               joint_values=np.array(hand_poses, dtype=float),
+                                               use_uniform_timestamps=use_uniform_timestamps)
+
+
+def load_hand_animation_bulk(txt_fpath: str, use_uniform_timestamps=True):
+
+    """
+    Faster version of load_hand_animation(). Instead of running a regex and building a datetime per line, the
+    whole file is read at once, all brackets, quotes and spaces are stripped and the resulting comma-separated
+    payload is converted to numbers by numpy in a single call. If the file does not follow the expected layout
+    (corrupted or partial lines), it falls back to the slower line-by-line parser.
+
+    :param txt_fpath: Terminal dump txt file
+    :param use_uniform_timestamps: Replaces the bursty timestamps with linearly spaced ones
+    :return: DataFrame identical to the one returned by load_hand_animation()
+    """
+
+    with open(txt_fpath, "rb") as file:
+        data = file.read()
+
+    parsed = parse_terminal_dump(data=data)
+    if parsed is None:
+        return load_hand_animation(txt_fpath=txt_fpath, use_uniform_timestamps=use_uniform_timestamps)
+
+    timestamps, joint_values = parsed
+    return create_hand_animation_dataframe(timestamps=timestamps,
+                                           joint_values=joint_values,
+                                           use_uniform_timestamps=use_uniform_timestamps)
+
+
+def parse_terminal_dump(data: bytes):
+
+    """
+    Tokenizes a block of terminal dump in one pass. Each record is expected to be on its own line as:
+        [datetime.datetime(Y, M, D, h, m, s, us), ['v0', 'v1', ..., 'v19']]
+
+    :param data: bytes with any number of complete records. Empty lines are ignored
+    :return: tuple (timestamps, joint_values) where timestamps are in seconds relative to the first record
+             (float64) and joint_values is a numpy ndarray (N, 20) <float64>. None if the data does not
+             follow the expected layout
+    """
+
+    parsed = parse_terminal_dump_records(data=data)
+    if parsed is None:
+        return None
+
+    timestamps_us, joint_values = parsed
+    timestamps = (timestamps_us - timestamps_us[0]) / 1e6  # Time starts from zero
+
+    return timestamps, joint_values
+
+
+def parse_terminal_dump_records(data: bytes):
+
+    """
+    Same as parse_terminal_dump(), but timestamps are returned as absolute microseconds so that separate
+    blocks of the same file can be aligned with each other
+
+    :param data: bytes with any number of complete records. Empty lines are ignored
+    :return: tuple (timestamps_us, joint_values) as numpy ndarrays (N,) <int64> and (N, 20) <float64>, or None
+    """
+
+    payload = data.replace(constants.TERMINAL_DATETIME_PREFIX, b"").translate(None, constants.TERMINAL_DELETE_CHARS)
+
+    try:
+        records = np.loadtxt(io.BytesIO(payload), delimiter=",", dtype=np.float64, ndmin=2)
+    except ValueError:
+        return None
+
+    if records.shape[0] == 0 or records.shape[1] != TERMINAL_DUMP_RECORD_SIZE:
+        return None
+
+    datetime_fields = records[:, :constants.TERMINAL_DATETIME_NUM_FIELDS].astype(np.int64)
+    timestamps_us = datetime_fields_to_microseconds(datetime_fields=datetime_fields)
+
+    return timestamps_us, records[:, constants.TERMINAL_DATETIME_NUM_FIELDS:]
+
+
+def iter_hand_animation_chunks(txt_fpath: str,
+                               chunk_size=constants.ANIMATION_CHUNK_SIZE,
+                               use_uniform_timestamps=True,
+                               dtype=np.float32):
+
+    """
+    Generator version of load_hand_animation_bulk(). The file is read lazily and only 'chunk_size' records are
+    kept in memory at any time, so memory usage no longer depends on the length of the recording. The same
+    corrections of load_hand_animation() are applied to every chunk.
+
+    When using uniform timestamps, the file is scanned once beforehand (see scan_hand_animation()) to find
+    the number of records and the duration of the recording.
+
+    :param txt_fpath: Terminal dump txt file
+    :param chunk_size: Number of records per chunk. The last chunk may be smaller
+    :param use_uniform_timestamps: Replaces the bursty timestamps with linearly spaced ones
+    :param dtype: dtype of the joint values
+    :return: yields tuples (timestamps, joint_values) as numpy ndarrays (M,) <float64> and (M, 21) <dtype>,
+             where columns are ordered as constants.ANIMATION_COLUMN_NAMES
+    """
+
+    time_step = 0.0
+    if use_uniform_timestamps:
+        num_records, duration = scan_hand_animation(txt_fpath=txt_fpath)
+        time_step = duration / max(num_records - 1, 1)
+
+    first_timestamp_us = None
+    record_offset = 0
+
+    with open(txt_fpath, "rb") as file:
+        for lines in iter_line_blocks(file=file, block_size=chunk_size):
+
+            parsed = parse_terminal_dump_records(data=b"".join(lines))
+            if parsed is None:
+                # Slow path: Only keep the lines that are actually valid records
+                valid_lines = [line for line in lines if re.search(TERMINAL_RE_PATTERN_BYTES, line)]
+                parsed = parse_terminal_dump_records(data=b"".join(valid_lines)) if valid_lines else None
+                if parsed is None:
+                    continue
+
+            timestamps_us, joint_values = parsed
+
+            if first_timestamp_us is None:
+                first_timestamp_us = timestamps_us[0]
+
+            if use_uniform_timestamps:
+                timestamps = (record_offset + np.arange(timestamps_us.size)) * time_step
+            else:
+                timestamps = (timestamps_us - first_timestamp_us) / 1e6
+            record_offset += timestamps_us.size
+
+            yield timestamps, correct_hand_joint_values(joint_values=joint_values.astype(dtype))
+
+
+def iter_line_blocks(file, block_size: int):
+
+    """
+    Yields lists of up to 'block_size' non-empty lines from a file opened in binary mode
+    """
+
+    lines = []
+    for line in file:
+        if len(line.strip()) == 0:
+            continue
+        lines.append(line)
+        if len(lines) == block_size:
+            yield lines
+            lines = []
+
+    if len(lines) > 0:
+        yield lines
+
+
+def scan_hand_animation(txt_fpath: str, block_size=1 << 24):
+
+    """
+    Finds the number of records and the duration of a terminal dump without parsing it all. The file is read
+    in blocks of 'block_size' bytes to count the records, and only the first and last records are parsed.
+    Only lines matching TERMINAL_RE_PATTERN_BYTES are counted, like the records load_hand_animation() keeps, so
+    malformed lines do not change the uniform time step.
+
+    :param txt_fpath: Terminal dump txt file
+    :param block_size: Number of bytes read at once
+    :return: tuple (num_records, duration) with the duration in seconds
+    """
+
+    num_records = 0
+    first_line = None
+    remainder = b""
+
+    with open(txt_fpath, "rb") as file:
+        while True:
+            block = file.read(block_size)
+
+            # Only complete lines are searched. The partial line at the end of a block is carried over to the next
+            data = remainder + block
+            remainder = b""
+            if block:
+                line_end = data.rfind(b"\n") + 1
+                data, remainder = data[:line_end], data[line_end:]
+
+            # Records never span lines, so each match is one record
+            num_records += len(TERMINAL_RE_PATTERN_BYTES.findall(data))
+            if first_line is None:
+                first_line = find_first_record_line(data=data)
+
+            if not block:
+                break
+
+    first_record = parse_terminal_dump_records(data=first_line) if first_line is not None else None
+    last_timestamp_us = find_last_record_timestamp_us(txt_fpath=txt_fpath)
+    if first_record is None or last_timestamp_us is None:
+        return num_records, 0.0
+
+    return num_records, (last_timestamp_us - first_record[0][0]) / 1e6
+
+
+def find_first_record_line(data: bytes):
+    for line in data.splitlines():
+        if re.search(TERMINAL_RE_PATTERN_BYTES, line):
+            return line
+    return None
+
+
+def find_last_record_timestamp_us(txt_fpath: str, tail_size=1 << 16):
+
+    """
+    Parses the last valid record of a terminal dump by only reading the end of the file
+
+    :return: int timestamp in microseconds, or None if no valid record was found in the tail
+    """
+
+    with open(txt_fpath, "rb") as file:
+        file.seek(0, io.SEEK_END)
+        file.seek(max(file.tell() - tail_size, 0))
+        tail = file.read()
+
+    for line in reversed(tail.splitlines()):
+        if not re.search(TERMINAL_RE_PATTERN_BYTES, line):
+            continue
+        parsed = parse_terminal_dump_records(data=line)
+        if parsed is not None:
+            return parsed[0][-1]
+
+    return None
+
+
+def datetime_fields_to_microseconds(datetime_fields: np.ndarray) -> np.ndarray:
+
+    """
+    Vectorised equivalent of datetime(*fields) for many rows at once. Timezones are ignored, which is fine
+    as long as only differences between timestamps are used.
+
+    :param datetime_fields: numpy ndarray (N, 7) <int64> with year, month, day, hour, minute, second, microsecond
+    :return: numpy ndarray (N,) <int64> microseconds since epoch
+    """
+
+    years, months, days, hours, minutes, seconds, microseconds = datetime_fields.T
+
+    dates = ((years - 1970).astype("datetime64[Y]") +
+             (months - 1).astype("timedelta64[M]")).astype("datetime64[D]") + (days - 1).astype("timedelta64[D]")
 
-        hand_poses_array = np.array(hand_poses, dtype=float)
+    return (dates.astype("datetime64[us]").astype(np.int64) +
+            ((hours * 60 + minutes) * 60 + seconds) * 1000000 + microseconds)
 
-        columns = ["timestamps"] + constants.JOINT_NAMES
-        data = np.concatenate([timestamps_array, hand_poses_array], axis=1)
-        df = pd.DataFrame(columns=columns, data=data)
 
-        # Fix finger MCP joint swaps
-        selected_fingers = ["index", "middle", "ring", "pinky"]
-        for finger_name in selected_fingers:
-            df[f"{finger_name}_mcp_x"], df[f"{finger_name}_mcp_y"] = \
-                df[f"{finger_name}_mcp_y"], df[f"{finger_name}_mcp_x"]
+def correct_hand_joint_values(joint_values: np.ndarray) -> np.ndarray:
 
-        # Fix thumb - Don't forget to use degrees here!
-        df["thumb_cmc_x"] = df["thumb_cmc_x"] + 90
-        df["thumb_cmc_y"] = df["thumb_cmc_y"] - 45
-        df["thumb_cmc_z"] = -90.0
-        df["thumb_mcp_x"] = df["thumb_mcp_x"]
-        df["thumb_ip_x"] = df["thumb_ip_x"]
+    """
+    Fixes the errors of the recording on an array of joint values ordered as constants.JOINT_NAMES:
+    - Fix 1) MCP x and y are swapped on all fingers but the thumb
+    - Fix 2) Thumb CMC needs an offset and an extra constant z rotation
+
+    :param joint_values: numpy ndarray (N, 20) with the raw values in degrees
+    :return: numpy ndarray (N, 21) ordered as constants.ANIMATION_COLUMN_NAMES, same dtype as the input
+    """
+
+    corrected = np.empty((joint_values.shape[0], len(constants.ANIMATION_COLUMN_NAMES)), dtype=joint_values.dtype)
+    corrected[:, :len(constants.JOINT_NAMES)] = joint_values
+
+    # Fix finger MCP joint swaps
+    for finger_name in ["index", "middle", "ring", "pinky"]:
+        x_index = constants.JOINT_NAMES.index(f"{finger_name}_mcp_x")
+        y_index = constants.JOINT_NAMES.index(f"{finger_name}_mcp_y")
+        corrected[:, [x_index, y_index]] = joint_values[:, [y_index, x_index]]
+
+    # Fix thumb - Don't forget to use degrees here!
+    corrected[:, constants.JOINT_NAMES.index(constants.THUMB_CMC_X)] += 90
+    corrected[:, constants.JOINT_NAMES.index(constants.THUMB_CMC_Y)] -= 45
+    corrected[:, -1] = constants.THUMB_CMC_Z_DEGREES
 
-        return df
+    return corrected
+
+
+def create_hand_animation_dataframe(timestamps: np.ndarray, joint_values: np.ndarray, use_uniform_timestamps=True):
+
+    """
+    Builds the animation DataFrame (timestamps + corrected joint values) shared by all the loaders
+
+    :param timestamps: numpy ndarray (N,) seconds, starting from zero
+    :param joint_values: numpy ndarray (N, 20) raw values in degrees ordered as constants.JOINT_NAMES
+    :param use_uniform_timestamps: Replaces all timestamps with a linearly spaced version of them
+    :return: pandas DataFrame
+    """
+
+    timestamps_array = np.asarray(timestamps, dtype=float).reshape(-1, 1)
+
+    if use_uniform_timestamps:
+        # Replaces all timestamps with a linearly spaced version of them
+        duration = np.max(timestamps_array)
+        timestamps_array = np.linspace(start=0,
+                                       stop=duration,
+                                       num=timestamps_array.size,
+                                       endpoint=True).reshape(-1, 1)
+
+    hand_poses_array = correct_hand_joint_values(joint_values=np.asarray(joint_values, dtype=float))
+
+    columns = ["timestamps"] + constants.ANIMATION_COLUMN_NAMES
+    data = np.concatenate([timestamps_array, hand_poses_array], axis=1)
+    return pd.DataFrame(columns=columns, data=data)
+
+
+def load_hand_animation_cached(txt_fpath: str, use_uniform_timestamps=True):
+
+    """
+    Loads an animation through a binary sidecar cache stored next to the txt file. The first load parses the
+    txt file and writes the sidecar, later loads simply memory-map it, so no parsing happens at all.
+
+    The cache is rebuilt when the source file changes (size, modification time and SHA1) or when the
+    correction logic changes (see get_animation_corrections_hash()).
+
+    :param txt_fpath: Terminal dump txt file
+    :param use_uniform_timestamps: Replaces the bursty timestamps with linearly spaced ones
+    :return: tuple (timestamps, joint_values) as numpy ndarrays (N,) <float64> and (N, 21) <float32>, with
+             columns ordered as constants.ANIMATION_COLUMN_NAMES. These are read-only memory maps when the
+             cache is valid
+    """
+
+    cache_fpath = get_animation_cache_fpath(txt_fpath=txt_fpath, use_uniform_timestamps=use_uniform_timestamps)
+
+    cached = read_animation_cache(cache_fpath=cache_fpath, txt_fpath=txt_fpath)
+    if cached is not None:
+        return cached
+
+    df = load_hand_animation_bulk(txt_fpath=txt_fpath, use_uniform_timestamps=use_uniform_timestamps)
+    timestamps = df["timestamps"].values.astype(np.float64)
+    joint_values = df[constants.ANIMATION_COLUMN_NAMES].values.astype(np.float32)
+
+    try:
+        write_animation_cache(cache_fpath=cache_fpath,
+                              txt_fpath=txt_fpath,
+                              timestamps=timestamps,
+                              joint_values=joint_values)
+    except OSError:
+        pass  # Read-only location. Just skip the cache
+
+    return timestamps, joint_values
+
+
+def get_animation_cache_fpath(txt_fpath: str, use_uniform_timestamps: bool) -> str:
+    suffix = "uniform" if use_uniform_timestamps else "raw"
+    return f"{txt_fpath}.{suffix}{constants.ANIMATION_CACHE_EXTENSION}"
+
+
+def get_animation_corrections_hash() -> str:
+
+    """
+    Identifies the current correction logic, so caches created with a different version are discarded
+    """
+
+    hasher = hashlib.sha1()
+    hasher.update(inspect.getsource(correct_hand_joint_values).encode())
+    hasher.update(json.dumps([constants.ANIMATION_COLUMN_NAMES, constants.THUMB_CMC_Z_DEGREES]).encode())
+    return hasher.hexdigest()
+
+
+def get_file_sha1(fpath: str, block_size=1 << 24) -> str:
+    hasher = hashlib.sha1()
+    with open(fpath, "rb") as file:
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def write_animation_cache(cache_fpath: str, txt_fpath: str, timestamps: np.ndarray, joint_values: np.ndarray):
+
+    """
+    Sidecar layout:
+        - Magic bytes (constants.ANIMATION_CACHE_MAGIC)
+        - uint64 with the size of the JSON header
+        - JSON header, padded with spaces to a multiple of constants.ANIMATION_CACHE_ALIGNMENT
+        - Timestamps (N,) <float64>
+        - Joint values (N, C) <float32>
+    The file is first written to a temporary path and then renamed, so a crash never leaves a broken cache
+    """
+
+    source_stat = os.stat(txt_fpath)
+    timestamps = np.ascontiguousarray(timestamps, dtype=np.float64)
+    joint_values = np.ascontiguousarray(joint_values, dtype=np.float32)
+
+    header = {
+        "version": constants.ANIMATION_CACHE_VERSION,
+        "corrections_hash": get_animation_corrections_hash(),
+        "source_size": source_stat.st_size,
+        "source_mtime_ns": source_stat.st_mtime_ns,
+        "source_sha1": get_file_sha1(fpath=txt_fpath),
+        "num_records": int(timestamps.size),
+        "columns": constants.ANIMATION_COLUMN_NAMES,
+    }
+
+    # Arrays must start at aligned offsets so they can be memory-mapped efficiently
+    alignment = constants.ANIMATION_CACHE_ALIGNMENT
+    prefix_size = len(constants.ANIMATION_CACHE_MAGIC) + 8
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (-(prefix_size + len(header_bytes)) % alignment)
+
+    temp_fpath = f"{cache_fpath}.tmp"
+    with open(temp_fpath, "wb") as file:
+        file.write(constants.ANIMATION_CACHE_MAGIC)
+        file.write(np.uint64(len(header_bytes)).tobytes())
+        file.write(header_bytes)
+        file.write(timestamps.tobytes())
+        file.write(b"\0" * (-timestamps.nbytes % alignment))
+        file.write(joint_values.tobytes())
+    os.replace(temp_fpath, cache_fpath)
+
+
+def rewrite_animation_cache_header(cache_fpath: str, header: dict, header_size: int) -> bool:
+
+    """
+    Overwrites the JSON header of a sidecar in place, keeping its size so the arrays do not move
+
+    :return: False if the new header does not fit, in which case the sidecar must be rebuilt
+    """
+
+    header_bytes = json.dumps(header).encode()
+    if len(header_bytes) > header_size:
+        return False
+    header_bytes += b" " * (header_size - len(header_bytes))
+
+    try:
+        with open(cache_fpath, "r+b") as file:
+            file.seek(len(constants.ANIMATION_CACHE_MAGIC) + 8)
+            file.write(header_bytes)
+    except OSError:
+        pass  # Read-only location. The cache is still valid, the hash is just checked again next time
+    return True
+
+
+def read_animation_cache(cache_fpath: str, txt_fpath: str):
+
+    """
+    Memory-maps the arrays of an animation sidecar, as long as it is still valid for the source file
+
+    :return: tuple (timestamps, joint_values) or None if the cache is missing, outdated, truncated or corrupt
+    """
+
+    if not os.path.isfile(cache_fpath):
+        return None
+
+    with open(cache_fpath, "rb") as file:
+        magic = file.read(len(constants.ANIMATION_CACHE_MAGIC))
+        if magic != constants.ANIMATION_CACHE_MAGIC:
+            return None
+        header_size_bytes = file.read(8)
+        if len(header_size_bytes) != 8:
+            return None
+        header_size = int(np.frombuffer(header_size_bytes, dtype=np.uint64)[0])
+        try:
+            header = json.loads(file.read(header_size))
+        except ValueError:
+            return None
+
+    if not isinstance(header, dict) or not all(key in header for key in ANIMATION_CACHE_HEADER_KEYS):
+        return None
+
+    if header.get("version") != constants.ANIMATION_CACHE_VERSION or \
+            header.get("corrections_hash") != get_animation_corrections_hash() or \
+            header.get("columns") != constants.ANIMATION_COLUMN_NAMES:
+        return None
+
+    num_records = header["num_records"]
+    num_columns = len(header["columns"])
+    if not isinstance(num_records, int) or num_records < 0:
+        return None
+    alignment = constants.ANIMATION_CACHE_ALIGNMENT
+    timestamps_offset = len(constants.ANIMATION_CACHE_MAGIC) + 8 + header_size
+    joint_values_offset = timestamps_offset + num_records * 8
+    joint_values_offset += -joint_values_offset % alignment
+
+    expected_size = joint_values_offset + num_records * num_columns * 4
+    if os.path.getsize(cache_fpath) != expected_size:
+        return None
+
+    # Size and modification time are checked first, as hashing a big file is slow. If only the modification
+    # time changed (file copied or touched), the hash decides whether the content is still the same, and the new
+    # modification time is saved so the next loads skip the hash again
+    source_stat = os.stat(txt_fpath)
+    if header["source_size"] != source_stat.st_size:
+        return None
+    if header["source_mtime_ns"] != source_stat.st_mtime_ns:
+        if header["source_sha1"] != get_file_sha1(fpath=txt_fpath):
+            return None
+        header["source_mtime_ns"] = source_stat.st_mtime_ns
+        if not rewrite_animation_cache_header(cache_fpath=cache_fpath, header=header, header_size=header_size):
+            return None  # Rebuilt by the caller, with the new modification time
+
+    timestamps = np.memmap(cache_fpath, dtype=np.float64, mode="r", offset=timestamps_offset, shape=(num_records,))
+    joint_values = np.memmap(cache_fpath,
+                             dtype=np.float32,
+                             mode="r",
+                             offset=joint_values_offset,
+                             shape=(num_records, num_columns))
+
+    return timestamps, joint_values
 
 
 def load_hand_configuration(yaml_fpath: str):
     with open(yaml_fpath) as file:
         return yaml.safe_load(file)
+
+
+def load_obj_bin_header(obj_fpath: str) -> dict:
+
+    """
+    Reads the JSON header of a preprocessed mesh ('<name>.obj.json'), which describes the vertex buffers stored
+    in '<name>.obj.bin' and the material libraries they use
+
+    :param obj_fpath: Path of the original mesh, e.g. 'objects/cat/20430_Cat_v1_NEW.obj'
+    :return: dict
+    """
+
+    with open(f"{obj_fpath}.json", "r") as file:
+        return json.load(file)
+
+
+def get_obj_bin_vertex_layout(vertex_format: str) -> tuple:
+
+    """
+    Converts an interleaved vertex format of a .obj.bin file (e.g. 'T2F_N3F_V3F') to a moderngl layout
+
+    :return: tuple (data_format, attributes), e.g. ('2f 3f 3f', ['in_uv', 'in_normal', 'in_position'])
+    """
+
+    data_format = []
+    attributes = []
+    for component in vertex_format.split("_"):
+        match = re.fullmatch(r"([A-Z])(\d)F", component)
+        if match is None or match.group(1) not in constants.OBJ_BIN_VERTEX_ATTRIBUTES:
+            raise ValueError(f"[ERROR] Vertex format component '{component}' of '{vertex_format}' not supported")
+        data_format.append(f"{match.group(2)}f")
+        attributes.append(constants.OBJ_BIN_VERTEX_ATTRIBUTES[match.group(1)])
+
+    return " ".join(data_format), attributes
+
+
+def get_uncompressed_obj_bin_fpath(bin_fpath: str) -> str:
+
+    """
+    Returns a path to the contents of a .obj.bin file that can be memory-mapped. Files may be gzip-compressed
+    (as the ones shipped in 'objects'), in which case they are decompressed once to a sidecar file, which is
+    reused until the compressed file changes.
+    """
+
+    with open(bin_fpath, "rb") as file:
+        is_compressed = file.read(len(constants.GZIP_MAGIC)) == constants.GZIP_MAGIC
+    if not is_compressed:
+        return bin_fpath
+
+    raw_fpath = f"{bin_fpath}{constants.OBJ_BIN_RAW_EXTENSION}"
+    if os.path.isfile(raw_fpath) and os.path.getmtime(raw_fpath) >= os.path.getmtime(bin_fpath):
+        return raw_fpath
+
+    # Write to a temporary file first, so other processes never map a partial file
+    temp_fpath = f"{raw_fpath}.{os.getpid()}.tmp"
+    with gzip.open(bin_fpath, "rb") as compressed_file, open(temp_fpath, "wb") as raw_file:
+        shutil.copyfileobj(compressed_file, raw_file, length=1 << 24)
+    os.replace(temp_fpath, raw_fpath)
+
+    return raw_fpath
+
+
+def load_mtl(mtl_fpath: str) -> dict:
+
+    """
+    Reads the diffuse color and texture of every material of a Wavefront .mtl file. Texture paths are made
+    absolute, relative to the .mtl file.
+
+    :return: dict {material_name: {'Kd': (r, g, b), 'map_Kd': str or None}}
+    """
+
+    materials = {}
+    material = None
+    mtl_dir = os.path.dirname(os.path.abspath(mtl_fpath))
+
+    with open(mtl_fpath, "r") as file:
+        for line in file:
+            tokens = line.split()
+            if len(tokens) < 2 or tokens[0].startswith("#"):
+                continue
+
+            if tokens[0] == "newmtl":
+                material = {"Kd": (1.0, 1.0, 1.0), "map_Kd": None}
+                materials[" ".join(tokens[1:])] = material
+            elif material is None:
+                continue
+            elif tokens[0] == "Kd":
+                material["Kd"] = tuple(float(value) for value in tokens[1:4])
+            elif tokens[0] == "map_Kd":
+                material["map_Kd"] = os.path.join(mtl_dir, tokens[-1])  # Options come before the file name
+
+    return materials
+